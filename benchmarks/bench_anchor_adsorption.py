@@ -0,0 +1,173 @@
+"""
+锚点吸附基准：对比逐样本循环的旧实现与批量数组实现 (adsorb_to_anchors)。
+
+用法:
+    python benchmarks/bench_anchor_adsorption.py                  # 50000 篇，8 个锚点
+    python benchmarks/bench_anchor_adsorption.py --n 5000 --anchors 12 --cases 200
+
+先在 --cases 组随机小语料上逐一核对两种实现的标签完全一致 (覆盖类别极不均衡、重复类别编号、
+距离量化造成的大量平局等情况)，再在 --n 篇的合成语料上计时。不一致时打印样例并以非零状态码退出。
+"""
+import os
+import io
+import sys
+import time
+import argparse
+import contextlib
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from litreview.services.anchor_adsorption import adsorb_to_anchors
+
+
+def legacy_adsorption(anchor_dists, anchor_indices, anchor_label_map, n_samples):
+    """改写前 core_algorithm 中 ANCHOR 分支的三阶段循环 (逐行照搬，仅去掉打印)"""
+    labels = np.full(n_samples, -1, dtype=int)
+    for idx in anchor_indices:
+        labels[idx] = anchor_label_map[idx]
+    anchor_col = {idx: j for j, idx in enumerate(anchor_indices)}
+
+    anchor_means = np.maximum(np.mean(anchor_dists, axis=0), 1e-6)
+    stage1_confirmed_mask = np.zeros(n_samples, dtype=bool)
+    for i in range(n_samples):
+        if i in anchor_label_map:
+            continue
+        raw_dists = anchor_dists[i]
+        idx_raw = np.argmin(raw_dists)
+        dist_raw_best = raw_dists[idx_raw]
+        idx_norm_mean = np.argmin(raw_dists / anchor_means)
+        if (idx_raw == idx_norm_mean) and (dist_raw_best < 0.6):
+            labels[i] = anchor_label_map[anchor_indices[idx_raw]]
+            stage1_confirmed_mask[i] = True
+        else:
+            labels[i] = -1
+
+    remaining_mask = (~stage1_confirmed_mask)
+    for idx in anchor_indices:
+        remaining_mask[idx] = False
+    if np.sum(remaining_mask) > 0:
+        remaining_dists = anchor_dists[remaining_mask]
+        anchor_q25_dynamic = np.maximum(np.percentile(remaining_dists, 25, axis=0), 1e-6)
+        for i in np.where(remaining_mask)[0]:
+            raw_dists = anchor_dists[i]
+            sims = 1.0 - raw_dists
+            sims_q75 = np.maximum(1.0 - anchor_q25_dynamic, 1e-6)
+            norm_sims = sims / sims_q75
+            best_norm_sim_idx = np.argmax(norm_sims)
+            if norm_sims[best_norm_sim_idx] >= 0.75:
+                labels[i] = anchor_label_map[anchor_indices[best_norm_sim_idx]]
+            else:
+                labels[i] = -1
+
+    iter_count = 0
+    anchor_sim_means = np.maximum(1.0 - anchor_means, 1e-6)
+    while iter_count < 25:
+        current_counts = {}
+        for idx in anchor_indices:
+            current_counts[anchor_label_map[idx]] = 0
+        unique_labels_arr, counts_arr = np.unique(labels, return_counts=True)
+        total_assigned = 0
+        for l, c in zip(unique_labels_arr, counts_arr):
+            if l in current_counts:
+                current_counts[l] = c
+                total_assigned += c
+        if total_assigned == 0:
+            break
+        group_a_labels, group_b_labels = [], []
+        for lbl, cnt in current_counts.items():
+            if cnt <= 4 or cnt <= total_assigned / 10.0:
+                group_b_labels.append(lbl)
+            else:
+                group_a_labels.append(lbl)
+        if not group_b_labels or not group_a_labels:
+            break
+        candidate_indices = np.where(np.isin(labels, group_a_labels))[0]
+        if len(candidate_indices) == 0:
+            break
+        b_anchor_indices = [idx for idx in anchor_indices if anchor_label_map[idx] in group_b_labels]
+        dists_sub = anchor_dists[candidate_indices][:, [anchor_col[idx] for idx in b_anchor_indices]]
+        sims_sub = 1.0 - dists_sub
+        anchor_mean_map = {uid: m for uid, m in zip(anchor_indices, anchor_sim_means)}
+        b_means = np.maximum(np.array([anchor_mean_map[uid] for uid in b_anchor_indices]), 1e-6)
+        norm_sims_sub = sims_sub / b_means[None, :]
+        r_idx, c_idx = np.unravel_index(np.argmax(norm_sims_sub), norm_sims_sub.shape)
+        labels[candidate_indices[r_idx]] = anchor_label_map[b_anchor_indices[c_idx]]
+        iter_count += 1
+    return labels
+
+
+def synthetic_case(rng, n, n_anchors, quantize=False, duplicate_labels=False):
+    """
+    合成 N x A 锚点距离：样本围绕少数几个主题聚集 (规模极不均衡，保证 Stage 3 有迁移)，
+    锚点取自样本行；quantize 时把距离量化到 0.05 以制造大量平局。
+    """
+    dim = 16
+    n_topics = max(2, n_anchors // 2)
+    centers = rng.normal(size=(n_topics, dim))
+    weights = rng.dirichlet(np.full(n_topics, 0.3))
+    topic = rng.choice(n_topics, size=n, p=weights)
+    X = centers[topic] + rng.normal(scale=rng.uniform(0.5, 2.0), size=(n, dim))
+    X /= np.linalg.norm(X, axis=1, keepdims=True)
+
+    anchor_indices = sorted(rng.choice(n, size=n_anchors, replace=False).tolist())
+    dists = (1.0 - X @ X[anchor_indices].T).astype(np.float32)
+    dists = np.clip(dists, 0.0, None)
+    dists[anchor_indices, np.arange(n_anchors)] = 0.0
+    if quantize:
+        dists = (np.round(dists / 0.05) * 0.05).astype(np.float32)
+
+    anchor_labels = list(range(n_anchors))
+    if duplicate_labels and n_anchors > 2:
+        anchor_labels[-1] = anchor_labels[0]
+    return dists, anchor_indices, anchor_labels
+
+
+def run_new(dists, anchor_indices, anchor_labels, n):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return adsorb_to_anchors(dists, anchor_indices, anchor_labels, n)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n', type=int, default=50000, help='计时用合成语料篇数')
+    parser.add_argument('--anchors', type=int, default=8, help='锚点个数')
+    parser.add_argument('--cases', type=int, default=300, help='一致性核对的随机语料组数')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    mismatches = []
+    for case in range(args.cases):
+        n = int(rng.integers(10, 400))
+        a = int(rng.integers(2, min(12, n // 3) + 1))
+        dists, idx, lbls = synthetic_case(rng, n, a, quantize=case % 3 == 1, duplicate_labels=case % 5 == 2)
+        old = legacy_adsorption(dists, idx, dict(zip(idx, lbls)), n)
+        new = run_new(dists, idx, lbls, n)
+        if not np.array_equal(old, new):
+            mismatches.append((case, n, a, int((old != new).sum())))
+    print(f"一致性核对: {args.cases} 组随机语料 (10-400 篇，含量化平局与重复类别编号)")
+
+    dists, idx, lbls = synthetic_case(rng, args.n, args.anchors)
+    t0 = time.perf_counter()
+    old = legacy_adsorption(dists, idx, dict(zip(idx, lbls)), args.n)
+    legacy_time = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    new = run_new(dists, idx, lbls, args.n)
+    new_time = time.perf_counter() - t0
+    if not np.array_equal(old, new):
+        mismatches.append(('timing', args.n, args.anchors, int((old != new).sum())))
+
+    print(f"{args.n} 篇 x {args.anchors} 个锚点:")
+    print(f"旧循环实现: {legacy_time * 1e3:.1f} ms")
+    print(f"批量实现:   {new_time * 1e3:.1f} ms，加速 {legacy_time / max(new_time, 1e-9):.1f}x")
+    if mismatches:
+        print(f"❌ {len(mismatches)} 组结果不一致 (组号, 篇数, 锚点数, 不同标签数)，例如: {mismatches[:5]}")
+        sys.exit(1)
+    print("✅ 两种实现的标签完全一致")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+投影服务基准：对比每次投影各自计算近邻的直接 UMAP 调用与共享 kNN 图的 ProjectionService。
+
+用法:
+    python benchmarks/bench_projection_service.py              # 1500 篇，384 维
+    python benchmarks/bench_projection_service.py --n 3000 --dim 1024
+
+三组输入各做两次投影 (与流水线一致)：
+  - 余弦向量: 20 维 (min_dist=0) + 3 维，对应 analyze_documents_to_vec
+  - 稠密融合距离矩阵: 10 维 + 3 维，对应 KMEANS 分支与可视化
+  - 稀疏 kNN 融合图: 同上
+reproducible 模式下逐一核对投影坐标与直接调用 UMAP 逐位相同，不一致时以非零状态码退出。
+正式计时前先各跑一次小数据预热 numba 编译。
+"""
+import os
+import io
+import sys
+import time
+import argparse
+import warnings
+import contextlib
+
+import numpy as np
+import umap
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from litreview.services.projection_service import ProjectionService
+from litreview.services.fused_distance import fused_distance_matrix, fused_knn_graph
+
+
+PLANS = {
+    'cosine': [dict(n_components=20, n_neighbors=15, min_dist=0.0), dict(n_components=3, n_neighbors=15, min_dist=0.1)],
+    'precomputed': [dict(n_components=10, n_neighbors=15, min_dist=0.1), dict(n_components=3, n_neighbors=15, min_dist=0.1)],
+}
+
+
+def direct(data, metric, plan):
+    return [umap.UMAP(metric=metric, random_state=42, n_jobs=1, **p).fit_transform(data) for p in plan]
+
+
+def shared(data, metric, plan):
+    service = ProjectionService(data, metric=metric, mode='reproducible')
+    return [service.fit_transform(**p) for p in plan]
+
+
+def synthetic_embeddings(rng, n, dim, n_topics=8):
+    centers = rng.normal(size=(n_topics, dim))
+    topic = rng.integers(0, n_topics, size=n)
+    return (centers[topic] + rng.normal(scale=1.5, size=(n, dim))).astype(np.float32)
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        out = fn(*args)
+    return out, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n', type=int, default=1500, help='合成语料篇数')
+    parser.add_argument('--dim', type=int, default=384, help='向量维度')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    rng = np.random.default_rng(args.seed)
+    for name, metric in (('cosine', 'cosine'), ('precomputed', 'precomputed')):
+        warm = synthetic_embeddings(rng, 60, 8)
+        warm = warm if metric == 'cosine' else fused_distance_matrix({'main': warm}, {'main': 1.0})
+        timed(direct, warm, metric, PLANS[name])
+        timed(shared, warm, metric, PLANS[name])
+
+    E = synthetic_embeddings(rng, args.n, args.dim)
+    with contextlib.redirect_stdout(io.StringIO()):
+        cases = [
+            ('余弦向量', E, 'cosine', PLANS['cosine']),
+            ('稠密距离矩阵', fused_distance_matrix({'main': E}, {'main': 1.0}), 'precomputed', PLANS['precomputed']),
+            ('稀疏 kNN 图', fused_knn_graph({'main': E}, {'main': 1.0}, n_neighbors=30), 'precomputed', PLANS['precomputed']),
+        ]
+
+    mismatches = []
+    print(f"{args.n} 篇 x {args.dim} 维，每组两次投影:")
+    for label, data, metric, plan in cases:
+        ref, direct_time = timed(direct, data, metric, plan)
+        out, shared_time = timed(shared, data, metric, plan)
+        same = all(np.array_equal(a, b) for a, b in zip(ref, out))
+        if not same:
+            mismatches.append(label)
+        print(f"  {label}: 直接调用 {direct_time:.1f}s，共享 kNN 图 {shared_time:.1f}s "
+              f"({'坐标逐位相同' if same else '坐标不一致'})")
+    if mismatches:
+        print(f"❌ 以下输入的投影结果不一致: {mismatches}")
+        sys.exit(1)
+    print("✅ 共享 kNN 图的投影与直接调用 UMAP 完全一致")
+
+
+if __name__ == '__main__':
+    main()
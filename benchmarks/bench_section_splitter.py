@@ -0,0 +1,129 @@
+"""
+章节切分微基准：对比旧的逐章节 DOTALL 正则与一次扫描的标题索引 (MarkdownSections)。
+
+用法:
+    python benchmarks/bench_section_splitter.py                 # 10000 篇合成文献整理
+    python benchmarks/bench_section_splitter.py --n 2000 --irregular 0.3
+
+每篇文献提取聚类用到的全部章节标记 (extract_sections_to_dict 的规则) 以及综述生成用到的
+四个核心章节 (extract_md_to_dict 的规则)，输出两种实现的耗时，并逐条核对结果完全一致；
+不一致时打印样例并以非零状态码退出。--irregular 指定含空章节、缩进标题、正文提及标题等
+不规范输出的比例，用于覆盖边界行为。
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from litreview.services.corpus_embeddings import SECTION_HEADINGS
+from litreview.services.md_sections import CORE_SECTION_KEYWORDS, MarkdownSections, regex_section_text, regex_core_section
+
+
+SECTION_MARKERS = list(SECTION_HEADINGS.values()) + ["## 发表年份", "## 关联度评分", "综述写作专用句"]
+_VOCAB = "模型 数据 方法 实验 结果 分析 框架 机制 学习 网络 优化 检索 生成 评估 领域 语义 表示 任务 基线 提升".split()
+
+
+def _para(rng, lo, hi):
+    target = rng.randint(lo, hi)
+    words, n = [], 0
+    while n < target:
+        w = rng.choice(_VOCAB)
+        words.append(w)
+        n += len(w)
+        if rng.random() < 0.05:
+            words.append("。\n" if rng.random() < 0.5 else "，")
+    return "".join(words)
+
+
+def synthetic_summary(rng, irregular=False):
+    sections = [
+        ("# 论文整理：", _para(rng, 10, 40)),
+        ("## 发表年份", f"{rng.randint(1995, 2025)}年"),
+        ("## 论文主要内容", _para(rng, 1500, 6000)),
+        ("## 论文核心内容概括", _para(rng, 300, 900)),
+        ("## 与用户的研究内容有何关联", _para(rng, 200, 600)),
+        ("## 关联度评分", str(rng.randint(40, 98))),
+        ("## 论文map", ""),
+        ("### 1. 标准化领域地图", _para(rng, 60, 200)),
+        ("### 2. 谱系背景与脉络", _para(rng, 300, 900)),
+        ("### 3. 认识论范式", _para(rng, 100, 300)),
+        ("### 4. 综述写作专用句", _para(rng, 60, 200)),
+        ("## 该论文关联的、值得额外阅读的论文（选填）", "* " + _para(rng, 20, 60)),
+    ]
+    parts = []
+    for heading, body in sections:
+        if irregular:
+            r = rng.random()
+            if r < 0.1:
+                body = ""                                    # 空章节
+            elif r < 0.2:
+                heading = "  " + heading                     # 缩进标题
+            elif r < 0.3:
+                body = body + "\n参见" + rng.choice(CORE_SECTION_KEYWORDS) + "一节"  # 正文提及其它章节
+            elif r < 0.35:
+                heading = heading + "（补充说明）"            # 标题行尾部有额外文字
+            elif r < 0.4:
+                body = "\n\n" + body + "\n#### 小结\n" + _para(rng, 20, 80)
+        if heading.startswith("# 论文整理："):
+            parts.append(heading + body)
+        else:
+            parts.append(heading + "\n\n" + body)
+    return "\n\n".join(parts) + "\n"
+
+
+def run_regex(docs):
+    out = []
+    for content in docs:
+        out.append([regex_section_text(content, m) for m in SECTION_MARKERS]
+                   + [regex_core_section(content, k) for k in CORE_SECTION_KEYWORDS])
+    return out
+
+
+def run_index(docs):
+    out = []
+    for content in docs:
+        index = MarkdownSections(content)
+        out.append([index.section(m) for m in SECTION_MARKERS]
+                   + [index.core_section(k) for k in CORE_SECTION_KEYWORDS])
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n', type=int, default=10000, help='合成文献整理篇数')
+    parser.add_argument('--irregular', type=float, default=0.2, help='不规范输出所占比例')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    docs = [synthetic_summary(rng, irregular=rng.random() < args.irregular) for _ in range(args.n)]
+    total_chars = sum(len(d) for d in docs)
+    print(f"合成文献整理: {len(docs)} 篇，平均 {total_chars / len(docs):.0f} 字符，"
+          f"每篇提取 {len(SECTION_MARKERS)} 个章节 + {len(CORE_SECTION_KEYWORDS)} 个核心章节")
+
+    t0 = time.perf_counter()
+    legacy = run_regex(docs)
+    regex_time = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    indexed = run_index(docs)
+    index_time = time.perf_counter() - t0
+
+    labels = SECTION_MARKERS + [f"core:{k}" for k in CORE_SECTION_KEYWORDS]
+    mismatches = [(i, labels[j]) for i, (a, b) in enumerate(zip(legacy, indexed))
+                  for j, (x, y) in enumerate(zip(a, b)) if x != y]
+
+    print(f"旧正则:   {regex_time:.2f}s ({regex_time / len(docs) * 1e3:.3f} ms/篇)")
+    print(f"标题索引: {index_time:.2f}s ({index_time / len(docs) * 1e3:.3f} ms/篇)，"
+          f"加速 {regex_time / max(index_time, 1e-9):.1f}x")
+    if mismatches:
+        print(f"❌ {len(mismatches)} 处结果不一致，例如: {mismatches[:5]}")
+        sys.exit(1)
+    print("✅ 两种实现的提取结果完全一致")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+稀疏融合图连通性修补的回归检查。
+
+用法:
+    python benchmarks/check_knn_graph_connectivity.py
+
+构造 40 个聚在一起的样本 + 两个彼此相近、远离主体的 3 样本小岛，以 n_neighbors=2 构建
+fused_knn_graph (每个小岛的近邻都落在岛内，图初始有 3 个连通分量)。检查项：
+1. 补边后整张图连通 (小岛必须连向最大分量，而不是互相连接)；
+2. 每条存储的边恰好等于稠密融合距离矩阵中的对应元素 (同一条边重复写入时距离会被 CSR 累加)；
+3. 图对称，每个 (行, 列) 只存储一次。
+任一项不满足时以非零状态码退出。
+"""
+import os
+import io
+import sys
+import contextlib
+
+import numpy as np
+from scipy.sparse import csgraph
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from litreview.services.fused_distance import fused_knn_graph, fused_distance_matrix, MIN_EDGE_DISTANCE
+
+
+def island_embeddings(seed: int = 0, dim: int = 8):
+    """主体 40 个样本 + 小岛 A、B；两岛的第一个样本 (即各自的代表样本) 互为对方最近的岛外样本"""
+    rng = np.random.default_rng(seed)
+    e = np.eye(dim, dtype=np.float32)
+    main = e[0] + rng.normal(scale=0.05, size=(40, dim))
+    island_a = np.stack([e[1] + 0.02 * e[2], e[1] + 0.02 * e[3], e[1] - 0.02 * e[3]])
+    island_b = np.stack([e[1] + 0.28 * e[2], e[1] + 0.3 * e[2] + 0.02 * e[3], e[1] + 0.3 * e[2] - 0.02 * e[3]])
+    return np.vstack([main, island_a, island_b]).astype(np.float32)
+
+
+def main():
+    views = {'main': island_embeddings()}
+    weights = {'main': 1.0}
+    with contextlib.redirect_stdout(io.StringIO()):
+        graph = fused_knn_graph(views, weights, n_neighbors=2)
+    dense = fused_distance_matrix(views, weights)
+
+    failures = []
+    n_comp, _ = csgraph.connected_components(graph, directed=False)
+    if n_comp != 1:
+        failures.append(f"补边后仍有 {n_comp} 个连通分量")
+
+    coo = graph.tocoo()
+    off_diag = coo.row != coo.col
+    rows, cols, data = coo.row[off_diag], coo.col[off_diag], coo.data[off_diag]
+    expected = np.maximum(dense[rows, cols], np.float32(MIN_EDGE_DISTANCE))
+    worst = float(np.abs(data - expected).max()) if len(data) else 0.0
+    if worst > 1e-5:
+        i = int(np.abs(data - expected).argmax())
+        failures.append(f"边 ({rows[i]}, {cols[i]}) 的距离 {data[i]:.4f} 与精确融合距离 {expected[i]:.4f} 不一致")
+
+    keys = coo.row.astype(np.int64) * graph.shape[0] + coo.col
+    if len(np.unique(keys)) != len(keys):
+        failures.append("存在重复存储的 (行, 列)")
+    if abs(graph - graph.T).max() > 0:
+        failures.append("图不对称")
+
+    print(f"{graph.shape[0]} 个样本，{graph.nnz} 个非零元，{n_comp} 个连通分量，边距离最大偏差 {worst:.2e}")
+    if failures:
+        for f in failures:
+            print(f"❌ {f}")
+        sys.exit(1)
+    print("✅ 连通性修补正确：小分量均连向最大分量，边距离与稠密矩阵一致")
+
+
+if __name__ == '__main__':
+    main()
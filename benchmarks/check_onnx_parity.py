@@ -0,0 +1,96 @@
+"""
+ONNX int8 后端一致性检查：在参考语料上对比 torch fp32 与 onnx-int8 两个后端。
+
+用法:
+    pip install -e .[onnx]
+    python benchmarks/check_onnx_parity.py --folder <工作目录>/文献整理合集 --n-clusters 4
+
+检查项：
+1. 向量一致性：逐条文本的余弦相似度 (均值 / 最小值 / 低于阈值的条数)；
+2. 聚类一致性：各章节以及四章节拼接后的 UMAP-20 + KMeans 标签的 ARI；
+3. 吞吐：两个后端编码全部文本的墙钟时间。
+默认阈值：余弦均值 >= 0.99，各项 ARI >= 0.9，不满足时以非零状态码退出。
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+from sklearn.cluster import KMeans
+from sklearn.metrics import adjusted_rand_score
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from litreview.services.corpus_embeddings import SECTION_HEADINGS
+from litreview.services.core_algorithm import extract_sections_to_dict, embed_and_reduce_documents
+from litreview.services.embedding_service import DEFAULT_MODEL_NAME, embedding_registry
+
+
+def encode_all(texts, model_name, backend, batch_size):
+    embedding_registry.get(model_name, 'cpu', backend)  # 加载时间不计入吞吐
+    t0 = time.perf_counter()
+    vecs = embedding_registry.encode(texts, model_name=model_name, batch_size=batch_size,
+                                     show_progress_bar=False, backend=backend)
+    return np.asarray(vecs, dtype=np.float32), time.perf_counter() - t0
+
+
+def cluster_labels(docs, embeddings, n_clusters):
+    coords = embed_and_reduce_documents(docs, n_dim_reduce=20, embeddings=embeddings)
+    X = np.asarray([coords[t] for t in sorted(docs)])
+    return KMeans(n_clusters=n_clusters, random_state=42, n_init=10).fit_predict(X), X
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--folder', required=True, help='参考语料：文献整理合集目录')
+    parser.add_argument('--model', default=DEFAULT_MODEL_NAME)
+    parser.add_argument('--n-clusters', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--min-cosine', type=float, default=0.99)
+    parser.add_argument('--min-ari', type=float, default=0.9)
+    args = parser.parse_args()
+
+    sections = {key: extract_sections_to_dict(args.folder, heading) for key, heading in SECTION_HEADINGS.items()}
+    titles = sorted(set.intersection(*(set(d) for d in sections.values())))
+    sections = {key: {t: d[t] for t in titles} for key, d in sections.items()}
+    texts = [sections[key][t] for key in SECTION_HEADINGS for t in titles]
+    print(f"参考语料: {len(titles)} 篇文献，{len(texts)} 条章节文本")
+
+    ref, ref_time = encode_all(texts, args.model, 'torch', args.batch_size)
+    q, q_time = encode_all(texts, args.model, 'onnx-int8', args.batch_size)
+
+    a = ref / np.linalg.norm(ref, axis=1, keepdims=True)
+    b = q / np.linalg.norm(q, axis=1, keepdims=True)
+    cos = np.sum(a * b, axis=1)
+    print(f"\n[向量一致性] 余弦均值 {cos.mean():.5f}，最小 {cos.min():.5f}，"
+          f"低于 {args.min_cosine} 的条数 {int((cos < args.min_cosine).sum())}/{len(cos)}")
+
+    failed = cos.mean() < args.min_cosine
+    print("\n[聚类一致性] UMAP-20 + KMeans(k=%d) 标签 ARI" % args.n_clusters)
+    ref_views, q_views = [], []
+    n = len(titles)
+    for i, key in enumerate(SECTION_HEADINGS):
+        rows = slice(i * n, (i + 1) * n)
+        ref_labels, ref_X = cluster_labels(sections[key], ref[rows], args.n_clusters)
+        q_labels, q_X = cluster_labels(sections[key], q[rows], args.n_clusters)
+        ref_views.append(ref_X)
+        q_views.append(q_X)
+        ari = adjusted_rand_score(ref_labels, q_labels)
+        failed = failed or ari < args.min_ari
+        print(f"   {key:<8} ARI = {ari:.4f}")
+    ref_fused = KMeans(n_clusters=args.n_clusters, random_state=42, n_init=10).fit_predict(np.hstack(ref_views))
+    q_fused = KMeans(n_clusters=args.n_clusters, random_state=42, n_init=10).fit_predict(np.hstack(q_views))
+    ari = adjusted_rand_score(ref_fused, q_fused)
+    failed = failed or ari < args.min_ari
+    print(f"   {'fused':<8} ARI = {ari:.4f}")
+
+    print(f"\n[吞吐] torch fp32 {ref_time:.2f}s，onnx-int8 {q_time:.2f}s，加速 {ref_time / max(q_time, 1e-9):.2f}x")
+    if failed:
+        print("❌ 一致性检查未通过")
+        sys.exit(1)
+    print("✅ 一致性检查通过，可以设置 LITREVIEW_EMBED_BACKEND=onnx-int8")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,2 +1,10 @@
 from ._version import __version__
-from .app import LitReviewApp
+
+
+def __getattr__(name):
+    # 延迟导入：多进程子进程 (spawn) 只需要 litreview.services 下的轻量模块 (如降维)，
+    # 不必连带载入 Web 服务、LLM SDK 与语义模型
+    if name == 'LitReviewApp':
+        from .app import LitReviewApp
+        return LitReviewApp
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
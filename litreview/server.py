@@ -17,6 +17,7 @@ import uvicorn
 
 from .services import SystemService, UploadService, SummaryService, ClusterService, GenerateService
 from .services.system_service import AI_call, pdf2markdown, pick_working_dir, check_working_dir
+from .services.embedding_service import preload_embedder
 
 def _config_path() -> str:
     return os.path.join(os.getcwd(), "litreview_config.json")
@@ -71,6 +72,10 @@ def create_app(static_dir: Optional[str] = None) -> FastAPI:
     cluster_service = ClusterService()
     generate_service = GenerateService()
 
+    # 后台预热语义模型，聚类任务开始时无需再加载权重 (LITREVIEW_PRELOAD_EMBEDDER=0 可关闭)
+    if os.environ.get('LITREVIEW_PRELOAD_EMBEDDER', '1') != '0':
+        preload_embedder()
+
     @app.post("/api/system/start")
     async def system_start(payload: dict):
         try:
@@ -402,12 +407,52 @@ def create_app(static_dir: Optional[str] = None) -> FastAPI:
         # 5. 调用 Service
         try:
             data = cluster_service.start(service_payload)
+            if data.get("conflict"):
+                return JSONResponse({"status": "error", "message": data["error"]}, status_code=409)
             if "error" in data:
                  return JSONResponse({"status": "error", "message": data["error"]}, status_code=500)
             return JSONResponse({"status": "success", "message": "聚类任务已启动", "data": data})
         except Exception as e:
             return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
 
+    @app.post("/api/cluster/assign")
+    async def cluster_assign(payload: dict):
+        # 增量归类：新文献按已保存的锚点归入现有分类，不重新聚类
+        work_dir = os.environ.get('LITREVIEW_WORKDIR')
+        if not work_dir:
+            try:
+                config_path = _config_path()
+                if os.path.isfile(config_path):
+                    with open(config_path, "r", encoding="utf-8") as f:
+                        cfg = json.load(f)
+                        work_dir = cfg.get("LITREVIEW_WORKDIR")
+            except Exception:
+                pass
+
+        if not work_dir:
+            return JSONResponse({"status": "error", "message": "未找到工作目录配置 (LITREVIEW_WORKDIR)"}, status_code=400)
+
+        service_payload = payload.copy()
+        service_payload['folder_path'] = work_dir
+        print(f"[CLUSTER] Assigning new papers on root: {work_dir}")
+
+        try:
+            loop = asyncio.get_event_loop()
+            data = await loop.run_in_executor(None, cluster_service.assign, service_payload)
+            if data.get("conflict"):
+                return JSONResponse({"status": "error", "message": data["error"]}, status_code=409)
+            if "error" in data:
+                 return JSONResponse({"status": "error", "message": data["error"]}, status_code=500)
+            if data["low_confidence"] and not data["written"]:
+                message = f"归类一致率偏低，{len(data['assigned'])} 篇新文献的归类结果未写入 (可带 force 参数强制写入或重新聚类)"
+            else:
+                message = f"已归类 {len(data['assigned'])} 篇新文献"
+            return JSONResponse({"status": "success", "message": message, "data": data})
+        except FileNotFoundError as e:
+            return JSONResponse({"status": "error", "message": str(e)}, status_code=409)
+        except Exception as e:
+            return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
+
     @app.get("/api/cluster/status/{task_id}")
     async def cluster_status(task_id: str):
         data = cluster_service.status(task_id)
@@ -456,7 +501,9 @@ def create_app(static_dir: Optional[str] = None) -> FastAPI:
                     await ws.send_json({
                         "type": "cluster_progress",
                         "progress": status_data.get("progress", 0),
-                        "message": status_data.get("message", "")
+                        "message": status_data.get("message", ""),
+                        # 第二轮各分类的进度 {label: {status, message}}
+                        "labels": status_data.get("labels", {})
                     })
                 
                 await asyncio.sleep(1) # 每秒轮询一次
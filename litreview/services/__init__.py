@@ -1,5 +1,16 @@
-from .system_service import SystemService
-from .upload_service import UploadService
-from .summary_service import SummaryService
-from .cluster_service import ClusterService
-from .generate_service import GenerateService
+# 各服务按需导入 (见 litreview/__init__.py)：子进程导入轻量子模块时不会触发整套服务的依赖
+_SERVICES = {
+    'SystemService': '.system_service',
+    'UploadService': '.upload_service',
+    'SummaryService': '.summary_service',
+    'ClusterService': '.cluster_service',
+    'GenerateService': '.generate_service',
+}
+
+
+def __getattr__(name):
+    module = _SERVICES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+    return getattr(import_module(module, __name__), name)
@@ -0,0 +1,154 @@
+import numpy as np
+
+
+# 锚点吸附 (method='ANCHOR') 的三个阶段，全部基于 N x A 的"样本到锚点距离"矩阵做批量数组运算：
+#   Stage 1 全局共识：原始距离最近的锚点与均值归一化后最近的锚点一致且距离 < 0.6 时直接锁定
+#   Stage 2 动态重判：其余样本按 (1 - d) / (1 - Q25) 取最优锚点，>= 0.75 归入该类，否则为噪音
+#   Stage 3 类别平衡：每次把 "富裕组 (A) 样本 -> 贫困组 (B) 锚点" 中归一化相似度最高的一对迁移过去
+CONSENSUS_HARD_LIMIT = 0.6
+STAGE2_MIN_NORM_SIM = 0.75
+MAX_BALANCE_ITERS = 25
+
+# Stage 3 在每列的有序队列中逐块向后查找第一个 A 组样本的初始块大小
+_SCAN_CHUNK = 64
+
+
+def _first_valid(order, valid_rows, start):
+    """order[start:] 中第一个 valid_rows 为 True 的位置，没有时返回 -1 (分块扫描，通常第一块即命中)"""
+    n = len(order)
+    chunk = _SCAN_CHUNK
+    pos = start
+    while pos < n:
+        stop = min(n, pos + chunk)
+        hit = valid_rows[order[pos:stop]]
+        if hit.any():
+            return pos + int(np.argmax(hit))
+        pos = stop
+        chunk *= 4
+    return -1
+
+
+def adsorb_to_anchors(anchor_dists, anchor_indices, anchor_labels, n_samples, max_balance_iters=MAX_BALANCE_ITERS,
+                      hard_limit=CONSENSUS_HARD_LIMIT, min_norm_sim=STAGE2_MIN_NORM_SIM, verbose=True):
+    """
+    anchor_dists: (n_samples, A) 所有样本到各锚点的融合距离，列顺序与 anchor_indices 一致
+    anchor_indices: 锚点在矩阵中的行号；anchor_labels: 对应的类别编号 (可重复)
+    hard_limit / min_norm_sim: Stage 1 的距离上限与 Stage 2 的最低归一化相似度 (默认值针对 UMAP 降维坐标上的融合距离)
+    返回 labels (int 数组)：锚点为自身类别，其余样本为吸附到的锚点类别或 -1。
+
+    结果与逐样本循环的旧实现逐一相同，包括各处 argmin/argmax 取第一个最值的平局规则：
+    Stage 3 中同值时取样本行号最小者，再取锚点顺序靠前者 (即旧实现子矩阵按行展开后的第一个最大值)。
+    """
+    anchor_dists = np.asarray(anchor_dists)
+    anchor_indices = np.asarray(anchor_indices, dtype=int)
+    col_labels = np.asarray(anchor_labels, dtype=int)
+
+    labels = np.full(n_samples, -1, dtype=int)
+    labels[anchor_indices] = col_labels
+    is_anchor = np.zeros(n_samples, dtype=bool)
+    is_anchor[anchor_indices] = True
+
+    anchor_means = np.maximum(np.mean(anchor_dists, axis=0), 1e-6)
+
+    # --- Stage 1: 全局共识筛选 ---
+    idx_raw = np.argmin(anchor_dists, axis=1)
+    idx_norm = np.argmin(anchor_dists / anchor_means, axis=1)
+    best_raw = anchor_dists[np.arange(n_samples), idx_raw]
+    confirmed = (~is_anchor) & (idx_raw == idx_norm) & (best_raw < hard_limit)
+    labels[confirmed] = col_labels[idx_raw[confirmed]]
+
+    # --- Stage 2: 基于剩余样本的动态 Q75 重判 ---
+    remaining = np.where((~is_anchor) & (~confirmed))[0]
+    if len(remaining) > 0:
+        if verbose:
+            print(f"  -> Stage 1 锁定了 {int(confirmed.sum())} 个样本，剩余 {len(remaining)} 个样本进入 Stage 2...")
+        remaining_dists = anchor_dists[remaining]
+        anchor_q25_dynamic = np.maximum(np.percentile(remaining_dists, 25, axis=0), 1e-6)
+        sims_q75 = np.maximum(1.0 - anchor_q25_dynamic, 1e-6)
+        norm_sims = (1.0 - remaining_dists) / sims_q75
+        best_idx = np.argmax(norm_sims, axis=1)
+        best_norm = norm_sims[np.arange(len(remaining)), best_idx]
+        labels[remaining] = np.where(best_norm >= min_norm_sim, col_labels[best_idx], -1)
+    elif verbose:
+        print("  -> Stage 1 已覆盖所有样本，跳过 Stage 2。")
+
+    # --- Stage 3: 类别平衡调整 (Class Balancing) ---
+    if verbose:
+        print("  -> 执行 Stage 3: 类别平衡调整...")
+    iter_count = _balance(anchor_dists, anchor_means, col_labels, labels, max_balance_iters)
+    if verbose:
+        print(f"  -> Stage 3 完成，共执行 {iter_count} 次迁移调整。")
+    return labels
+
+
+def _balance(anchor_dists, anchor_means, col_labels, labels, max_balance_iters):
+    """
+    Stage 3 (原地修改 labels)，返回迁移次数。
+
+    每个锚点列预先按 (归一化相似度降序, 样本行号升序) 排好一条静态优先队列；每轮只需在
+    B 组锚点各自的队列里找第一个当前属于 A 组的样本 (分块扫描，通常只看队首几个)，
+    再按 (相似度, 行号, 锚点顺序) 比较各列队首即得到旧实现中整块子矩阵的 argmax。
+    类别计数随每次迁移增量更新；迁移只发生在锚点类别之间，总数在整个阶段保持不变。
+    """
+    n_samples, n_anchors = anchor_dists.shape
+    # 类别按锚点顺序首次出现的次序编号 (与旧实现中 current_counts 的遍历顺序一致)
+    label_order = list(dict.fromkeys(int(l) for l in col_labels))
+    label_pos = {l: k for k, l in enumerate(label_order)}
+    col_group = np.array([label_pos[int(l)] for l in col_labels], dtype=int)
+
+    group_of = np.full(n_samples, -1, dtype=int)
+    for l, k in label_pos.items():
+        group_of[labels == l] = k
+    counts = np.bincount(group_of[group_of >= 0], minlength=len(label_order))
+    total_assigned = int(counts.sum())
+    if total_assigned == 0:
+        return 0
+
+    anchor_sim_means = np.maximum(1.0 - anchor_means, 1e-6)
+    norm_sims = (1.0 - anchor_dists) / anchor_sim_means
+    rows = np.arange(n_samples)
+    orders = {}
+
+    threshold_ratio = total_assigned / 10.0
+    threshold_absolute = 4
+    iter_count = 0
+    while iter_count < max_balance_iters:
+        is_poor = (counts <= threshold_absolute) | (counts <= threshold_ratio)
+        if is_poor.all() or not is_poor.any():
+            if not is_poor.any():
+                print(f"    [Iter {iter_count}] 平衡完成：所有类别数量均满足要求。")
+            else:
+                print(f"    [Iter {iter_count}] 停止平衡：没有富裕组 (A组) 可供提取。")
+            break
+
+        # 当前属于 A 组 (富裕) 的样本
+        rich = np.zeros(n_samples, dtype=bool)
+        member = group_of >= 0
+        rich[member] = ~is_poor[group_of[member]]
+
+        best = None
+        for j in range(n_anchors):
+            if not is_poor[col_group[j]]:
+                continue
+            order = orders.get(j)
+            if order is None:
+                order = orders[j] = np.lexsort((rows, -norm_sims[:, j]))
+            # 迁移走的样本之后可能随类别一起重新回到 A 组，因此不做出队，每轮从队首查找
+            pos = _first_valid(order, rich, 0)
+            if pos < 0:
+                continue
+            r = int(order[pos])
+            key = (-norm_sims[r, j], r, j)
+            if best is None or key < best:
+                best = key
+        if best is None:
+            break
+
+        _, r, j = best
+        src, dst = group_of[r], col_group[j]
+        counts[src] -= 1
+        counts[dst] += 1
+        group_of[r] = dst
+        labels[r] = col_labels[j]
+        iter_count += 1
+    return iter_count
@@ -0,0 +1,222 @@
+import os
+import atexit
+import threading
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor, CancelledError
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from .projection_service import reduce_embeddings
+
+
+# 参与评估的文献数低于该值时在当前进程内串行降维 (进程启动与结果回传的开销大于收益)，
+# 可用 LITREVIEW_CANDIDATE_MIN_PAPERS 覆盖
+DEFAULT_PARALLEL_MIN_PAPERS = 200
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def configured_workers() -> int:
+    """
+    候选方案降维的进程数：LITREVIEW_CANDIDATE_WORKERS，默认取 CPU 核数，<= 1 表示在当前进程内串行。
+    池按该值创建一次，不随单次调用的任务数 (成功生成的锚点方案数) 变化。
+    """
+    return max(0, _env_int('LITREVIEW_CANDIDATE_WORKERS', os.cpu_count() or 1))
+
+
+# ----------------------------------------------------------------------
+# 子进程侧
+# ----------------------------------------------------------------------
+def _worker_init(n_threads):
+    """
+    子进程初始化：按进程数均分 BLAS / OpenMP / numba 线程，避免过量订阅。
+    反序列化本函数时子进程已导入本模块 (numpy / scipy / umap 随之载入)，BLAS 与 OpenMP 的线程池
+    已按默认宽度初始化，此时再写 OMP_NUM_THREADS 等环境变量不再生效，因此用 threadpoolctl
+    (scikit-learn 的依赖) 直接限制已载入的库；环境变量仍然写入，覆盖之后才载入的库。
+    """
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ[var] = str(n_threads)
+    from threadpoolctl import threadpool_limits
+    threadpool_limits(limits=n_threads)
+    try:
+        import numba
+        numba.set_num_threads(min(n_threads, numba.config.NUMBA_NUM_THREADS))
+    except Exception:
+        pass
+
+
+def _assemble(base, positions, anchor_vecs):
+    """按 sorted(标题) 拼出向量矩阵：语料行取自共享矩阵 (positions >= 0)，其余行依次为锚点向量"""
+    emb = np.empty((len(positions), base.shape[1]), dtype=base.dtype)
+    corpus_rows = positions >= 0
+    emb[corpus_rows] = base[positions[corpus_rows]]
+    if anchor_vecs is not None:
+        emb[~corpus_rows] = anchor_vecs
+    return emb
+
+
+def _reduce(titles, embeddings, n_dim_reduce):
+    """与 embed_and_reduce_documents(预计算向量) 相同的降维；子进程只需导入 numpy / umap"""
+    print(f"正在处理 {len(titles)} 篇文章...")
+    clusterable_embedding, _ = reduce_embeddings(embeddings, n_dim_reduce)
+    return {title: clusterable_embedding[i].tolist() for i, title in enumerate(titles)}
+
+
+def _worker_reduce(titles, spec, positions, anchor_vecs, n_dim_reduce):
+    """挂载主进程共享的语料矩阵 (只读)，拼出本方案本章节的向量后做 UMAP 降维"""
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        base = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        embeddings = _assemble(base, positions, anchor_vecs)
+        del base
+    finally:
+        shm.close()
+    return _reduce(titles, embeddings, n_dim_reduce)
+
+
+# ----------------------------------------------------------------------
+# 主进程侧
+# ----------------------------------------------------------------------
+class CandidatePool:
+    """
+    锚点候选方案评估的进程池。
+
+    各方案 x 各章节的 UMAP 降维互相独立，分发给子进程并行执行；语料向量矩阵每个章节只放一份
+    到共享内存中，子进程按名称挂载只读视图，只有锚点向量 (每个方案 2-4 行) 随任务传递。
+    池只启动一次 (spawn)，第一轮与各 label 的第二轮 (可在多个线程中并发) 复用同一组进程。
+    关闭后不会再重新启动，仍持有该池的调用方会收到 BrokenProcessPool 并改为串行。
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.n_threads = max(1, (os.cpu_count() or 1) // max(1, workers))
+        self._executor = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._closed:
+                raise BrokenProcessPool("候选方案评估进程池已关闭")
+            if self._executor is None:
+                print(f"🚀 正在启动候选方案评估进程池: {self.workers} 个进程 × {self.n_threads} 线程")
+                # spawn：Windows 与 Linux 行为一致，也避免 fork 已加载 torch 的父进程
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=mp.get_context('spawn'),
+                    initializer=_worker_init,
+                    initargs=(self.n_threads,),
+                )
+            return self
+
+    def submit(self, fn, *args):
+        return self.start()._executor.submit(fn, *args)
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_candidate_pool() -> CandidatePool:
+    """进程内共享的候选方案池，按 configured_workers() 创建一次"""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = CandidatePool(configured_workers())
+        return _POOL
+
+
+def discard_candidate_pool(pool: CandidatePool = None):
+    """
+    池损坏 (子进程崩溃) 时丢弃，下次调用重新创建。传入 pool 时只在它仍是当前池时丢弃，
+    避免并发的多个调用方各自丢弃掉别人刚重建的新池。
+    """
+    global _POOL
+    with _POOL_LOCK:
+        if pool is not None and _POOL is not pool:
+            return
+        pool, _POOL = _POOL, None
+    if pool is not None:
+        pool.shutdown()
+
+
+@atexit.register
+def _shutdown_pool():
+    if _POOL is not None:
+        _POOL.shutdown()
+
+
+def _share(matrix):
+    shm = shared_memory.SharedMemory(create=True, size=max(1, matrix.nbytes))
+    np.ndarray(matrix.shape, dtype=matrix.dtype, buffer=shm.buf)[...] = matrix
+    return shm, (shm.name, matrix.shape, matrix.dtype.str)
+
+
+def reduce_candidate_sections(corpus_embeddings, requests, n_dim_reduce: int = 20):
+    """
+    requests: [(章节键, {标题: 文本})]，各锚点候选方案注入锚点后的章节文本；
+    返回与 requests 一一对应的 [{标题: 降维坐标}]，与逐个调用 embed_and_reduce_documents 的结果相同。
+
+    每个章节的语料向量只取一次 (各方案只相差锚点)，锚点按原先的顺序逐方案补编码 (编码在主进程内完成)；
+    文献数达到 LITREVIEW_CANDIDATE_MIN_PAPERS、进程数 > 1 且任务数 > 1 时，降维分发到 CandidatePool 并行执行。
+    """
+    from .corpus_embeddings import is_anchor_title
+
+    bases = {}
+    for key, docs in requests:
+        bases.setdefault(key, {}).update((t, text) for t, text in docs.items() if not is_anchor_title(t))
+    matrices = {}
+    for key, docs in bases.items():
+        titles = sorted(docs)
+        matrices[key] = ({t: i for i, t in enumerate(titles)}, corpus_embeddings.matrix_for(key, docs))
+
+    jobs = []
+    for key, docs in requests:
+        titles = sorted(docs)
+        row_of = matrices[key][0]
+        positions = np.array([row_of.get(t, -1) for t in titles], dtype=np.int64)
+        anchors = [docs[t] for t in titles if is_anchor_title(t)]
+        anchor_vecs = corpus_embeddings.embed_extra(anchors) if anchors else None
+        jobs.append((key, titles, positions, anchor_vecs))
+
+    def run_serial():
+        return [_reduce(titles, _assemble(matrices[key][1], positions, anchor_vecs), n_dim_reduce)
+                for key, titles, positions, anchor_vecs in jobs]
+
+    n_papers = max((len(job[1]) for job in jobs), default=0)
+    if (configured_workers() <= 1 or len(jobs) <= 1
+            or n_papers < _env_int('LITREVIEW_CANDIDATE_MIN_PAPERS', DEFAULT_PARALLEL_MIN_PAPERS)):
+        return run_serial()
+
+    pool = get_candidate_pool()
+    shared = {}
+    try:
+        for key, (_, matrix) in matrices.items():
+            shared[key] = _share(matrix)
+        print(f"  [CANDIDATES] 并行降维 {len(jobs)} 个 (方案, 章节) 组合 ({min(pool.workers, len(jobs))} 个进程)")
+        futures = [pool.submit(_worker_reduce, titles, shared[key][1], positions, anchor_vecs, n_dim_reduce)
+                   for key, titles, positions, anchor_vecs in jobs]
+        return [f.result() for f in futures]
+    except (BrokenProcessPool, CancelledError) as e:
+        print(f"⚠️ 候选方案评估进程池异常，改为在当前进程内串行降维: {e!r}")
+        discard_candidate_pool(pool)
+        return run_serial()
+    finally:
+        for shm, _ in shared.values():
+            shm.close()
+            shm.unlink()
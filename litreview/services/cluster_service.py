@@ -1,13 +1,56 @@
 import os
 import json
 import threading
+from concurrent.futures import ThreadPoolExecutor
 import plotly
 from .core_algorithm import comprehensive_process_function
+from .corpus import load_corpus
+from .corpus_embeddings import CorpusEmbeddings
+from .embedding_cache import flush_embedding_caches
+from .online_assign import assign_new_papers
 from .visualize_and_gen_outline import construct_swimlane_data, plot_swimlane
 
+
+# 两轮聚类的融合距离权重与关键词提取的章节权重 (增量归类沿用同一套权重)
+ROUND1_WEIGHTS = {'main': 0.05, 'summary': 0.2, 'map': 0.55, 'lineage': 0.2, 'year': 0.0}
+ROUND2_WEIGHTS = {'main': 0.1, 'summary': 0.2, 'map': 0.4, 'lineage': 0.2, 'year': 0.1}
+ROUND1_KEYWORD_WEIGHTS = {'main': 0.1, 'summary': 0.2, 'map': 0.35, 'lineage': 0.35}
+ROUND2_KEYWORD_WEIGHTS = {'main': 0.2, 'summary': 0.3, 'map': 0.2, 'lineage': 0.3}
+
+
+# 第二轮各父类的子聚类并发数，可用 LITREVIEW_ROUND2_WORKERS 或请求参数 round2_workers 覆盖。
+# 每个分类以 LLM 调用为主 (锚点生成 + 关键词提取)，CPU 密集的降维交给共享的候选方案进程池，
+# LLM 请求经 system_service 的共享客户端与并发上限统一调度
+DEFAULT_ROUND2_WORKERS = 4
+
+
+def round2_workers(payload: dict = None) -> int:
+    value = (payload or {}).get('round2_workers') or os.environ.get('LITREVIEW_ROUND2_WORKERS', DEFAULT_ROUND2_WORKERS)
+    try:
+        return max(1, int(value))
+    except (TypeError, ValueError):
+        return DEFAULT_ROUND2_WORKERS
+
+
 class ClusterService:
     def __init__(self):
         self._status = {}
+        self._lock = threading.Lock()
+        # 正在读写 分类流程数据 的工作目录 -> 任务描述；同一目录同时只允许一个聚类任务或增量归类
+        self._busy = {}
+
+    def _claim_folder(self, folder_path, owner):
+        """占用工作目录，已被占用时返回占用者的描述，成功时返回 None"""
+        key = os.path.abspath(folder_path)
+        with self._lock:
+            if key in self._busy:
+                return self._busy[key]
+            self._busy[key] = owner
+            return None
+
+    def _release_folder(self, folder_path):
+        with self._lock:
+            self._busy.pop(os.path.abspath(folder_path), None)
 
     def start(self, payload: dict):
         """
@@ -22,6 +65,9 @@ class ClusterService:
         
         # 生成唯一 Task ID
         task_id = f"cluster_{os.getpid()}_{int(os.times().system)}"
+        busy = self._claim_folder(folder_path, f"聚类任务 {task_id}")
+        if busy:
+            return {"error": f"该工作目录正在执行{busy}，请等待其完成", "conflict": True}
         
         # 初始化状态
         self._status[task_id] = {
@@ -36,6 +82,44 @@ class ClusterService:
 
         return {"taskId": task_id}
 
+    def assign(self, payload: dict):
+        """
+        增量归类：把新加入 文献整理合集 的文献按已保存的锚点归入现有的两级分类，
+        不重新聚类、不调用 LLM；payload 可带 titles 指定要归类的文献。同步执行，通常数秒内返回。
+        校准一致率偏低时返回 low_confidence=True 且不写回结果 (written=False)，payload 带 force=True 时仍写入。
+        """
+        folder_path = payload.get('folder_path')
+        if not folder_path:
+             folder_path = os.environ.get('LITREVIEW_ACTIVE_FOLDER')
+
+        if not folder_path or not os.path.exists(folder_path):
+             return {"error": "Invalid or missing folder_path"}
+
+        # 聚类任务运行期间会整体重写 round1/round2_results.json 与泳道图，此时拒绝增量归类；
+        # 泳道图也在占用期间生成，避免与随后启动的聚类任务同时写同一个文件
+        busy = self._claim_folder(folder_path, "增量归类")
+        if busy:
+            return {"error": f"该工作目录正在执行{busy}，请等待其完成后再归类新文献", "conflict": True}
+        try:
+            round1, round2, report = assign_new_papers(
+                folder_path, ROUND1_WEIGHTS, ROUND2_WEIGHTS, titles=payload.get('titles'),
+                force=bool(payload.get('force'))
+            )
+            graph_json = None
+            if report['written'] and report['assigned']:
+                graph_json = self._render_swimlane(folder_path, round1.get('anchor', {}), round1.get('keywords', {}), round2)
+        finally:
+            flush_embedding_caches()
+            self._release_folder(folder_path)
+        return {
+            "assigned": report['assigned'],
+            "skipped": report['skipped'],
+            "calibration": report['calibration'],
+            "low_confidence": report['low_confidence'],
+            "written": report['written'],
+            "graph": graph_json,
+        }
+
     def status(self, task_id: str):
         return self._status.get(task_id, {"status": "not_found"})
 
@@ -50,12 +134,69 @@ class ClusterService:
                 update_dict["data"] = data
             self._status[task_id].update(update_dict)
 
+    def _update_label_status(self, task_id, label_id, state, message=""):
+        """
+        记录第二轮单个分类的进度 (pending / running / completed / failed)，
+        并按已结束的分类数把总进度映射到 50% -> 90%
+        """
+        with self._lock:
+            task = self._status.get(task_id)
+            if task is None:
+                return
+            labels = task.setdefault("labels", {})
+            labels[str(label_id)] = {"status": state, "message": message}
+            finished = sum(1 for v in labels.values() if v["status"] in ("completed", "failed"))
+            running = [k for k, v in labels.items() if v["status"] == "running"]
+            total = len(labels)
+            progress = 50 + int(finished / total * 40) if total else 50
+            summary = f"正在执行第二轮子类细分: 已完成 {finished}/{total} 个分类"
+            if running:
+                summary += f"，进行中: {', '.join(running)}"
+            task.update({"status": "processing", "progress": progress, "message": summary})
+
+    def _run_round2_label(self, task_id, label_id, **kwargs):
+        """单个父类的子聚类 (在线程池中执行)，返回 {'results', 'anchor', 'evaluation', 'keywords'}，失败时返回 None"""
+        self._update_label_status(task_id, label_id, "running", f"正在细分分类 {label_id}...")
+        print(f"\n\n======== Round 2: Sub-clustering for Label {label_id} ========")
+        try:
+            res2, anc2, eval2, kws2 = comprehensive_process_function(label=label_id, **kwargs)
+        except Exception as e:
+            print(f"  [ERROR] Failed to process Label {label_id}: {e}")
+            self._update_label_status(task_id, label_id, "failed", str(e))
+            return None
+        self._update_label_status(task_id, label_id, "completed", f"分类 {label_id} 细分完成")
+        return {
+            'results': res2,
+            'anchor': anc2,
+            'evaluation': eval2,
+            'keywords': kws2
+        }
+
+    def _render_swimlane(self, base_folder, anchor1, cluster_keywords_map1, sub_results_storage):
+        """生成泳道图并保存到 文献聚类方案/swimlane_chart.html，返回图表 JSON；没有可绘制的文献时返回 None"""
+        categories_dict, papers_dict = construct_swimlane_data(anchor1, cluster_keywords_map1, sub_results_storage)
+        if not papers_dict:
+            return None
+        fig = plot_swimlane(categories_dict, papers_dict)
+        graph_json = json.loads(fig.to_json())
+
+        # 保存图表为HTML
+        try:
+            cluster_scheme_dir = os.path.join(base_folder, "文献聚类方案")
+            os.makedirs(cluster_scheme_dir, exist_ok=True)
+            html_path = os.path.join(cluster_scheme_dir, "swimlane_chart.html")
+            fig.write_html(html_path)
+            print(f"Saved swimlane chart to {html_path}")
+        except Exception as e:
+            print(f"Failed to save chart HTML: {e}")
+        return graph_json
+
     def _run_analysis(self, task_id, folder_path, payload):
+        base_folder = folder_path
         try:
             self._update_status(task_id, "processing", 5, "正在准备文件...")
             
             # [Modified] Append "文献整理合集" to the base path
-            base_folder = folder_path
             folder_path = os.path.join(base_folder, "文献整理合集")
             if not os.path.exists(folder_path):
                 self._update_status(task_id, "failed", 0, f"Folder not found: {folder_path}")
@@ -68,18 +209,15 @@ class ClusterService:
             paper_desc = payload.get('paper_desc','暂未提供')
             
             # 配置权重
-            weights_config_1 = {
-                'main': 0.05, 'summary': 0.2, 'map': 0.55, 'lineage': 0.2, 'year': 0.0
-            }
-            weights_config_2 = {
-                'main': 0.1, 'summary': 0.2, 'map': 0.4, 'lineage': 0.2, 'year': 0.1
-            }
-            keyword_section_weights_1 = {
-                'main': 0.1, 'summary': 0.2, 'map': 0.35, 'lineage': 0.35
-            }
-            keyword_section_weights_2 = {
-                'main': 0.2, 'summary': 0.3, 'map': 0.2, 'lineage': 0.3
-            }
+            weights_config_1 = dict(ROUND1_WEIGHTS)
+            weights_config_2 = dict(ROUND2_WEIGHTS)
+            keyword_section_weights_1 = dict(ROUND1_KEYWORD_WEIGHTS)
+            keyword_section_weights_2 = dict(ROUND2_KEYWORD_WEIGHTS)
+
+            # 任务级语料向量：载入上次持久化的语料矩阵，只编码新增/变更的文献；各锚点方案与第二轮子聚类共享
+            # 文献整理合集只读取、解析一次，第一轮各阶段共用
+            corpus = load_corpus(folder_path)
+            corpus_embeddings = CorpusEmbeddings.for_folder(folder_path, parsed=corpus)
 
             # 第一轮：全局聚类
             self._update_status(task_id, "processing", 10, "正在执行第一轮全局聚类...")
@@ -92,6 +230,8 @@ class ClusterService:
                     keyword_section_weights=keyword_section_weights_1,
                     paper_desc=paper_desc,
                     folder_path=folder_path,
+                    corpus=corpus,
+                    corpus_embeddings=corpus_embeddings,
                     n_components=20,
                     k_penalty=0.02,
                     similarity_threshold=0.75
@@ -120,36 +260,35 @@ class ClusterService:
                 if isinstance(item, dict) and 'label' in item and item['label'] != -1
             )))
 
-            # 第二轮：对每个子类进行细分
+            # 第二轮：对每个子类进行细分 (各父类互相独立，按 round2_workers 并发执行)
             self._update_status(task_id, "processing", 50, "正在执行第二轮子类细分...")
-            sub_results_storage = {} 
-            
-            total_labels = len(labels_found)
-            for i, label_id in enumerate(labels_found):
-                progress = 50 + int((i / total_labels) * 40) # 50% -> 90%
-                self._update_status(task_id, "processing", progress, f"正在细分分类 {label_id}...")
-                print(f"\n\n======== Round 2: Sub-clustering for Label {label_id} ========")
-                try:
-                    res2, anc2, eval2, kws2 = comprehensive_process_function(
-                        method='KMEANS', 
-                        weights_config_2=weights_config_2,
-                        keyword_section_weights=keyword_section_weights_2,
-                        paper_desc=paper_desc,
-                        label=label_id,
-                        results=results1,
-                        n_components=20,
-                        k_penalty=0.01,
-                        similarity_threshold=0.75
-                    )
-                    
-                    sub_results_storage[label_id] = {
-                        'results': res2,
-                        'anchor': anc2,
-                        'evaluation': eval2,
-                        'keywords': kws2
-                    }
-                except Exception as e:
-                    print(f"  [ERROR] Failed to process Label {label_id}: {e}")
+            for label_id in labels_found:
+                self._update_label_status(task_id, label_id, "pending", "等待细分")
+
+            workers = min(round2_workers(payload), max(1, len(labels_found)))
+            print(f"\n\n======== Round 2: {len(labels_found)} 个分类，并发数 {workers} ========")
+            round2_kwargs = dict(
+                method='KMEANS',
+                weights_config_2=weights_config_2,
+                keyword_section_weights=keyword_section_weights_2,
+                paper_desc=paper_desc,
+                results=results1,
+                corpus_embeddings=corpus_embeddings,
+                n_components=20,
+                k_penalty=0.01,
+                similarity_threshold=0.75
+            )
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    label_id: executor.submit(self._run_round2_label, task_id, label_id, **round2_kwargs)
+                    for label_id in labels_found
+                }
+                # 按 label 顺序收集，输出与串行执行时一致
+                sub_results_storage = {}
+                for label_id, future in futures.items():
+                    outcome = future.result()
+                    if outcome is not None:
+                        sub_results_storage[label_id] = outcome
 
             # Save Round 2 results
             try:
@@ -160,26 +299,16 @@ class ClusterService:
 
             # 生成可视化
             self._update_status(task_id, "processing", 95, "正在生成可视化图表...")
-            categories_dict, papers_dict = construct_swimlane_data(anchor1, cluster_keywords_map1, sub_results_storage)
-            
-            if papers_dict:
-                fig = plot_swimlane(categories_dict, papers_dict)
-                graph_json = json.loads(fig.to_json())
-                
-                # 保存图表为HTML
-                try:
-                    cluster_scheme_dir = os.path.join(base_folder, "文献聚类方案")
-                    os.makedirs(cluster_scheme_dir, exist_ok=True)
-                    html_path = os.path.join(cluster_scheme_dir, "swimlane_chart.html")
-                    fig.write_html(html_path)
-                    print(f"Saved swimlane chart to {html_path}")
-                except Exception as e:
-                    print(f"Failed to save chart HTML: {e}")
-
+            graph_json = self._render_swimlane(base_folder, anchor1, cluster_keywords_map1, sub_results_storage)
+            if graph_json is not None:
                 # 完成
                 self._update_status(task_id, "completed", 100, "聚类分析完成", {"graph": graph_json})
             else:
                 self._update_status(task_id, "failed", 0, "No papers to plot")
 
         except Exception as e:
-            self._update_status(task_id, "failed", 0, f"Unexpected error: {str(e)}")
\ No newline at end of file
+            self._update_status(task_id, "failed", 0, f"Unexpected error: {str(e)}")
+        finally:
+            # 向量缓存索引在任务期间只标记待落盘，任务结束时统一写出一次
+            flush_embedding_caches()
+            self._release_folder(base_folder)
\ No newline at end of file
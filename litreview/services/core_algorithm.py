@@ -1,17 +1,30 @@
 import numpy as np
 import pandas as pd
 import torch
-from sentence_transformers import SentenceTransformer
-import umap
-from sklearn.metrics.pairwise import cosine_distances
 from sklearn.cluster import DBSCAN, KMeans
 import plotly.graph_objects as go
 import os
 import re
 import jieba
 import jieba.posseg as pseg
-from sklearn.metrics import silhouette_score
 from litreview.services.system_service import  AI_call
+from litreview.services.embedding_service import encode_texts
+from litreview.services.embedding_cache import resolve_cache_dir
+from litreview.services.corpus_embeddings import CorpusEmbeddings, SECTION_HEADINGS, SECTION_KEYS, section_token_budget
+from litreview.services.corpus import load_corpus
+from litreview.services.summary_store import parse_year
+from litreview.services.anchor_adsorption import adsorb_to_anchors
+from litreview.services.density_search import DBSCANProfile, HDBSCANTreeCache, search_dbscan_eps
+from litreview.services.kmeans_search import make_kmeans, sweep_k
+from litreview.services.projection_service import ProjectionService, reduce_embeddings
+from litreview.services.candidate_pool import reduce_candidate_sections
+from litreview.services.fused_distance import (
+    fused_distance_matrix,
+    fused_distance_columns,
+    fused_knn_graph,
+    resolve_graph_mode,
+    min_row_degree,
+)
 import json
 import time
 from concurrent.futures import ThreadPoolExecutor
@@ -318,7 +331,7 @@ def extract_contrastive_keywords(
 
 
 
-def extract_sections_to_dict(folder_path, section_start_str):
+def extract_sections_to_dict(folder_path, section_start_str, corpus=None):
     """
     读取指定文件夹下的所有 .md 文件，提取标题和指定章节内容，构建字典。
 
@@ -326,81 +339,85 @@ def extract_sections_to_dict(folder_path, section_start_str):
     - folder_path: str, 包含md文件的文件夹路径
     - section_start_str: str, 指定章节的开始字符串 (例如 "## 论文主要内容" 或 "论文主要内容")
                          注意：函数会严格匹配该字符串，如果你的md里是二级标题，建议输入 "## 论文主要内容"
+    - corpus: ParsedCorpus, 已载入的语料；不提供时通过 load_corpus 获取 (同一目录进程内缓存，文件未变化时不重复读取)
 
     返回:
     - result_dict: dict, {文章标题: 指定章节内容}
     """
-    result_dict = {}
-
     # 1. 检查文件夹是否存在
-    if not os.path.exists(folder_path):
-        print(f"错误: 文件夹不存在 - {folder_path}")
-        return {}
+    if corpus is None:
+        if not os.path.exists(folder_path):
+            print(f"错误: 文件夹不存在 - {folder_path}")
+            return {}
+        corpus = load_corpus(folder_path)
+
+    # 2. 章节内容由 ParsedCorpus 统一解析 (每个章节只扫描一次)
+    print(f"在 {folder_path} 中发现 {len(corpus)} 个 Markdown 文件，开始处理...")
+    sections = corpus.section(section_start_str)
+    for title in corpus.empty_titles(section_start_str):
+        print(f"  [跳过] 文件 '{title}' 中找到章节 '{section_start_str}' 但内容为空。")
+
+    if "年份" in section_start_str:
+        result_dict = {}
+        for title, section_content in sections.items():
+            year = parse_year(section_content)
+            if year is not None:
+                result_dict[title] = year
+            else:
+                print(f"  [跳过] 文件 '{title}' 未在章节中找到年份。")
+    else:
+        result_dict = dict(sections)
 
-    # 2. 获取所有 .md 文件
-    files = sorted([f for f in os.listdir(folder_path) if f.endswith('.md')])
-    print(f"在 {folder_path} 中发现 {len(files)} 个 Markdown 文件，开始处理...")
+    print(f"处理完成。成功提取 {len(result_dict)} 篇文章的指定内容。")
+    return result_dict
 
-    count_success = 0
-    
-    for filename in files:
-        file_path = os.path.join(folder_path, filename)
-        
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                
-            # --- A. 提取标题 ---
-            # 逻辑：匹配 "# 论文整理：" 或 "# 论文整理:" 开头，直到遇到下一个换行符加#或者文件结束
-            # re.DOTALL 模式下 . 可以匹配换行符，但这里我们用非贪婪匹配 .*?
-            # (?=\n#|\Z) 是正向预查，表示“后面必须跟着换行符+# 或者 文件结束”，但不包含在匹配结果中
-            title_pattern = r'#\s*论文整理[：:]\s*(.*?)(?=\n#|\Z)'
-            title_match = re.search(title_pattern, content, re.DOTALL)
-            
-            if title_match:
-                # 获取匹配组并去除首尾空白
-                title = title_match.group(1).strip()
-            else:
-                # 如果没找到标准标题格式，使用文件名作为备选标题
-                title = os.path.splitext(filename)[0]
-                # print(f"  [警告] 文件 '{filename}' 未找到标准标题格式，使用文件名代替。")
-
-            # --- B. 提取指定章节内容 ---
-            # 逻辑：匹配输入的 start_str，直到遇到下一个 "##" 或者文件结束
-            # re.escape 用于自动转义输入字符串中的特殊字符（如 * ? 等）
-            # \s* 匹配标题后可能存在的换行
-            section_pattern = re.escape(section_start_str) + r'\s*(.*?)(?=\n\s*##|\Z)'
-            section_match = re.search(section_pattern, content, re.DOTALL)
-
-            if section_match:
-                section_content = section_match.group(1).strip()
-                
-                # 只有当内容不为空时才加入字典
-                if section_content:
-                    if "年份" in section_start_str:
-                        cleaned = re.sub(r"\([^)]*\)", "", section_content)
-                        cleaned = re.sub(r"（[^）]*）", "", cleaned)
-                        years = re.findall(r"(?<!\d)(?:19|20)\d{2}(?!\d)", cleaned)
-                        if years:
-                            result_dict[title] = int(years[-1])
-                            count_success += 1
-                        else:
-                            print(f"  [跳过] 文件 '{title}' 未在章节中找到年份。")
-                    else:
-                        result_dict[title] = section_content
-                        count_success += 1
-                else:
-                    print(f"  [跳过] 文件 '{title}' 中找到章节 '{section_start_str}' 但内容为空。")
-            else:
-                # 如果没找到该章节，可以选择跳过或记录日志
-                # print(f"  [跳过] 文件 '{title}' 中未找到章节: {section_start_str}")
-                pass
 
-        except Exception as e:
-            print(f"  [错误] 处理文件 '{filename}' 时出错: {e}")
+def embed_and_reduce_documents(
+    docs_dict: dict,
+    n_dim_reduce: int = 20,
+    model_name: str = 'BAAI/bge-m3',
+    embedding_cache_dir: str = None,
+    embeddings: np.ndarray = None,
+    return_embeddings: bool = False,
+    max_tokens: int = None,
+):
+    """
+    只做向量化 + UMAP 降维，返回多视图融合所需的 {标题: 降维坐标(list)}。
+    embedding_cache_dir 为磁盘向量缓存目录，未提供时按 LITREVIEW_WORKDIR 推断。
+    embeddings 为与 sorted(docs_dict) 对齐的预计算向量矩阵，提供时跳过编码。
+    max_tokens 为单篇文本的 token 预算，超出时切成重叠窗口编码后 mean pooling。
+    return_embeddings=True 时额外返回 (titles, 高维向量, 降维矩阵, 投影服务)，供需要继续聚类/可视化的调用方复用；
+    投影服务缓存了高维向量的 kNN 图，后续对同一批向量的 UMAP 投影不再重复计算近邻。
+    """
 
-    print(f"处理完成。成功提取 {count_success} 篇文章的指定内容。")
-    return result_dict
+    # 1. 数据准备
+    titles = sorted(list(docs_dict.keys()))
+    contents = [docs_dict[t] for t in titles]
+    print(f"正在处理 {len(titles)} 篇文章...")
+
+    # 2. 向量化 (模型由进程级注册表统一加载，同一进程内只加载一次)
+    if embeddings is not None:
+        if len(embeddings) != len(titles):
+            raise ValueError(f"预计算向量行数 ({len(embeddings)}) 与文档数 ({len(titles)}) 不一致")
+        print("使用预计算的高维向量，跳过编码。")
+    else:
+        # 强制使用 CPU，避免 DirectML/CUDA 的兼容性问题
+        device = 'cpu'
+        print("正在生成高维向量...")
+        # CPU 批次大小建议保守一点
+        batch_size = 32
+        
+        cache_dir = embedding_cache_dir or resolve_cache_dir()
+        embeddings = encode_texts(contents, model_name=model_name, device=device, batch_size=batch_size, cache_dir=cache_dir,
+                                  max_tokens=max_tokens)
+    
+    # 3. 第一次降维 (UMAP)
+    clusterable_embedding, projector = reduce_embeddings(embeddings, n_dim_reduce)
+
+    coords = {title: clusterable_embedding[i].tolist() for i, title in enumerate(titles)}
+    if return_embeddings:
+        return coords, (titles, embeddings, clusterable_embedding, projector)
+    return coords
 
 
 def analyze_documents_to_vec(
@@ -408,77 +425,59 @@ def analyze_documents_to_vec(
     n_dim_reduce: int = 20, 
     method: str = 'DBSCAN', 
     model_name: str = 'BAAI/bge-m3', 
+    embedding_cache_dir: str = None,
+    embeddings: np.ndarray = None,
+    cluster: bool = True,
+    project_3d: bool = True,
+    max_tokens: int = None,
     **kwargs
 ) -> dict:
     """
     对文档进行BERT向量化、降维、聚类(DBSCAN/HDBSCAN/KMEANS)并进行3D可视化。
     噪音点(-1)将以浅灰色半透明显示。
+    embedding_cache_dir 为磁盘向量缓存目录，未提供时按 LITREVIEW_WORKDIR 推断。
+    embeddings 为与 sorted(docs_dict) 对齐的预计算向量矩阵，提供时跳过编码。
+    max_tokens 为单篇文本的 token 预算，超出时切成重叠窗口编码后 mean pooling。
+    cluster / project_3d 为 False 时跳过单视图聚类 / 3D 降维，对应位置返回 -1 / None；
+    只需要降维坐标时请直接使用 embed_and_reduce_documents。
     """
     
-    # 1. 数据准备
-    titles = sorted(list(docs_dict.keys()))
-    contents = [docs_dict[t] for t in titles]
-    print(f"正在处理 {len(titles)} 篇文章...")
+    # 1-3. 向量化 + 第一次降维
+    _, (titles, embeddings, clusterable_embedding, projector) = embed_and_reduce_documents(
+        docs_dict,
+        n_dim_reduce=n_dim_reduce,
+        model_name=model_name,
+        embedding_cache_dir=embedding_cache_dir,
+        embeddings=embeddings,
+        return_embeddings=True,
+        max_tokens=max_tokens,
+    )
 
-    # 2. 模型加载
-    print(f"正在准备语义模型: {model_name} ...")
-    
-    # 强制使用 CPU，避免 DirectML/CUDA 的兼容性问题
-    device = 'cpu'
-    print(f"🖥️  当前使用计算设备: {str(device).upper()}")
+    if not cluster:
+        labels = np.full(len(titles), -1, dtype=int)
+        print("跳过单视图聚类。")
+    else:
+        labels = _cluster_reduced_embedding(clusterable_embedding, method, len(titles), **kwargs)
 
+    # 6. 第二次降维 (可视化)
+    embedding_3d = None
+    if project_3d:
+        print("正在进行第二次降维 (UMAP -> 3维可视化)...")
+        embedding_3d = projector.fit_transform(n_components=3, n_neighbors=15, min_dist=0.1)
 
-    project_root = os.getcwd()
-    models_dir = os.path.join(project_root, "models")
-    local_folder_name = model_name.replace("/", "_")
-    local_model_path = os.path.join(models_dir, local_folder_name)
-    
-    embedder = None
-    if os.path.exists(local_model_path) and len(os.listdir(local_model_path)) > 0:
-        print(f"✅ 检测到本地模型: {local_model_path}")
-        try:
-            embedder = SentenceTransformer(local_model_path, device=device)
-        except Exception:
-            print("❌ 本地加载失败，准备重新下载...")
-    
-    if embedder is None:
-        print(f"🌐 正在下载模型: {model_name}")
-        embedder = SentenceTransformer(model_name, device=device)
-        if not os.path.exists(models_dir):
-            os.makedirs(models_dir)
-        embedder.save(local_model_path)
-        print("✅ 模型已缓存到本地。")
-
-    # 3. 向量化
-    print("正在生成高维向量...")
-    # CPU 批次大小建议保守一点
-    batch_size = 32
-    
-    embeddings = embedder.encode(contents, show_progress_bar=True, batch_size=batch_size, device=device)
-    
-    # 4. 第一次降维 (UMAP)
-    # 动态调整 n_components：不能超过样本数 - 2（预留一点空间）
-    # 同时 n_neighbors 也不能超过样本数
-    n_samples = len(embeddings)
-    safe_n_components = min(n_dim_reduce, n_samples - 2) if n_samples > 2 else min(n_dim_reduce, n_samples)
-    safe_n_neighbors = min(15, n_samples - 1) if n_samples > 1 else 1
-    
-    # 如果样本极少，直接不降维或者做极简处理
-    if n_samples <= n_dim_reduce:
-        print(f"样本数 ({n_samples}) <= 目标维度 ({n_dim_reduce})，跳过 UMAP 降维，直接使用原始向量...")
-        clusterable_embedding = embeddings
-    else:
-        print(f"正在进行第一次降维 (UMAP -> {safe_n_components}维)...")
-        reducer_cluster = umap.UMAP(
-            n_neighbors=safe_n_neighbors, 
-            n_components=safe_n_components, 
-            metric='cosine', 
-            min_dist=0.0,
-            random_state=42,
-            n_jobs=1
-        )
-        clusterable_embedding = reducer_cluster.fit_transform(embeddings)
-    
+    # 8. 返回结果
+    result_dict = {}
+    for i, title in enumerate(titles):
+        coords_20d = clusterable_embedding[i].tolist()
+        coords_3d = embedding_3d[i].tolist() if embedding_3d is not None else None
+        label = int(labels[i])
+        result_dict[title] = [coords_20d, coords_3d, label]
+        
+    return result_dict
+
+
+def _cluster_reduced_embedding(clusterable_embedding, method: str, num_of_papers: int, **kwargs):
+    """在降维后的向量上执行单视图聚类，返回标签数组"""
     # --- 5. 聚类 (新增 HDBSCAN 支持) ---
     print(f"正在执行聚类 ({method.upper()})...")
     
@@ -494,7 +493,6 @@ def analyze_documents_to_vec(
         try:
             from sklearn.cluster import HDBSCAN
             # HDBSCAN 参数：min_cluster_size 是核心参数
-            num_of_papers = len(titles)
             min_cluster_size = kwargs.get('min_cluster_size', max(5, num_of_papers // 10))
             min_samples = kwargs.get('min_samples', 3) 
             # cluster_selection_epsilon 用于控制微观合并程度，类似 DBSCAN 的 eps
@@ -534,35 +532,23 @@ def analyze_documents_to_vec(
     num_clusters = len(set(labels)) - (1 if -1 in labels else 0)
     print(f"聚类完成，共发现 {num_clusters} 个聚类 (Label -1 为噪音)。")
 
-    # 6. 第二次降维 (可视化)
-    print("正在进行第二次降维 (UMAP -> 3维可视化)...")
-    reducer_viz = umap.UMAP(
-        n_neighbors=15,
-        n_components=3, 
-        metric='cosine',
-        min_dist=0.1,
-        random_state=42,
-        n_jobs=1
-    )
-    embedding_3d = reducer_viz.fit_transform(embeddings)
-
-    # 8. 返回结果
-    result_dict = {}
-    for i, title in enumerate(titles):
-        coords_20d = clusterable_embedding[i].tolist()
-        coords_3d = embedding_3d[i].tolist()
-        label = int(labels[i])
-        result_dict[title] = [coords_20d, coords_3d, label]
-        
-    return result_dict
-
-
-def process_and_classify_target_section(folder_path, target_section, method='DBSCAN',anchor_docs=None,  **kwargs):
+    return labels
 
 
+def process_and_classify_target_section(folder_path, target_section, method='DBSCAN',anchor_docs=None, docs_data=None, corpus_embeddings=None, section_key=None, vectors_only=False, inputs_only=False, **kwargs):
+    """
+    提取(或复用已提取的)章节内容，注入锚点后向量化。
+    - docs_data: 已提取的 {标题: 章节内容}，提供时不再重复扫描目录
+    - corpus_embeddings / section_key: 任务级语料向量 (CorpusEmbeddings) 及章节键，提供时只需补编码锚点
+    - vectors_only: 只返回 {标题: 降维坐标}，跳过单视图聚类与 3D 降维 (多视图融合只用到降维坐标)
+    - inputs_only: 只返回注入锚点后的 docs_data，编码与降维由调用方统一批量执行 (reduce_candidate_sections)
+    """
     
     # 调用函数
-    docs_data = extract_sections_to_dict(folder_path, target_section)
+    if docs_data is None:
+        docs_data = extract_sections_to_dict(folder_path, target_section)
+    else:
+        docs_data = dict(docs_data) # 拷贝一份，锚点注入不影响调用方的原始字典
     if anchor_docs:
         # 仅在非年份章节打印详细日志，避免刷屏
         if "年份" not in target_section:
@@ -581,7 +567,7 @@ def process_and_classify_target_section(folder_path, target_section, method='DBS
                 # 其他章节使用 AI 生成的描述文本
                 docs_data[anchor_title] = text
 
-    if "年份" in target_section:
+    if "年份" in target_section or inputs_only:
         return docs_data
  
     # 打印前2个结果看看
@@ -598,12 +584,31 @@ def process_and_classify_target_section(folder_path, target_section, method='DBS
     
     # 2. 调用函数
     # 使用 DBSCAN (注意：eps 参数需要根据数据密度调整，如果聚类全是-1，尝试调大 eps)
+    cache_dir = resolve_cache_dir(folder_path)
+    if not section_key:
+        section_key = {heading: key for key, heading in SECTION_HEADINGS.items()}.get(target_section)
+    max_tokens = section_token_budget(section_key) if section_key else None
+    embeddings = None
+    if corpus_embeddings is not None and section_key:
+        embeddings = corpus_embeddings.matrix_for(section_key, input_data)
+    if vectors_only:
+        results = embed_and_reduce_documents(
+            input_data,
+            n_dim_reduce=20,
+            embedding_cache_dir=cache_dir,
+            max_tokens=max_tokens,
+            embeddings=embeddings,
+        )
+        return results, docs_data
     if method =='DBSCAN':
         eps = kwargs.get('eps', 0.5)
         min_samples = kwargs.get('min_samples', 3)
         results = analyze_documents_to_vec(
             input_data, 
             n_dim_reduce=20, 
+            embedding_cache_dir=cache_dir,
+            max_tokens=max_tokens,
+            embeddings=embeddings,
             method=method, 
             eps=eps,           # DBSCAN 邻域半径 (重要参数)
             min_samples=min_samples      # 最小样本数
@@ -614,6 +619,9 @@ def process_and_classify_target_section(folder_path, target_section, method='DBS
         results = analyze_documents_to_vec(
             input_data, 
             n_dim_reduce=20, 
+            embedding_cache_dir=cache_dir,
+            max_tokens=max_tokens,
+            embeddings=embeddings,
             method=method, 
             n_clusters=n_clusters
             
@@ -624,6 +632,9 @@ def process_and_classify_target_section(folder_path, target_section, method='DBS
         results = analyze_documents_to_vec(
                 input_data, 
                 n_dim_reduce=20, 
+                embedding_cache_dir=cache_dir,
+                max_tokens=max_tokens,
+                embeddings=embeddings,
                 method=method, 
                 min_cluster_size=3,
                 min_samples=min_samples,
@@ -645,6 +656,8 @@ def multi_view_clustering_and_visualize(
     docs_text_dict: dict = None, # [新增] 用于提取关键词的原文 {title: full_text}
     visualize: bool = True,
     keyword_section_weights: dict = None,
+    project_coords: bool = True,
+    assigned_labels: dict = None,
     **kwargs
 ) -> dict:
     """
@@ -654,7 +667,13 @@ def multi_view_clustering_and_visualize(
     - data_dict: dict, {标题: [vec_main(20d), vec_summary(20d), vec_map(20d), vec_lineage(20d), year(int)]}
     - weights_config: dict, 权重配置，例如 {'main': 0.1, 'summary': 0.1, 'map': 0.5, 'lineage': 0.2, 'year': 0.1}
     - method: str, 'DBSCAN', 'HDBSCAN', 'KMEANS'
-    - **kwargs: 传递给聚类算法的参数 (如 eps, min_cluster_size, n_clusters)
+    - **kwargs: 传递给聚类算法的参数 (如 eps, min_cluster_size, n_clusters)；
+                graph_mode='dense'|'knn'|'auto' 选择稠密矩阵或稀疏 kNN 图 (默认读 LITREVIEW_CLUSTER_GRAPH，
+                auto 时超过 LITREVIEW_KNN_MIN_PAPERS 篇改用 kNN 图)，knn_neighbors 为每个视图的近邻数
+    - project_coords: 是否做 3D 投影；为 False 且 visualize=False 时返回的坐标为 None。
+                ANCHOR 模式只计算 N x 锚点数 的距离，完整矩阵 / kNN 图只在需要投影时才构建
+    - assigned_labels: {标题: label}，提供时跳过聚类，直接在给定标签上提取关键词 / 做 3D 投影
+                (候选方案先只聚类打分，选出最优方案后再补全关键词与坐标)
 
     返回:
     - result_dict: {标题: [[x, y, z], label]}
@@ -678,126 +697,57 @@ def multi_view_clustering_and_visualize(
 
     # 将数据拆分为 5 个独立的矩阵/数组
     # 假设输入 list 顺序严格对应：[main, summary, map, lineage, year]
-    vecs_main = np.array([v[0] for v in raw_values])
-    vecs_summary = np.array([v[1] for v in raw_values])
-    vecs_map = np.array([v[2] for v in raw_values])
-    vecs_lineage = np.array([v[3] for v in raw_values])
-    val_years = np.array([v[4] for v in raw_values]).reshape(-1, 1)
-
-    # 2. 计算各维度的距离矩阵 (N x N)
-    print("正在计算各分视图的距离矩阵...")
-    
-    # A. 文本向量使用余弦距离 (Cosine Distance)
-    # cosine_distances 结果范围是 [0, 2]，通常语义相似都在 [0, 1] 之间
-    d_main = cosine_distances(vecs_main)
-    d_summary = cosine_distances(vecs_summary)
-    d_map = cosine_distances(vecs_map)
-    d_lineage = cosine_distances(vecs_lineage)
-    
-    # B. 年份使用数值距离 (L1 Distance) 并归一化
-    # 计算两两之间的年份差绝对值
-    d_year_raw = np.abs(val_years - val_years.T)
-    # 归一化：除以最大跨度，将范围压缩到 [0, 1]
-    max_year_span = np.max(d_year_raw)
-    if max_year_span == 0:
-        d_year = np.zeros_like(d_year_raw)
-    else:
-        d_year = d_year_raw / max_year_span
-
-    # 3. 加权融合 (Weighted Fusion)
-    print("正在进行加权距离融合...")
-    # 获取权重，如果没有提供则默认为 0
-    w_main = weights_config.get('main', 0.0)
-    w_sum = weights_config.get('summary', 0.0)
-    w_map = weights_config.get('map', 0.0)
-    w_lin = weights_config.get('lineage', 0.0)
-    w_year = weights_config.get('year', 0.0)
-    
-    # 计算综合距离矩阵
-    d_final = (d_main * w_main + 
-               d_summary * w_sum + 
-               d_map * w_map + 
-               d_lineage * w_lin + 
-               d_year * w_year)
-    
-    # 确保距离矩阵没有负数 (浮点数误差保护)
-    d_final = np.maximum(d_final, 0)
+    views = {
+        'main': np.array([v[0] for v in raw_values]),
+        'summary': np.array([v[1] for v in raw_values]),
+        'map': np.array([v[2] for v in raw_values]),
+        'lineage': np.array([v[3] for v in raw_values]),
+    }
+    val_years = np.array([v[4] for v in raw_values])
+
+    # 2. 加权融合 (Weighted Fusion)
+    # 文本视图使用余弦距离 (归一化后的点积)，年份使用按最大跨度归一化的 L1 距离；
+    # 分块在 float32 下就地累加到同一个 N x N 矩阵，权重为 0 的视图直接跳过
+    # 大语料 (kNN 图模式) 只保存每个样本的近邻，d_final 为稀疏 CSR 矩阵，未存储的元素视为 "不相邻"
+    active_views = [key for key in views if weights_config.get(key, 0.0)]
+    graph_mode = resolve_graph_mode(n_samples, kwargs.get('graph_mode'))
+
+    def build_fused_graph():
+        """返回 (d_final, graph_degree, umap_neighbors)"""
+        print(f"正在进行加权距离融合 (视图: {active_views + (['year'] if weights_config.get('year', 0.0) else [])}, 模式: {graph_mode})...")
+        if graph_mode == 'knn':
+            graph = fused_knn_graph(views, weights_config, years=val_years, n_neighbors=kwargs.get('knn_neighbors'))
+            # 稀疏 precomputed 输入要求每行至少存储 n_neighbors / min_samples 个距离
+            degree = min_row_degree(graph)
+            return graph, degree, max(2, min(15, degree))
+        return fused_distance_matrix(views, weights_config, years=val_years), None, 15
+
+    # 锚点吸附只用到 "所有样本 -> 锚点" 的距离，完整矩阵 / kNN 图推迟到 3D 投影时再构建
+    d_final, graph_degree, umap_neighbors = None, None, 15
+    projector = None
+    if method.upper() != 'ANCHOR' and assigned_labels is None:
+        d_final, graph_degree, umap_neighbors = build_fused_graph()
+        projector = ProjectionService(d_final)
 
     # 4. 执行聚类 (基于预计算距离矩阵)
-    print(f"正在执行聚类 ({method})...")
+    if assigned_labels is None:
+        print(f"正在执行聚类 ({method})...")
     # 初始化 labels 为全 -1 (噪音)，长度与样本数相同
     labels = np.full(n_samples, -1, dtype=int)
 
-    if method.upper() == 'DBSCAN':
+    if assigned_labels is not None:
+        print("使用给定的聚类标签，跳过聚类。")
+        labels = np.array([assigned_labels.get(t, -1) for t in titles], dtype=int)
+
+    elif method.upper() == 'DBSCAN':
         eps = kwargs.get('eps', 0.1)
         min_samples = kwargs.get('min_samples', 3)
-        step = 0.001 if eps >= 0.001 else max(eps / 2, 1e-6)
-        max_iter = 500
-        
-        def _run(e):
-            c = DBSCAN(eps=e, min_samples=min_samples, metric='precomputed')
-            ls = c.fit_predict(d_final)
-            k = len(set(ls)) - (1 if -1 in ls else 0)
-            nz_count = list(ls).count(-1)
-            nz = (nz_count / n_samples) if n_samples > 0 else 0.0
-            return ls, k, nz
-
-        # Initial Run
-        labels, k, nz = _run(eps)
-        print(f"Initial run: eps = {eps}, clusters = {k}, noise_ratio = {nz:.3f}")
-        
-        for i in range(max_iter):
-            # 1. Check Success
-            if (2 <= k <= 5) and (nz <= 0.4):
-                print("Target reached.")
-                break
-                
-            # 2. Check Conflict (Stop)
-            if (k == 1) and (nz > 0.4):
-                print("Conflict detected (Single cluster but high noise). Stopping.")
-                break
-            
-            # 3. Determine Direction
-            direction = 0
-            if k == 1:
-                direction = -1 # Decrease eps to split
-            elif (nz > 0.4) or (k > 5):
-                direction = 1  # Increase eps to merge or include noise
-            
-            if direction == 0:
-                break # Should be covered by success check, but for safety
-                
-            # 4. Trial Move
-            eps_trial = max(eps + direction * step, 1e-6)
-            labels_trial, k_trial, nz_trial = _run(eps_trial)
-            print(f"Trial {i+1}: eps_try = {eps_trial:.4f}, clusters = {k_trial}, noise_ratio = {nz_trial:.3f}")
-            
-            # 5. Check "Overshot" (Backtrack logic)
-            overshot = False
-            if direction == -1: # Tried decreasing
-                # If we split too much (>5) or noise became too high (>0.4)
-                if (k_trial > 5) or (nz_trial > 0.4):
-                    overshot = True
-            else: # Tried increasing
-                # If we merged too much (became 1 cluster)
-                # Note: If noise > 0.4 still, it's not overshot, it's just 'not enough increase'.
-                # Overshot is only when we killed the clusters.
-                if k_trial < 2:
-                    overshot = True
-            
-            if overshot:
-                # User: "回调一半" -> Reduce step, do NOT update eps
-                step = max(step / 2, 1e-6)
-                print(f"  -> Overshot! Staying at eps={eps}, reducing step to {step}")
-            else:
-                # Move successful (or at least valid direction)
-                eps = eps_trial
-                labels, k, nz = labels_trial, k_trial, nz_trial
-                # Should we reduce step on success? User implied binary search behavior.
-                # Let's keep step same if moving towards goal, but maybe safer to keep it.
-                # If we are bouncing, the overshot logic handles it.
-                print(f"  -> Accepted. New eps={eps}")
 
+        # 核心距离 + 最小生成树只构建一次，任意 eps 下的类别数 / 噪音比例都可直接读出，
+        # 搜索完成后只在选定的 eps 上真正拟合一次
+        profile = DBSCANProfile(d_final, min_samples)
+        eps, k, nz = search_dbscan_eps(profile, eps)
+        labels = DBSCAN(eps=eps, min_samples=min_samples, metric='precomputed').fit_predict(d_final)
         print(f"Final Result: eps = {eps}, clusters = {k}, noise_ratio = {nz:.3f}")
 
     elif method.upper() == 'HDBSCAN':
@@ -811,15 +761,22 @@ def multi_view_clustering_and_visualize(
         step = 0.001 if eps >= 0.001 else max(eps / 2, 1e-6)
         max_iter = 500
         
+        def hdb_min_samples(mcs):
+            # 稠密矩阵沿用默认 (min_samples = min_cluster_size)；kNN 图中每行只有有限个近邻，min_samples 不能超过行度数
+            return None if graph_degree is None else max(1, min(mcs, graph_degree))
+
+        # 单链接树按 min_samples 缓存：调整 eps / min_cluster_size 时只在缓存的树上重新提取簇
+        tree_cache = HDBSCANTreeCache(d_final) if HAS_SKLEARN_HDBSCAN else None
+
         def _run(e, mcs):
             # mcs: min_cluster_size
             if HAS_SKLEARN_HDBSCAN:
                 # sklearn 1.3+ 支持 metric='precomputed'
-                clusterer = HDBSCAN(min_cluster_size=mcs, metric='precomputed', cluster_selection_epsilon=e)
-                ls = clusterer.fit_predict(d_final)
+                ls = tree_cache.fit_predict(mcs, e, min_samples=hdb_min_samples(mcs))
             elif HAS_HDBSCAN_LIB:
                 # 独立库 hdbscan 支持
-                clusterer = hdbscan.HDBSCAN(min_cluster_size=mcs, metric='precomputed', cluster_selection_epsilon=e)
+                clusterer = hdbscan.HDBSCAN(min_cluster_size=mcs, metric='precomputed', cluster_selection_epsilon=e,
+                                            min_samples=hdb_min_samples(mcs))
                 ls = clusterer.fit_predict(d_final.astype(np.float64))
             else:
                 raise ImportError("请安装 scikit-learn >= 1.3 或 pip install hdbscan")
@@ -938,6 +895,8 @@ def multi_view_clustering_and_visualize(
             eps, min_cluster_size, labels, k, nz, sizes = last_valid_result
 
         print(f"Final Result: eps={eps}, mcs={min_cluster_size}, clusters={k}, noise_ratio={nz:.3f}, sizes={sizes}")
+        if tree_cache is not None:
+            print(f"  [HDBSCAN] 共构建 {tree_cache.n_builds} 棵单链接树，提取 {tree_cache.n_extractions} 次")
 
     elif method.upper() == 'KMEANS':
 
@@ -945,11 +904,11 @@ def multi_view_clustering_and_visualize(
         user_k = kwargs.get('n_clusters', 'auto')
         
         # 1. 嵌入到欧氏空间 (10维)
-        temp_reducer = umap.UMAP(n_components=10, metric='precomputed', random_state=42, n_jobs=1)
-        temp_coords = temp_reducer.fit_transform(d_final)
+        temp_coords = projector.fit_transform(n_components=10, n_neighbors=umap_neighbors)
         
 
         # --- A. 自动选择 K 值 (带倾向性的轮廓系数) ---
+        sweep_fit = None
         if isinstance(user_k, int):
             final_k = user_k
             print(f"  - KMeans: 用户指定 K={final_k}")
@@ -961,13 +920,8 @@ def multi_view_clustering_and_visualize(
             # 搜索范围
             max_search = min(9, len(titles))
             
-            for k in range(2, max_search):
-                km = KMeans(n_clusters=k, random_state=42, n_init=10)
-                l = km.fit_predict(temp_coords)
-                
-                # 1. 原始数学得分 (-1 到 1)
-                sil_score = silhouette_score(temp_coords, l)
-                
+            # 各 K 值相互独立：大语料时并行拟合，轮廓系数在分层样本上估计
+            for k, km, l, sil_score in sweep_k(temp_coords, range(2, max_search)):
                 # 2. 计算调整后得分 (核心修改)
                 # 逻辑：每一多增加一个类，就扣掉 k_penalty 分
                 # 比如 k=3 扣 0.06，k=5 扣 0.1
@@ -979,6 +933,7 @@ def multi_view_clustering_and_visualize(
                 if adjusted_score > best_score:
                     best_score = adjusted_score
                     best_k = k
+                    sweep_fit = (km, l)
             
             final_k = best_k
             print(f"  -> 最终选择 K={final_k}")
@@ -986,9 +941,12 @@ def multi_view_clustering_and_visualize(
         # --- 3. 核心改进：迭代去噪流程 ---
         print("  - KMeans: 执行迭代式中心校正...")
         
-        # 第一轮：粗聚类 (受噪音影响的质心)
-        kmeans_pass1 = KMeans(n_clusters=final_k, random_state=42, n_init=10)
-        labels_pass1 = kmeans_pass1.fit_predict(temp_coords)
+        # 第一轮：粗聚类 (受噪音影响的质心)；自动选 K 时直接复用扫描中该 K 的拟合结果
+        if sweep_fit is not None and sweep_fit[0].n_clusters == final_k:
+            kmeans_pass1, labels_pass1 = sweep_fit
+        else:
+            kmeans_pass1 = make_kmeans(final_k, len(temp_coords))
+            labels_pass1 = kmeans_pass1.fit_predict(temp_coords)
         centers_pass1 = kmeans_pass1.cluster_centers_
         
         # 计算每个点到粗质心的距离
@@ -1028,7 +986,7 @@ def multi_view_clustering_and_visualize(
             # 极端情况保护：如果剔除太多，就回退到第一轮
             labels = labels_pass1
         else:
-            kmeans_pass2 = KMeans(n_clusters=final_k, random_state=42, n_init=10)
+            kmeans_pass2 = make_kmeans(final_k, len(temp_coords))
             kmeans_pass2.fit(core_coords) # 注意：只 Fit 核心数据！
             
             # 获取了“修正后的质心”
@@ -1106,177 +1064,14 @@ def multi_view_clustering_and_visualize(
             # 这一步是为了找出那些"毫无争议"的样本，先把它们摘出来
             # 同时也找出一批"待定样本"，用它们的分布来计算 Stage 2 的动态阈值
             
-            # 1. 计算每个锚点的平均距离 (用于 Stage 1 的均值归一化)
-            anchors_dists_all = d_final[:, anchor_indices]
-            anchor_means = np.mean(anchors_dists_all, axis=0) # (N_anchors,)
-            anchor_means = np.maximum(anchor_means, 1e-6)
-            
-            consensus_hard_limit = 0.6 # 距离 > 0.6 (Sim < 0.4) 即使共识也认为是噪音
-            
-            stage1_confirmed_mask = np.zeros(n_samples, dtype=bool)
-            
-            # 第一轮遍历：只标记，不计算 Q75
-            for i in range(n_samples):
-                if i in anchor_label_map: continue
-                
-                raw_dists = d_final[i, anchor_indices]
-                
-                # 1.1 原始距离最优
-                idx_raw = np.argmin(raw_dists)
-                dist_raw_best = raw_dists[idx_raw]
-                
-                # 1.2 均值归一化最优
-                norm_dists_mean = raw_dists / anchor_means
-                idx_norm_mean = np.argmin(norm_dists_mean)
-                
-                # 判定共识
-                if (idx_raw == idx_norm_mean) and (dist_raw_best < consensus_hard_limit):
-                    # 锁定！
-                    target_real_idx = anchor_indices[idx_raw]
-                    labels[i] = anchor_label_map[target_real_idx]
-                    stage1_confirmed_mask[i] = True
-                else:
-                    # 待定，留给 Stage 2
-                    labels[i] = -1 # 暂时标记为噪音
-            
-            # --- Stage 2: 基于剩余样本的动态 Q75 重判 ---
-            
-            # 找出所有"非锚点"且"非 Stage 1 锁定"的样本
-            # 这些就是"难啃的骨头"，我们要用它们的分布来计算 Q75
-            remaining_mask = (~stage1_confirmed_mask)
-            # 还要排除锚点本身
-            for idx in anchor_indices:
-                remaining_mask[idx] = False
-                
-            if np.sum(remaining_mask) > 0:
-                print(f"  -> Stage 1 锁定了 {np.sum(stage1_confirmed_mask)} 个样本，剩余 {np.sum(remaining_mask)} 个样本进入 Stage 2...")
-                
-                # 计算这些剩余样本到各个锚点的距离矩阵
-                # shape: (N_remaining, N_anchors)
-                remaining_dists = d_final[remaining_mask][:, anchor_indices]
-                
-                # 计算动态 Q75 (对应距离的 Q25)
-                # 这反映了"在难样本中，大家离这个锚点一般有多远"
-                anchor_q25_dynamic = np.percentile(remaining_dists, 25, axis=0)
-                anchor_q25_dynamic = np.maximum(anchor_q25_dynamic, 1e-6)
-                
-                # 第二轮遍历：只处理 remaining 的样本
-                remaining_indices = np.where(remaining_mask)[0]
-                
-                for i in remaining_indices:
-                    raw_dists = d_final[i, anchor_indices]
-                    
-                    # 计算动态归一化相似度
-                    # Sim_Norm = (1 - Dist) / (1 - Q25_Dist)
-                    sims = 1.0 - raw_dists
-                    sims_q75 = 1.0 - anchor_q25_dynamic
-                    sims_q75 = np.maximum(sims_q75, 1e-6)
-                    
-                    norm_sims = sims / sims_q75
-                    
-                    best_norm_sim_idx = np.argmax(norm_sims)
-                    best_norm_sim = norm_sims[best_norm_sim_idx]
-                    
-                    # 判定
-                    if best_norm_sim >= 0.75:
-                        target_real_idx = anchor_indices[best_norm_sim_idx]
-                        labels[i] = anchor_label_map[target_real_idx]
-                    else:
-                        labels[i] = -1 # 最终噪音
-            else:
-                print("  -> Stage 1 已覆盖所有样本，跳过 Stage 2。")
-
-            # --- Stage 3: 类别平衡调整 (Class Balancing) ---
-            print("  -> 执行 Stage 3: 类别平衡调整...")
-            
-            # 最大迭代次数，防止死循环
-            max_balance_iters = 25 
-            iter_count = 0
-            
-            # 预计算相似度均值 (用于归一化)
-            # anchor_means 是距离均值，这里转换为相似度均值
-            anchor_sim_means = 1.0 - anchor_means
-            anchor_sim_means = np.maximum(anchor_sim_means, 1e-6)
-
-            while iter_count < max_balance_iters:
-                # 1. 统计当前各类别数量 (仅针对锚点类别)
-                current_counts = {}
-                for idx in anchor_indices:
-                    lbl = anchor_label_map[idx]
-                    current_counts[lbl] = 0
-                
-                # 统计实际分布
-                unique_labels_arr, counts_arr = np.unique(labels, return_counts=True)
-                total_assigned = 0
-                for l, c in zip(unique_labels_arr, counts_arr):
-                    if l in current_counts: # 只关心锚点类别
-                        current_counts[l] = c
-                        total_assigned += c
-                
-                if total_assigned == 0:
-                    break
-
-                # 2. 识别 A 组 (Rich) 和 B 组 (Poor)
-                group_a_labels = [] # Rich
-                group_b_labels = [] # Poor
-                
-                threshold_ratio = total_assigned / 10.0
-                threshold_absolute = 4
-                
-                for lbl, cnt in current_counts.items():
-                    if cnt <= threshold_absolute or cnt <= threshold_ratio:
-                        group_b_labels.append(lbl)
-                    else:
-                        group_a_labels.append(lbl)
-                
-                # 停止条件：没有 B 组（都平衡了）或没有 A 组（没资源了）
-                if not group_b_labels or not group_a_labels:
-                    if not group_b_labels:
-                        print(f"    [Iter {iter_count}] 平衡完成：所有类别数量均满足要求。")
-                    else:
-                        print(f"    [Iter {iter_count}] 停止平衡：没有富裕组 (A组) 可供提取。")
-                    break
-                
-                # 3. 寻找最佳迁移候选
-                # 找到属于 A 组的所有样本索引
-                mask_a = np.isin(labels, group_a_labels)
-                candidate_indices = np.where(mask_a)[0]
-                
-                if len(candidate_indices) == 0:
-                    break
+            # 所有样本到各锚点的距离 (N x N_anchors)，直接按向量计算这几列，不构建 N x N 矩阵
+            print(f"  -> 计算 {n_samples} x {len(anchor_indices)} 的锚点距离 (视图: {active_views + (['year'] if weights_config.get('year', 0.0) else [])})...")
+            anchor_dists = fused_distance_columns(views, weights_config, years=val_years, columns=anchor_indices)
 
-                # 找到属于 B 组的所有锚点索引
-                b_anchor_indices = [idx for idx in anchor_indices if anchor_label_map[idx] in group_b_labels]
-                
-                # 候选样本到 B 组锚点的距离矩阵
-                # shape: (N_candidates, N_b_anchors)
-                dists_sub = d_final[candidate_indices][:, b_anchor_indices]
-                
-                # 转换为相似度
-                sims_sub = 1.0 - dists_sub
-                
-                # 获取 B 组锚点对应的均值
-                anchor_mean_map = {uid: m for uid, m in zip(anchor_indices, anchor_sim_means)}
-                b_means = np.array([anchor_mean_map[uid] for uid in b_anchor_indices])
-                
-                # 计算归一化相似度矩阵 Norm_Sim = Sim / Mean
-                # 注意防止除以0
-                b_means = np.maximum(b_means, 1e-6)
-                norm_sims_sub = sims_sub / b_means[None, :]
-                
-                # 找最大值
-                max_idx_flat = np.argmax(norm_sims_sub)
-                r_idx, c_idx = np.unravel_index(max_idx_flat, norm_sims_sub.shape)
-                
-                # 执行迁移
-                real_sample_idx = candidate_indices[r_idx]
-                target_anchor_idx = b_anchor_indices[c_idx]
-                target_label = anchor_label_map[target_anchor_idx]
-                
-                labels[real_sample_idx] = target_label
-                iter_count += 1
-            
-            print(f"  -> Stage 3 完成，共执行 {iter_count} 次迁移调整。")
+            # Stage 1 共识锁定 / Stage 2 动态重判 / Stage 3 类别平衡，均在 N x A 矩阵上批量完成
+            labels = adsorb_to_anchors(
+                anchor_dists, anchor_indices, [anchor_label_map[idx] for idx in anchor_indices], n_samples
+            )
     else:
         raise ValueError(f"Unknown method: {method}")
 
@@ -1306,16 +1101,16 @@ def multi_view_clustering_and_visualize(
     else:
         print("未提供原文内容，跳过关键词提取。")
     # 5. 降维可视化 (基于综合距离矩阵直接降到 3D)
-    print("正在进行可视化降维 (UMAP precomputed -> 3D)...")
-    reducer_viz = umap.UMAP(
-        n_components=3,
-        metric='precomputed', # 关键：直接使用我们算好的加权距离
-        random_state=42,
-        n_neighbors=15,
-        min_dist=0.1,
-        n_jobs=1
-    )
-    coords_3d = reducer_viz.fit_transform(d_final)
+    coords_3d = None
+    if project_coords or visualize:
+        if d_final is None:
+            d_final, graph_degree, umap_neighbors = build_fused_graph()
+            projector = ProjectionService(d_final)
+        print("正在进行可视化降维 (UMAP precomputed -> 3D)...")
+        # 直接使用算好的加权距离 (precomputed)；KMEANS 分支已构建的 kNN 图在此复用
+        coords_3d = projector.fit_transform(n_components=3, n_neighbors=umap_neighbors, min_dist=0.1)
+    else:
+        print("未请求 3D 投影，跳过可视化降维。")
     # 6. 绘制图表 [修改部分]
     if visualize:
         print("正在绘制 3D 可视化图表...")
@@ -1421,7 +1216,7 @@ def multi_view_clustering_and_visualize(
 
     result_dict = {}
     for i, title in enumerate(titles):
-        coords = coords_3d[i].tolist()
+        coords = coords_3d[i].tolist() if coords_3d is not None else None
         label = int(labels[i])
         
         # 获取该 label 对应的关键词列表
@@ -1529,6 +1324,30 @@ def calculate_balance_std1(results):
     
     return final_score
 
+def enrich_best_candidate(best_results, view_data, weights_config, docs_text_dict, keyword_section_weights=None, **kwargs):
+    """
+    候选锚点方案只做标签分配与均衡性打分；选出最优方案后，在其标签上补做关键词提取与 3D 投影。
+    best_results 为最优方案的 {标题: {'coords_3d', 'label', 'keywords', ...}}，原地填入坐标与关键词；
+    view_data / weights_config 为该方案的多视图数据与融合权重。返回 (evaluation_text, cluster_keywords_map)。
+    """
+    labels_dict = {t: item['label'] for t, item in best_results.items() if isinstance(item, dict)}
+    enriched, evaluation_text, cluster_keywords_map = multi_view_clustering_and_visualize(
+        view_data,
+        weights_config,
+        method='ANCHOR',
+        docs_text_dict=docs_text_dict,
+        visualize=False,
+        keyword_section_weights=keyword_section_weights,
+        assigned_labels=labels_dict,
+        **kwargs
+    )
+    for t, item in enriched.items():
+        if isinstance(best_results.get(t), dict):
+            best_results[t]['coords_3d'] = item[0]
+            best_results[t]['keywords'] = item[2]
+    return evaluation_text, cluster_keywords_map
+
+
 def comprehensive_process_function(method = 'KMEANS',weights_config_1=None,weights_config_2=None,keyword_section_weights=None,paper_desc = '暂未提供',**kwargs):
 
 
@@ -1537,9 +1356,6 @@ def comprehensive_process_function(method = 'KMEANS',weights_config_1=None,weigh
     if folder_path is None:
         results = kwargs.get('results', None)
         label = kwargs.get('label', None)
-        eps = kwargs.get('eps', 0.5)
-        min_samples = kwargs.get('min_samples', 3)
-        min_cluster_size = kwargs.get('min_cluster_size', 3)
 
         if results is None:
             raise ValueError("Either folder_path or label/results must be provided.")
@@ -1733,17 +1549,22 @@ def comprehensive_process_function(method = 'KMEANS',weights_config_1=None,weigh
             best_sub_anchors = None
             best_evaluation_text = ""
             best_cluster_keywords_map = {}
+            best_candidate = None
             min_balance_score = float('inf')
             
+            # 第一轮已编码过的文献直接复用 (由调用方通过 corpus_embeddings 传入)，否则在此编码一次。
+            # 这里只有该父类的文献子集，不写回持久化语料矩阵 (否则会用子集覆盖整个语料的矩阵与清单)，
+            # 向量仍经磁盘向量缓存复用
+            corpus_embeddings = kwargs.get('corpus_embeddings')
+            if corpus_embeddings is None:
+                corpus_embeddings = CorpusEmbeddings(cache_dir=resolve_cache_dir(), persist=False)
+
             # 原始数据备份（因为注入会修改字典）
             # 注意：main_doc_data 等是局部变量，为了在循环中不互相污染，我们需要在循环内使用 copy
             
-            for idx, candidate_anchors in enumerate(sub_anchors_candidates):
-                print(f"\n--- 正在评估第 {idx+1}/{len(sub_anchors_candidates)} 套子分类方案 ---")
-                if candidate_anchors:
-                    print(f"   锚点数量: {len(candidate_anchors)}")
-                
-                # 深拷贝数据字典，防止上一轮的注入影响这一轮
+            # 1. 各方案在数据字典的深拷贝上注入锚点，防止方案之间互相污染
+            candidate_inputs = []
+            for candidate_anchors in sub_anchors_candidates:
                 curr_main_doc_data = copy.deepcopy(main_doc_data)
                 curr_summary_doc_data = copy.deepcopy(summary_doc_data)
                 curr_map_doc_data = copy.deepcopy(map_doc_data)
@@ -1759,34 +1580,31 @@ def comprehensive_process_function(method = 'KMEANS',weights_config_1=None,weigh
                         curr_map_doc_data[anchor_title] = v
                         curr_lineage_doc_data[anchor_title] = v
                         curr_year_dict[anchor_title] = 2025
-
-                # 向量化
-                if method == 'DBSCAN':
-                    main_vec = analyze_documents_to_vec(curr_main_doc_data, n_dim_reduce=20, method=method, eps=eps, min_samples=min_samples)
-                    summary_vec = analyze_documents_to_vec(curr_summary_doc_data, n_dim_reduce=20, method=method, eps=eps, min_samples=min_samples)
-                    map_vec = analyze_documents_to_vec(curr_map_doc_data, n_dim_reduce=20, method=method, eps=eps, min_samples=min_samples)
-                    lineage_vec = analyze_documents_to_vec(curr_lineage_doc_data, n_dim_reduce=20, method=method, eps=eps, min_samples=min_samples)
-                elif method == 'KMEANS':
-                    n_clusters = kwargs.get('n_clusters', 3)
-                    main_vec = analyze_documents_to_vec(curr_main_doc_data, n_dim_reduce=20, method=method, n_clusters=n_clusters)
-                    summary_vec = analyze_documents_to_vec(curr_summary_doc_data, n_dim_reduce=20, method=method, n_clusters=n_clusters)
-                    map_vec = analyze_documents_to_vec(curr_map_doc_data, n_dim_reduce=20, method=method, n_clusters=n_clusters)
-                    lineage_vec = analyze_documents_to_vec(curr_lineage_doc_data, n_dim_reduce=20, method=method, n_clusters=n_clusters)
-                elif method == 'HDBSCAN':
-                    main_vec = analyze_documents_to_vec(curr_main_doc_data, n_dim_reduce=20, method=method, min_cluster_size=min_cluster_size, min_samples=min_samples)
-                    summary_vec = analyze_documents_to_vec(curr_summary_doc_data, n_dim_reduce=20, method=method, min_cluster_size=min_cluster_size, min_samples=min_samples)
-                    map_vec = analyze_documents_to_vec(curr_map_doc_data, n_dim_reduce=20, method=method, min_cluster_size=min_cluster_size, min_samples=min_samples)
-                    lineage_vec = analyze_documents_to_vec(curr_lineage_doc_data, n_dim_reduce=20, method=method, min_cluster_size=min_cluster_size, min_samples=min_samples)
-                else:
-                    raise ValueError(f"Unsupported method: {method}")
+                sections = [curr_main_doc_data, curr_summary_doc_data, curr_map_doc_data, curr_lineage_doc_data]
+                candidate_inputs.append((candidate_anchors, sections, curr_year_dict))
+
+            # 2. 向量化 + 降维：文献向量取自任务级语料向量 (各方案共享)，只补编码锚点；
+            #    全部 方案 x 章节 的 UMAP 一次性分发，语料较大且允许多进程时并行执行
+            #    (多视图融合只使用降维坐标，不做单视图聚类与 3D 降维)
+            reduced = reduce_candidate_sections(corpus_embeddings, [
+                (key, docs) for _, sections, _ in candidate_inputs for key, docs in zip(SECTION_KEYS, sections)
+            ])
+
+            # 3. 逐个方案分配标签并打分，择优在主进程内完成
+            for idx, (candidate_anchors, sections, curr_year_dict) in enumerate(candidate_inputs):
+                print(f"\n--- 正在评估第 {idx+1}/{len(sub_anchors_candidates)} 套子分类方案 ---")
+                if candidate_anchors:
+                    print(f"   锚点数量: {len(candidate_anchors)}")
+                curr_main_doc_data, curr_summary_doc_data, curr_map_doc_data, curr_lineage_doc_data = sections
+                main_vec, summary_vec, map_vec, lineage_vec = reduced[4 * idx: 4 * idx + 4]
 
                 common_titles = set(main_vec.keys()) & set(summary_vec.keys()) & set(map_vec.keys()) & set(lineage_vec.keys()) & set(curr_year_dict.keys())
                 five_view_data = {}
                 for t in common_titles:
-                    v_main = main_vec[t][0] if isinstance(main_vec.get(t), list) and len(main_vec[t]) >= 1 else None
-                    v_sum = summary_vec[t][0] if isinstance(summary_vec.get(t), list) and len(summary_vec[t]) >= 1 else None
-                    v_map = map_vec[t][0] if isinstance(map_vec.get(t), list) and len(map_vec[t]) >= 1 else None
-                    v_lin = lineage_vec[t][0] if isinstance(lineage_vec.get(t), list) and len(lineage_vec[t]) >= 1 else None
+                    v_main = main_vec.get(t) or None
+                    v_sum = summary_vec.get(t) or None
+                    v_map = map_vec.get(t) or None
+                    v_lin = lineage_vec.get(t) or None
                     yr = curr_year_dict.get(t)
                     if v_main is None or v_sum is None or v_map is None or v_lin is None or yr is None:
                         continue
@@ -1818,13 +1636,14 @@ def comprehensive_process_function(method = 'KMEANS',weights_config_1=None,weigh
                         'lineage': curr_lineage_doc_data.get(t, "")
                     }
                     
-                results2, evaluation_text, cluster_keywords_map = multi_view_clustering_and_visualize(
+                # 候选方案只分配标签并打分，关键词与 3D 坐标留给最终胜出的方案
+                results2, _, _ = multi_view_clustering_and_visualize(
                     five_view_data,
                     weights_config_2,
                     method='ANCHOR',
-                    docs_text_dict=curr_full_docs_struct,
+                    docs_text_dict=None,
                     visualize=False,
-                    keyword_section_weights=keyword_section_weights,
+                    project_coords=False,
                     **kwargs
                 )
                 
@@ -1850,10 +1669,16 @@ def comprehensive_process_function(method = 'KMEANS',weights_config_1=None,weigh
                     min_balance_score = score
                     best_results2 = results2
                     best_sub_anchors = candidate_anchors
-                    best_evaluation_text = evaluation_text
-                    best_cluster_keywords_map = cluster_keywords_map
+                    best_candidate = (five_view_data, curr_full_docs_struct)
                     print("   -> ⭐ 当前最优方案")
 
+            if best_results2:
+                print("\n--- 为最优子分类方案提取关键词并生成 3D 坐标 ---")
+                best_evaluation_text, best_cluster_keywords_map = enrich_best_candidate(
+                    best_results2, best_candidate[0], weights_config_2, best_candidate[1],
+                    keyword_section_weights=keyword_section_weights, **kwargs
+                )
+
             # 返回最优结果
             return best_results2, best_sub_anchors, best_evaluation_text, best_cluster_keywords_map
     else:
@@ -1862,8 +1687,10 @@ def comprehensive_process_function(method = 'KMEANS',weights_config_1=None,weigh
         # 1. 提取用于生成锚点的核心素材 (地图 + 综述句)
         # 注意：这里假设md中对应的标题是 "## 标准化领域地图" 和 "## 综述写作专用句"
         # extract_sections_to_dict 会自动匹配
-        ref_map_data = extract_sections_to_dict(folder_path, "标准化领域地图")
-        ref_review_data = extract_sections_to_dict(folder_path, "综述写作专用句")
+        # 整个第一轮只读取、解析一次 文献整理合集
+        corpus = kwargs.get('corpus') or load_corpus(folder_path)
+        ref_map_data = extract_sections_to_dict(folder_path, SECTION_HEADINGS['map'], corpus=corpus)
+        ref_review_data = extract_sections_to_dict(folder_path, "综述写作专用句", corpus=corpus)
 
         sample_titles = sorted(list(ref_map_data.keys()))[:200] 
         context_parts = []
@@ -1973,91 +1800,49 @@ def comprehensive_process_function(method = 'KMEANS',weights_config_1=None,weigh
         best_anchor_docs = None
         best_evaluation_text = ""
         best_cluster_keywords_map = {}
+        best_candidate = None
         min_balance_score = float('inf')
 
-        for idx, anchor_docs in enumerate(anchor_candidates):
+        # 语料各章节只提取、编码一次 (四个章节合并为一次分桶编码)，各锚点方案之间共享，方案内只需补编码 2-4 个锚点
+        section_docs = {
+            SECTION_HEADINGS['main']: extract_sections_to_dict(folder_path, SECTION_HEADINGS['main'], corpus=corpus),
+            SECTION_HEADINGS['summary']: extract_sections_to_dict(folder_path, SECTION_HEADINGS['summary'], corpus=corpus),
+            SECTION_HEADINGS['map']: ref_map_data,
+            SECTION_HEADINGS['lineage']: extract_sections_to_dict(folder_path, SECTION_HEADINGS['lineage'], corpus=corpus),
+            "## 发表年份": extract_sections_to_dict(folder_path, "## 发表年份", corpus=corpus),
+        }
+        corpus_embeddings = kwargs.get('corpus_embeddings')
+        if corpus_embeddings is None:
+            corpus_embeddings = CorpusEmbeddings.for_folder(folder_path, parsed=corpus)
+        corpus_embeddings.embed_sections({key: section_docs[heading] for key, heading in SECTION_HEADINGS.items()})
+
+        # 1. 各方案注入锚点 (process_and_classify_target_section 在章节字典的副本上注入 anchor_docs)
+        candidate_inputs = []
+        for anchor_docs in anchor_candidates:
+            sections = [
+                process_and_classify_target_section(
+                    folder_path, SECTION_HEADINGS[key], method=method, anchor_docs=anchor_docs,
+                    docs_data=section_docs[SECTION_HEADINGS[key]], inputs_only=True
+                )
+                for key in SECTION_KEYS
+            ]
+            target_section = "## 发表年份"
+            year_dict = process_and_classify_target_section(folder_path, target_section, method=method, anchor_docs=anchor_docs, docs_data=section_docs[target_section])
+            candidate_inputs.append((anchor_docs, sections, year_dict))
+
+        # 2. 向量化 + 降维：全部 方案 x 章节 的 UMAP 一次性分发，语料较大且允许多进程时并行执行
+        #    (多视图融合只使用各章节的降维坐标，跳过单视图聚类与 3D 降维)
+        reduced = reduce_candidate_sections(corpus_embeddings, [
+            (key, docs) for _, sections, _ in candidate_inputs for key, docs in zip(SECTION_KEYS, sections)
+        ])
+
+        # 3. 逐个方案分配标签并打分，择优在主进程内完成
+        for idx, (anchor_docs, sections, year_dict) in enumerate(candidate_inputs):
             print(f"\n--- 正在评估第 {idx+1}/{len(anchor_candidates)} 套父级分类方案 ---")
             if anchor_docs:
                 print(f"   锚点数量: {len(anchor_docs)}")
-
-            # 注意：process_and_classify_target_section 内部会注入 anchor_docs
-            # 这里虽然会多次读取 IO，但为了不修改原有函数签名，保持逻辑稳定，我们接受这个开销
-            
-            target_section = "## 论文主要内容"
-            if method == 'DBSCAN':
-                eps = kwargs.get('eps', 0.5)
-                min_samples = kwargs.get('min_samples', 3)
-                main_vec,main_doc_data = process_and_classify_target_section(folder_path, target_section, method=method,anchor_docs=anchor_docs, eps=eps, min_samples=min_samples)
-            elif method == 'KMEANS':
-                n_clusters = kwargs.get('n_clusters', 3)
-                main_vec,main_doc_data = process_and_classify_target_section(folder_path, target_section, method=method,anchor_docs=anchor_docs, n_clusters=n_clusters)
-            elif method == 'HDBSCAN':
-                min_cluster_size = kwargs.get('min_cluster_size', 3)
-                cluster_selection_epsilon=kwargs.get('cluster_selection_epsilon', 0.3)
-                main_vec,main_doc_data = process_and_classify_target_section(folder_path, target_section, method=method,anchor_docs=anchor_docs, min_cluster_size=min_cluster_size, cluster_selection_epsilon=cluster_selection_epsilon)
-            else:
-                raise ValueError(f"Unknown method: {method}")
-
-            
-            target_section = "## 论文核心内容概括"
-            if method == 'DBSCAN':
-                eps = kwargs.get('eps', 0.5)
-                min_samples = kwargs.get('min_samples', 3)
-                summary_vec,summary_doc_data = process_and_classify_target_section(folder_path, target_section, method=method,anchor_docs=anchor_docs, eps=eps, min_samples=min_samples)
-            elif method == 'KMEANS':
-                n_clusters = kwargs.get('n_clusters', 3)
-                summary_vec,summary_doc_data = process_and_classify_target_section(folder_path, target_section, method=method,anchor_docs=anchor_docs, n_clusters=n_clusters)
-            elif method == 'HDBSCAN':
-                min_cluster_size = kwargs.get('min_cluster_size', 3)
-                cluster_selection_epsilon=kwargs.get('cluster_selection_epsilon', 0.3)
-                summary_vec,summary_doc_data = process_and_classify_target_section(folder_path, target_section, method=method,anchor_docs=anchor_docs, min_cluster_size=min_cluster_size, cluster_selection_epsilon=cluster_selection_epsilon)
-            else:
-                raise ValueError(f"Unknown method: {method}")
-
-            target_section = "标准化领域地图"
-            if method == 'DBSCAN':
-                eps = kwargs.get('eps', 0.5)
-                min_samples = kwargs.get('min_samples', 3)
-                map_vec,map_doc_data = process_and_classify_target_section(folder_path, target_section, method=method,anchor_docs=anchor_docs, eps=eps, min_samples=min_samples)
-            elif method == 'KMEANS':
-                n_clusters = kwargs.get('n_clusters', 3)
-                map_vec,map_doc_data = process_and_classify_target_section(folder_path, target_section, method=method,anchor_docs=anchor_docs, n_clusters=n_clusters)
-            elif method == 'HDBSCAN':
-                min_cluster_size = kwargs.get('min_cluster_size', 3)
-                cluster_selection_epsilon=kwargs.get('cluster_selection_epsilon', 0.3)
-                map_vec,map_doc_data = process_and_classify_target_section(folder_path, target_section, method=method,anchor_docs=anchor_docs, min_cluster_size=min_cluster_size, cluster_selection_epsilon=cluster_selection_epsilon)
-            else:
-                raise ValueError(f"Unknown method: {method}")
-
-            target_section = "谱系背景与脉络"
-            if method == 'DBSCAN':
-                eps = kwargs.get('eps', 0.5)
-                min_samples = kwargs.get('min_samples', 3)
-                lineage_vec,lineage_doc_data = process_and_classify_target_section(folder_path, target_section, method=method,anchor_docs=anchor_docs, eps=eps, min_samples=min_samples)
-            elif method == 'KMEANS':
-                n_clusters = kwargs.get('n_clusters', 3)
-                lineage_vec,lineage_doc_data = process_and_classify_target_section(folder_path, target_section, method=method,anchor_docs=anchor_docs, n_clusters=n_clusters)
-            elif method == 'HDBSCAN':
-                min_cluster_size = kwargs.get('min_cluster_size', 3)
-                cluster_selection_epsilon=kwargs.get('cluster_selection_epsilon', 0.3)
-                lineage_vec,lineage_doc_data = process_and_classify_target_section(folder_path, target_section, method=method,anchor_docs=anchor_docs, min_cluster_size=min_cluster_size, cluster_selection_epsilon=cluster_selection_epsilon)
-            else:
-                raise ValueError(f"Unknown method: {method}")
-
-            target_section = "## 发表年份"
-            if method == 'DBSCAN':
-                eps = kwargs.get('eps', 0.5)
-                min_samples = kwargs.get('min_samples', 3)
-                year_dict = process_and_classify_target_section(folder_path, target_section, method=method,anchor_docs=anchor_docs, eps=eps, min_samples=min_samples)
-            elif method == 'KMEANS':
-                n_clusters = kwargs.get('n_clusters', 3)
-                year_dict = process_and_classify_target_section(folder_path, target_section, method=method,anchor_docs=anchor_docs, n_clusters=n_clusters)
-            elif method == 'HDBSCAN':
-                min_cluster_size = kwargs.get('min_cluster_size', 3)
-                cluster_selection_epsilon=kwargs.get('cluster_selection_epsilon', 0.3)
-                year_dict = process_and_classify_target_section(folder_path, target_section, method=method,anchor_docs=anchor_docs, min_cluster_size=min_cluster_size, cluster_selection_epsilon=cluster_selection_epsilon)
-            else:
-                raise ValueError(f"Unknown method: {method}")
+            main_doc_data, summary_doc_data, map_doc_data, lineage_doc_data = sections
+            main_vec, summary_vec, map_vec, lineage_vec = reduced[4 * idx: 4 * idx + 4]
 
             common_titles = set(main_vec.keys()) & set(summary_vec.keys()) & set(map_vec.keys()) & set(lineage_vec.keys()) & set(year_dict.keys())
             five_view_data = {}
@@ -2070,10 +1855,10 @@ def comprehensive_process_function(method = 'KMEANS',weights_config_1=None,weigh
                     t not in year_dict or year_dict[t] is None):
                     continue
                 five_view_data[t] = [
-                    main_vec[t][0],
-                    summary_vec[t][0],
-                    map_vec[t][0],
-                    lineage_vec[t][0],
+                    main_vec[t],
+                    summary_vec[t],
+                    map_vec[t],
+                    lineage_vec[t],
                     int(year_dict[t])
                 ]
             if keyword_section_weights is None:
@@ -2101,15 +1886,15 @@ def comprehensive_process_function(method = 'KMEANS',weights_config_1=None,weigh
                     'lineage': 0.15,
                     'year': 0.1
                 }
-            results,evaluation_text,cluster_keywords_map = multi_view_clustering_and_visualize(
+            # 候选方案只分配标签并打分，关键词与 3D 坐标留给最终胜出的方案
+            results, _, _ = multi_view_clustering_and_visualize(
                 five_view_data,
                 weights_config_1,
                 method='ANCHOR',
-                docs_text_dict=full_docs_struct,
+                docs_text_dict=None,
                 visualize=False,
-                keyword_section_weights=keyword_section_weights,
+                project_coords=False,
                 **kwargs
-                
             )
 
             #将原文本数据也添加进results（稳健处理：检测存在性与形态）
@@ -2135,10 +1920,16 @@ def comprehensive_process_function(method = 'KMEANS',weights_config_1=None,weigh
                 min_balance_score = score
                 best_results = results
                 best_anchor_docs = anchor_docs
-                best_evaluation_text = evaluation_text
-                best_cluster_keywords_map = cluster_keywords_map
+                best_candidate = (five_view_data, full_docs_struct)
                 print("   -> ⭐ 当前最优方案")
 
+        if best_results:
+            print("\n--- 为最优父级分类方案提取关键词并生成 3D 坐标 ---")
+            best_evaluation_text, best_cluster_keywords_map = enrich_best_candidate(
+                best_results, best_candidate[0], weights_config_1, best_candidate[1],
+                keyword_section_weights=keyword_section_weights, **kwargs
+            )
+
         labels_in_results = []
         if best_results:
             for v in best_results.values():
@@ -0,0 +1,210 @@
+import os
+import threading
+from types import MappingProxyType
+
+from .corpus_embeddings import parse_title
+from .md_sections import MarkdownSections, regex_section_text, use_regex_splitter, extract_core_sections
+from .summary_store import get_summary_store, STORED_SECTION_MARKERS
+
+
+class ParsedCorpus:
+    """
+    一次性读入的 文献整理合集 (只读)。
+
+    每个 md 文件只读取、解析标题一次；各章节 ({标题: 内容}) 在第一次被请求时对所有文件扫描一次
+    并缓存，之后所有阶段 (锚点素材、各锚点方案、第二轮、综述生成) 都复用同一份结果。
+    对外暴露的字典均为 MappingProxyType，需要修改时请先 dict() 拷贝。
+    每个文件的标题行只扫描一次 (MarkdownSections)，之后各章节的提取都是 str.find + 二分查找。
+    parsed 为文献库中入库时已提取好的结构化字段 {文件名: parse_summary(全文)}：
+    STORED_SECTION_MARKERS 中的章节与综述生成用的核心章节直接取库中的值，其余章节仍按全文提取。
+    """
+
+    def __init__(self, folder_path: str, files, parsed=None):
+        # files: [(文件名, mtime_ns, size, 标题, 全文)]，按文件名排序
+        self._folder_path = folder_path
+        self._files = tuple(files)
+        self._parsed = dict(parsed or {})
+        self._indexes = {}
+        self._signature = tuple((f[0], f[1], f[2]) for f in self._files)
+        self._sections = {}
+        self._empty = {}
+        self._derived = {}
+        self._lock = threading.Lock()
+
+    @property
+    def folder_path(self) -> str:
+        return self._folder_path
+
+    @property
+    def signature(self):
+        """(文件名, mtime_ns, size) 元组，用于判断磁盘上的文件是否变化"""
+        return self._signature
+
+    def __len__(self):
+        return len(self._files)
+
+    def files(self):
+        """((文件名, mtime_ns, size, 标题, 全文), ...)，按文件名排序"""
+        return self._files
+
+    def parsed(self):
+        """{文件名: 入库时提取的结构化字段}"""
+        return self._parsed
+
+    def titles(self):
+        return tuple(f[3] for f in self._files)
+
+    def documents(self):
+        """{标题: 全文}"""
+        return self.derive('__full_text__', lambda content: content)
+
+    def section(self, section_start_str: str):
+        """
+        {标题: 章节内容}：规则与 extract_sections_to_dict 相同，只保留找到且非空的章节。
+        同名标题以排序靠后的文件为准 (与逐文件写入字典的行为一致)。
+        """
+        with self._lock:
+            cached = self._sections.get(section_start_str)
+            if cached is not None:
+                return cached
+            result, empty = {}, []
+            legacy = use_regex_splitter()
+            stored = not legacy and section_start_str in STORED_SECTION_MARKERS
+            for name, _, _, title, content in self._files:
+                parsed = self._parsed.get(name) if stored else None
+                if parsed is not None:
+                    text = parsed['sections'].get(section_start_str)
+                elif legacy:
+                    text = regex_section_text(content, section_start_str)
+                else:
+                    index = self._indexes.get(name)
+                    if index is None:
+                        index = self._indexes[name] = MarkdownSections(content)
+                    text = index.section(section_start_str)
+                if text:
+                    result[title] = text
+                elif text is not None:
+                    empty.append(title)
+            cached = MappingProxyType(result)
+            self._sections[section_start_str] = cached
+            self._empty[section_start_str] = tuple(empty)
+            return cached
+
+    def empty_titles(self, section_start_str: str):
+        """找到章节标记但内容为空的文献标题"""
+        self.section(section_start_str)
+        return self._empty[section_start_str]
+
+    def core_sections(self):
+        """{标题: 拼接后的核心章节}，规则见 extract_core_sections；库中已有时直接取用"""
+        if use_regex_splitter():
+            return self.derive('core_sections', extract_core_sections)
+        with self._lock:
+            cached = self._derived.get('core_sections')
+            if cached is not None:
+                return cached
+            result = {}
+            for name, _, _, title, content in self._files:
+                parsed = self._parsed.get(name)
+                value = parsed['core_text'] if parsed is not None else extract_core_sections(content)
+                if value:
+                    result[title] = value
+            cached = MappingProxyType(result)
+            self._derived['core_sections'] = cached
+            return cached
+
+    def derive(self, name: str, fn):
+        """
+        按文献全文派生的只读字典 {标题: fn(全文)}，按 name 缓存；fn 返回 None/空 的文献不收录。
+        """
+        with self._lock:
+            cached = self._derived.get(name)
+            if cached is not None:
+                return cached
+            result = {}
+            for _, _, _, title, content in self._files:
+                value = fn(content)
+                if value:
+                    result[title] = value
+            cached = MappingProxyType(result)
+            self._derived[name] = cached
+            return cached
+
+
+def _scan(folder_path: str):
+    entries = []
+    for entry in os.scandir(folder_path):
+        if entry.name.endswith('.md') and entry.is_file():
+            st = entry.stat()
+            entries.append((entry.name, st.st_mtime_ns, st.st_size))
+    entries.sort()
+    return tuple(entries)
+
+
+_CORPORA = {}
+_CORPORA_LOCK = threading.Lock()
+
+
+def load_corpus(folder_path: str) -> ParsedCorpus:
+    """
+    返回 folder_path 的解析结果。同一目录在进程内缓存，每次调用只做一次 stat 扫描：
+    文件列表、mtime、size 都未变时直接复用；否则重建，未变化的文件沿用已读入的内容。
+    新进程中优先从同级的文献库 (SummaryStore) 读取与 md 导出件一致的记录 (全文与入库时提取的章节)，
+    只有库中缺失或已被修改的 md 才读文件、解析并回写到库中。
+    """
+    if not folder_path or not os.path.isdir(folder_path):
+        print(f"错误: 文件夹不存在 - {folder_path}")
+        return ParsedCorpus(folder_path, [])
+
+    key = os.path.abspath(folder_path)
+    signature = _scan(folder_path)
+    with _CORPORA_LOCK:
+        old = _CORPORA.get(key)
+        if old is not None and old.signature == signature:
+            return old
+
+        previous, previous_parsed = {}, {}
+        if old is not None:
+            previous = {f[:3]: f for f in old.files()}
+            previous_parsed = old.parsed()
+        store = get_summary_store(folder_path)
+        stored = {}
+        if store is not None:
+            known = store.signatures()
+            stored = store.load_papers(
+                name for name, mtime_ns, size in signature
+                if (name, mtime_ns, size) not in previous and known.get(name) == (mtime_ns, size)
+            )
+
+        files, parsed, n_read, n_store = [], {}, 0, 0
+        for name, mtime_ns, size in signature:
+            reused = previous.get((name, mtime_ns, size))
+            if reused is not None:
+                files.append(reused)
+                if name in previous_parsed:
+                    parsed[name] = previous_parsed[name]
+                continue
+            if name in stored:
+                title, content, parsed[name] = stored[name]
+                files.append((name, mtime_ns, size, title, content))
+                n_store += 1
+                continue
+            path = os.path.join(folder_path, name)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    content = f.read()
+            except Exception as e:
+                print(f"  [错误] 处理文件 '{name}' 时出错: {e}")
+                continue
+            title = parse_title(content, name)
+            files.append((name, mtime_ns, size, title, content))
+            n_read += 1
+            if store is not None:
+                parsed[name] = store.upsert_paper(name, content, title, mtime_ns, size)
+        if store is not None:
+            store.prune(name for name, _, _ in signature)
+
+        corpus = ParsedCorpus(folder_path, files, parsed)
+        _CORPORA[key] = corpus
+        print(f"[CORPUS] 载入 {folder_path}: {len(files)} 个 Markdown 文件 (文献库 {n_store} 个，新读取 {n_read} 个)。")
+        return corpus
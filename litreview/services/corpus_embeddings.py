@@ -0,0 +1,309 @@
+import os
+import re
+import json
+import hashlib
+import threading
+from collections import Counter
+
+import numpy as np
+
+from .embedding_service import DEFAULT_MODEL_NAME, encode_texts, cache_model_id
+from .embedding_cache import text_hash
+from .md_sections import extract_section_text
+
+
+# 参与多视图融合的四个章节：规范键 -> 文献整理 md 中的章节标记
+SECTION_HEADINGS = {
+    'main': "## 论文主要内容",
+    'summary': "## 论文核心内容概括",
+    'map': "标准化领域地图",
+    'lineage': "谱系背景与脉络",
+}
+SECTION_KEYS = tuple(SECTION_HEADINGS.keys())
+
+# 各章节的 token 预算 (None 表示只受模型 max_seq_length 限制)。默认全部不限，与单次编码的结果一致。
+# 论文主要内容动辄数千 token，注意力开销随长度平方增长；需要以保真度换延迟时可用
+# LITREVIEW_EMBED_TOKEN_LIMITS="main=1024,summary=512" 为指定章节开启预算 (切成重叠窗口后 mean pooling)，0 表示不限。
+DEFAULT_SECTION_TOKEN_BUDGETS = {'main': None, 'summary': None, 'map': None, 'lineage': None}
+
+
+def section_token_budgets() -> dict:
+    budgets = dict(DEFAULT_SECTION_TOKEN_BUDGETS)
+    raw = os.environ.get('LITREVIEW_EMBED_TOKEN_LIMITS', '')
+    for item in raw.split(','):
+        if '=' not in item:
+            continue
+        key, value = item.split('=', 1)
+        key = key.strip()
+        if key in budgets:
+            try:
+                budgets[key] = int(value) or None
+            except ValueError:
+                print(f"⚠️ 无法解析 token 预算: {item}")
+    return budgets
+
+
+def section_token_budget(section: str):
+    return section_token_budgets().get(section)
+
+
+# 持久化语料矩阵所在的子目录 (位于向量缓存目录下)
+CORPUS_DIR_NAME = "corpus"
+
+_TITLE_PATTERN = re.compile(r'#\s*论文整理[：:]\s*(.*?)(?=\n#|\Z)', re.DOTALL)
+
+
+def is_anchor_title(title: str) -> bool:
+    return str(title).startswith("__ANCHOR_")
+
+
+def parse_title(content: str, filename: str) -> str:
+    """文献整理 md 的标题："# 论文整理：xxx"，找不到时使用文件名"""
+    m = _TITLE_PATTERN.search(content)
+    if m:
+        return m.group(1).strip()
+    return os.path.splitext(filename)[0]
+
+
+class CorpusEmbeddings:
+    """
+    一次聚类任务内共享的语料向量。
+
+    按章节保存 {标题: (文本哈希, 向量)}，第一轮把全部文献编码一次，之后各锚点方案、
+    第二轮子聚类都只需要按标题取行，再补充少量锚点文本的向量即可。
+    锚点 (__ANCHOR_k__) 不写入语料表，只在 _extra 中按文本哈希记忆。
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, cache_dir: str = None, batch_size: int = 32,
+                 token_budgets: dict = None, persist: bool = True):
+        self.model_name = model_name
+        self.cache_dir = cache_dir
+        self.batch_size = batch_size
+        self.token_budgets = token_budgets if token_budgets is not None else section_token_budgets()
+        self.persist = bool(persist and cache_dir)
+        self._sections = {}
+        self._extra = {}
+        self._files = {}             # md 文件名 -> {mtime_ns, size, hash, title}
+        self._unchanged = set()      # 本次扫描中 mtime/size 或内容哈希未变的文献标题
+        self._dirty = set()          # 需要写回磁盘的章节
+        self._manifest_dirty = False
+        self._lock = threading.RLock()
+
+    @classmethod
+    def for_folder(cls, folder_path: str, cache_dir: str = None, parsed=None, **kwargs):
+        """
+        加载 (若存在) 该工作目录已持久化的语料矩阵，并按 mtime + 内容哈希扫描 文献整理合集，
+        之后只有新增/变更的文献需要编码。parsed 为已载入的 ParsedCorpus (可选)。
+        """
+        from .embedding_cache import resolve_cache_dir
+        corpus = cls(cache_dir=cache_dir or resolve_cache_dir(folder_path), **kwargs)
+        corpus.load()
+        corpus.sync_folder(folder_path, parsed=parsed)
+        return corpus
+
+    def _encode(self, texts, max_tokens=None, groups=None):
+        return encode_texts(texts, model_name=self.model_name, batch_size=self.batch_size, cache_dir=self.cache_dir,
+                            max_tokens=max_tokens, groups=groups)
+
+    def has_section(self, section: str) -> bool:
+        return section in self._sections
+
+    def titles(self, section: str):
+        return list(self._sections.get(section, {}).keys())
+
+    def embed_section(self, section: str, docs_dict: dict):
+        """
+        编码一个章节的全部文献 ({标题: 文本})，已编码且文本未变的标题直接跳过。
+        """
+        return self.embed_sections({section: docs_dict})
+
+    def embed_sections(self, docs_by_section: dict):
+        """
+        跨章节统一编码：{章节键: {标题: 文本}} 中所有待编码文本合并为一次 encode，
+        由 embedding_service 按长度分桶调度，再按 (章节, 标题) 写回各章节表。
+        每个章节按 token_budgets 中的预算切块编码。
+        """
+        with self._lock:
+            pending = []
+            for section, docs_dict in docs_by_section.items():
+                store = self._sections.setdefault(section, {})
+                for title, text in docs_dict.items():
+                    if is_anchor_title(title):
+                        continue
+                    cached = store.get(title)
+                    # 所在 md 文件未变化的文献直接复用已存向量，不必再算文本哈希
+                    if cached is not None and title in self._unchanged:
+                        continue
+                    h = text_hash(text)
+                    if cached is None or cached[0] != h:
+                        pending.append((section, title, h, text))
+            if pending:
+                per_section = Counter(p[0] for p in pending)
+                detail = "，".join(f"{k} {v} 条" for k, v in per_section.items())
+                print(f"[CORPUS_EMBED] 统一编码 {len(pending)} 条章节文本 ({detail})...")
+                vecs = self._encode([p[3] for p in pending],
+                                    max_tokens=[self.token_budgets.get(p[0]) for p in pending],
+                                    groups=[p[0] for p in pending])
+                for (section, title, h, _), vec in zip(pending, vecs):
+                    self._sections[section][title] = (h, vec)
+                    self._dirty.add(section)
+            self.save()
+            return len(pending)
+
+    def embed_extra(self, texts):
+        """编码语料之外的文本 (锚点描述等，均为短文本，不设 token 预算)，按文本哈希记忆"""
+        with self._lock:
+            hashes = [text_hash(t) for t in texts]
+            todo = {}
+            for h, t in zip(hashes, texts):
+                if h not in self._extra and h not in todo:
+                    todo[h] = t
+            if todo:
+                vecs = self._encode(list(todo.values()))
+                for h, vec in zip(todo.keys(), vecs):
+                    self._extra[h] = vec
+            return np.stack([self._extra[h] for h in hashes]) if hashes else None
+
+    def matrix_for(self, section: str, docs_dict: dict) -> np.ndarray:
+        """
+        返回与 sorted(docs_dict) 对齐的向量矩阵：文献取自语料表，锚点及语料表中缺失/文本
+        已变化的条目按需补编码。
+        """
+        titles = sorted(docs_dict.keys())
+        corpus_docs = {t: docs_dict[t] for t in titles if not is_anchor_title(t)}
+        self.embed_section(section, corpus_docs)
+
+        anchor_titles = [t for t in titles if is_anchor_title(t)]
+        anchor_vecs = {}
+        if anchor_titles:
+            vecs = self.embed_extra([docs_dict[t] for t in anchor_titles])
+            anchor_vecs = dict(zip(anchor_titles, vecs))
+
+        store = self._sections[section]
+        rows = [anchor_vecs[t] if t in anchor_vecs else store[t][1] for t in titles]
+        return np.stack(rows) if rows else np.zeros((0, 0), dtype=np.float32)
+
+    # ------------------------------------------------------------------
+    # 持久化：向量缓存/corpus/<模型>.manifest.json + <模型>.<章节>.npy
+    # ------------------------------------------------------------------
+    def _paths(self):
+        base = os.path.join(self.cache_dir, CORPUS_DIR_NAME)
+        slug = cache_model_id(self.model_name).replace("/", "_")
+        return base, os.path.join(base, f"{slug}.manifest.json"), (lambda section: os.path.join(base, f"{slug}.{section}.npy"))
+
+    def load(self):
+        """读取已持久化的语料矩阵与文件清单；token 预算变化的章节丢弃，重新编码"""
+        if not self.persist:
+            return
+        _, manifest_path, matrix_path = self._paths()
+        if not os.path.isfile(manifest_path):
+            return
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except Exception as e:
+            print(f"[CORPUS_EMBED] 语料清单读取失败，将重新编码: {e}")
+            return
+        with self._lock:
+            self._files = manifest.get('files', {})
+            loaded = []
+            for section, meta in manifest.get('sections', {}).items():
+                if meta.get('token_budget') != self.token_budgets.get(section):
+                    print(f"[CORPUS_EMBED] 章节 {section} 的 token 预算已变化，丢弃旧向量。")
+                    continue
+                try:
+                    matrix = np.load(matrix_path(section))
+                except Exception:
+                    continue
+                titles, hashes = meta.get('titles', []), meta.get('hashes', [])
+                if len(titles) != len(matrix) or len(hashes) != len(matrix):
+                    continue
+                matrix = matrix.astype(np.float32)
+                self._sections[section] = {t: (h, matrix[i]) for i, (t, h) in enumerate(zip(titles, hashes))}
+                loaded.append(f"{section} {len(titles)} 篇")
+            if loaded:
+                print(f"[CORPUS_EMBED] 已载入持久化语料向量: {'，'.join(loaded)}")
+
+    def save(self):
+        """把有变化的章节矩阵与文件清单写回磁盘 (先写临时文件再替换)"""
+        if not self.persist:
+            return
+        with self._lock:
+            if not self._dirty and not self._manifest_dirty:
+                return
+            base, manifest_path, matrix_path = self._paths()
+            os.makedirs(base, exist_ok=True)
+            dtype = np.dtype(os.environ.get('LITREVIEW_EMBED_CACHE_DTYPE', 'float16'))
+            sections_meta = {}
+            for section, store in self._sections.items():
+                titles = sorted(store)
+                sections_meta[section] = {
+                    'titles': titles,
+                    'hashes': [store[t][0] for t in titles],
+                    'token_budget': self.token_budgets.get(section),
+                }
+                if section in self._dirty and titles:
+                    tmp = matrix_path(section) + ".tmp.npy"
+                    np.save(tmp, np.stack([store[t][1] for t in titles]).astype(dtype))
+                    os.replace(tmp, matrix_path(section))
+            manifest = {'model_name': self.model_name, 'files': self._files, 'sections': sections_meta}
+            tmp = manifest_path + ".tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False)
+            os.replace(tmp, manifest_path)
+            self._dirty.clear()
+            self._manifest_dirty = False
+
+    def sync_folder(self, folder_path: str, parsed=None) -> dict:
+        """
+        按 mtime/size 与内容哈希对比 文献整理合集 与上次的文件清单：
+        - mtime 与 size 都未变：视为未变化，不计算哈希；
+        - mtime 变化但内容哈希相同：只更新清单；
+        - 新增/内容变化：交给 embed_sections 重新编码对应章节；
+        - 已删除的文件：从各章节语料表中移除。
+        返回 {'new': n, 'changed': n, 'removed': n, 'unchanged': n}。
+        """
+        if not folder_path or not os.path.isdir(folder_path):
+            return {'new': 0, 'changed': 0, 'removed': 0, 'unchanged': 0}
+        if parsed is None:
+            from .corpus import load_corpus
+            parsed = load_corpus(folder_path)
+        with self._lock:
+            old_files = self._files
+            files, unchanged = {}, set()
+            n_new = n_changed = 0
+            for name, mtime_ns, size, title, content in parsed.files():
+                prev = old_files.get(name)
+                if prev and prev.get('mtime_ns') == mtime_ns and prev.get('size') == size:
+                    files[name] = prev
+                    unchanged.add(prev.get('title'))
+                    continue
+                digest = hashlib.sha1(content.encode('utf-8')).hexdigest()
+                files[name] = {'mtime_ns': mtime_ns, 'size': size, 'hash': digest, 'title': title}
+                if prev and prev.get('hash') == digest:
+                    unchanged.add(title)
+                elif prev:
+                    n_changed += 1
+                else:
+                    n_new += 1
+
+            removed = set(old_files) - set(files)
+            live_titles = {f['title'] for f in files.values()}
+            pruned = 0
+            for section, store in self._sections.items():
+                stale = [t for t in store if t not in live_titles]
+                for t in stale:
+                    del store[t]
+                if stale:
+                    pruned += len(stale)
+                    self._dirty.add(section)
+
+            self._unchanged = unchanged
+            if files != old_files or pruned:
+                self._manifest_dirty = True
+            self._files = files
+            stats = {'new': n_new, 'changed': n_changed, 'removed': len(removed), 'unchanged': len(unchanged)}
+            print(f"[CORPUS_EMBED] 文献变更扫描: 新增 {n_new} 篇，变更 {n_changed} 篇，"
+                  f"删除 {len(removed)} 篇，未变化 {len(unchanged)} 篇。")
+            self.save()
+            return stats
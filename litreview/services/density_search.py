@@ -0,0 +1,268 @@
+import numpy as np
+
+from .fused_distance import _block_rows
+
+
+# DBSCAN eps 自适应搜索的目标：2-5 个类，噪音比例不超过 0.4
+TARGET_MIN_CLUSTERS = 2
+TARGET_MAX_CLUSTERS = 5
+TARGET_MAX_NOISE = 0.4
+MIN_EPS = 1e-6
+
+
+def core_distances(D, min_samples: int) -> np.ndarray:
+    """
+    每个样本第 min_samples 近的距离 (含自身，与 DBSCAN 判定核心点的计数方式一致)，float32。
+    D 为稠密 N x N 矩阵或对角线显式存储的 CSR kNN 图；图中存储不足 min_samples 个元素的行为 inf。
+    """
+    n = D.shape[0]
+    k = int(min_samples)
+    out = np.full(n, np.inf, dtype=np.float32)
+    if n == 0 or k < 1:
+        return out
+    if hasattr(D, 'tocsr'):
+        G = D.tocsr()
+        lengths = np.diff(G.indptr)
+        # 行内按距离排序后取每行第 k 个元素
+        order = np.lexsort((G.data, np.repeat(np.arange(n), lengths)))
+        enough = lengths >= k
+        out[enough] = G.data[order[G.indptr[:-1][enough] + k - 1]]
+        return out
+    if k > n:
+        return out
+    rows = _block_rows(n)
+    for start in range(0, n, rows):
+        block = np.asarray(D[start:start + rows], dtype=np.float32)
+        out[start:start + len(block)] = np.partition(block, k - 1, axis=1)[:, k - 1]
+    return out
+
+
+def _dense_mst_weights(D, core) -> np.ndarray:
+    """稠密矩阵上 w_ij = max(c_i, c_j, d_ij) 的最小生成树边权 (Prim，O(N^2) 内存 O(N))"""
+    n = D.shape[0]
+    if n < 2:
+        return np.empty(0, dtype=np.float32)
+    in_tree = np.zeros(n, dtype=bool)
+    best = np.full(n, np.inf, dtype=np.float32)
+    weights = np.empty(n - 1, dtype=np.float32)
+    current = 0
+    for step in range(n - 1):
+        in_tree[current] = True
+        w = np.maximum(np.asarray(D[current], dtype=np.float32), core)
+        np.maximum(w, core[current], out=w)
+        np.minimum(best, w, out=best)
+        best[in_tree] = np.inf
+        current = int(np.argmin(best))
+        weights[step] = best[current]
+    return weights
+
+
+def _sparse_mst_weights(G, core) -> np.ndarray:
+    """kNN 图上 w_ij = max(c_i, c_j, d_ij) 的最小生成森林边权"""
+    from scipy import sparse
+    from scipy.sparse.csgraph import minimum_spanning_tree
+
+    G = sparse.coo_matrix(G)
+    off = G.row != G.col
+    r, c = G.row[off], G.col[off]
+    w = np.maximum(np.maximum(G.data[off].astype(np.float32), core[r]), core[c])
+    finite = np.isfinite(w)
+    r, c, w = r[finite], c[finite], w[finite]
+    if len(w) == 0:
+        return np.empty(0, dtype=np.float32)
+    # csgraph 把 0 当作 "无边"：换成最小正数参与计算，返回前还原
+    tiny = np.finfo(np.float64).tiny
+    tree = minimum_spanning_tree(sparse.csr_matrix((np.maximum(w.astype(np.float64), tiny), (r, c)), shape=G.shape))
+    return np.where(tree.data <= tiny, 0.0, tree.data).astype(np.float32)
+
+
+def _noise_thresholds(D, core) -> np.ndarray:
+    """
+    n_i = min_j max(c_j, d_ij)：eps < n_i 时样本 i 既不是核心点、也不在任何核心点的 eps 邻域内，即为噪音。
+    (j = i 时该项等于 c_i)
+    """
+    n = D.shape[0]
+    out = np.full(n, np.inf, dtype=np.float32)
+    if n == 0:
+        return out
+    if hasattr(D, 'tocsr'):
+        G = D.tocsr()
+        vals = np.maximum(G.data.astype(np.float32), core[G.indices])
+        nonempty = np.diff(G.indptr) > 0
+        out[nonempty] = np.minimum.reduceat(vals, G.indptr[:-1][nonempty])
+        return out
+    rows = _block_rows(n)
+    for start in range(0, n, rows):
+        block = np.asarray(D[start:start + rows], dtype=np.float32)
+        out[start:start + len(block)] = np.maximum(block, core[None, :]).min(axis=1)
+    return out
+
+
+class DBSCANProfile:
+    """
+    一次构建、任意 eps 下直接读出 DBSCAN (metric='precomputed') 的类别数与噪音比例。
+
+    记 c_i 为核心距离 (第 min_samples 近，含自身)，则 eps 下：
+      - 核心点 = {c_i <= eps}；两个核心点在同一类 ⇔ 在 w_ij = max(c_i, c_j, d_ij) 的图中
+        由 <= eps 的边连通，因此类别数 = 核心点数 - 该图最小生成森林中 <= eps 的边数；
+      - 噪音 = {n_i > eps}，n_i 见 _noise_thresholds。
+    三个阈值数组排序后每次查询只是两次二分查找。比较在 float32 下进行，与 sklearn 对 float32
+    距离矩阵的 d <= eps 判定一致，读出的类别数/噪音比例与实际拟合结果完全相同。
+    """
+
+    def __init__(self, D, min_samples: int):
+        self.n_samples = D.shape[0]
+        core = core_distances(D, min_samples)
+        if hasattr(D, 'tocsr'):
+            mst = _sparse_mst_weights(D, core)
+        elif np.isfinite(core).all():
+            mst = _dense_mst_weights(D, core)
+        else:
+            mst = np.empty(0, dtype=np.float32)
+        self._core = np.sort(core[np.isfinite(core)])
+        self._mst = np.sort(mst)
+        self._noise = np.sort(_noise_thresholds(D, core))
+
+    def clusters_at(self, eps: float) -> int:
+        e = np.float32(eps)
+        return int(np.searchsorted(self._core, e, side='right') - np.searchsorted(self._mst, e, side='right'))
+
+    def noise_ratio_at(self, eps: float) -> float:
+        if self.n_samples == 0:
+            return 0.0
+        n_noise = self.n_samples - int(np.searchsorted(self._noise, np.float32(eps), side='right'))
+        return n_noise / self.n_samples
+
+    def evaluate(self, eps: float):
+        return self.clusters_at(eps), self.noise_ratio_at(eps)
+
+    def evaluate_many(self, eps_values):
+        """一组 eps 下的 (类别数数组, 噪音比例数组)"""
+        e = np.asarray(eps_values, dtype=np.float32)
+        k = np.searchsorted(self._core, e, side='right') - np.searchsorted(self._mst, e, side='right')
+        n_noise = self.n_samples - np.searchsorted(self._noise, e, side='right')
+        return k.astype(int), n_noise / max(self.n_samples, 1)
+
+    def breakpoints(self) -> np.ndarray:
+        """类别数或噪音比例可能变化的全部 eps (升序)；相邻两个断点之间结果不变"""
+        return np.unique(np.concatenate([self._core, self._mst, self._noise[np.isfinite(self._noise)]]))
+
+
+def _direction(k: int, nz: float) -> int:
+    """0: 满足目标；-1: 需要减小 eps (只剩一个类)；1: 需要增大 eps (类太多或噪音太多)；None: 无法判断"""
+    if TARGET_MIN_CLUSTERS <= k <= TARGET_MAX_CLUSTERS and nz <= TARGET_MAX_NOISE:
+        return 0
+    if k == 1:
+        return -1
+    if nz > TARGET_MAX_NOISE or k > TARGET_MAX_CLUSTERS:
+        return 1
+    return None
+
+
+def search_dbscan_eps(profile: DBSCANProfile, eps: float):
+    """
+    在 DBSCANProfile 上搜索满足 "2-5 个类且噪音 <= 0.4" 的 eps，返回 (eps, clusters, noise_ratio)。
+
+    规则与逐步试探的旧逻辑相同：只剩一个类时减小 eps，类太多或噪音太多时增大 eps，
+    "单个类但噪音过多" 直接停止；移动过程中不接受 "越过目标" 的 eps (增大到噪音不多却只剩一个类，
+    或减小到超过 5 个类 / 噪音过多)。结果只在断点处变化，因此一次性读出初值一侧全部断点的
+    (类别数, 噪音比例)，取越过目标之前离初值最近的满足条件的断点；没有时停在越过目标之前的最后一个断点。
+    """
+    k, nz = profile.evaluate(eps)
+    print(f"Initial run: eps = {eps}, clusters = {k}, noise_ratio = {nz:.3f}")
+    direction = _direction(k, nz)
+    if direction == 0:
+        print("Target reached.")
+        return eps, k, nz
+    if direction == -1 and nz > TARGET_MAX_NOISE:
+        print("Conflict detected (Single cluster but high noise). Stopping.")
+        return eps, k, nz
+    if direction is None:
+        return eps, k, nz
+
+    points = profile.breakpoints()
+    points = points[points >= np.float32(MIN_EPS)]
+    e32 = np.float32(eps)
+    # 候选断点按离初值由近到远排列
+    if direction == 1:
+        cand = points[points > e32]
+    else:
+        cand = np.unique(np.concatenate([[np.float32(MIN_EPS)], points[points < e32]]))[::-1]
+    if len(cand) == 0:
+        return eps, k, nz
+
+    ks, nzs = profile.evaluate_many(cand)
+    ok = (ks >= TARGET_MIN_CLUSTERS) & (ks <= TARGET_MAX_CLUSTERS) & (nzs <= TARGET_MAX_NOISE)
+    if direction == 1:
+        # 从全噪音出发时，最初几个核心点形成的 "单个类 + 大量噪音" 只是 eps 还不够大；
+        # 噪音已降下来却只剩一个类才算越过 (所有类被合并)
+        overshot = (ks == 1) & (nzs <= TARGET_MAX_NOISE)
+    else:
+        overshot = (ks > TARGET_MAX_CLUSTERS) | (nzs > TARGET_MAX_NOISE)
+    stop = int(np.argmax(overshot)) if overshot.any() else len(cand)
+    hits = np.flatnonzero(ok[:stop])
+    print(f"  -> 扫描 {len(cand)} 个 eps 断点 ({'增大' if direction == 1 else '减小'}方向)，"
+          f"{'第 ' + str(stop + 1) + ' 个断点越过目标' if stop < len(cand) else '未越过目标'}")
+    if len(hits):
+        pos = int(hits[0])
+        print("Target reached.")
+    elif stop > 0:
+        pos = stop - 1
+    else:
+        return eps, k, nz
+    return float(cand[pos]), int(ks[pos]), float(nzs[pos])
+
+
+def _sklearn_tree_api():
+    """sklearn HDBSCAN 内部的 (构建单链接树, 从树提取标签) 函数；版本不兼容时返回 None"""
+    try:
+        from sklearn.cluster._hdbscan.hdbscan import _hdbscan_brute
+        from sklearn.cluster._hdbscan._tree import tree_to_labels
+    except ImportError:
+        return None
+    return _hdbscan_brute, tree_to_labels
+
+
+class HDBSCANTreeCache:
+    """
+    HDBSCAN (sklearn, metric='precomputed') 的单链接树缓存。
+
+    互达距离最小生成树 / 单链接树只取决于距离矩阵与 min_samples，与 min_cluster_size、
+    cluster_selection_epsilon 无关：每个 min_samples 只构建一次树，之后各次试探只在树上重新
+    做凝聚树与簇选择 (tree_to_labels)，结果与完整 fit_predict 相同。
+    sklearn 内部接口不可用或输入不满足快速路径条件时退回完整拟合。
+    """
+
+    def __init__(self, D):
+        self._D = D
+        self._trees = {}
+        self._api = _sklearn_tree_api()
+        self.n_builds = 0
+        self.n_extractions = 0
+
+    def _tree(self, min_samples: int):
+        tree = self._trees.get(min_samples)
+        if tree is None:
+            build, _ = self._api
+            if hasattr(self._D, 'tocsr'):
+                X = self._D.tocsr().astype(np.float64)
+            else:
+                X = np.array(self._D, dtype=np.float64)
+            tree = build(X=X, min_samples=min_samples, alpha=1.0, metric='precomputed', copy=False)
+            self._trees[min_samples] = tree
+            self.n_builds += 1
+            print(f"  [HDBSCAN] 构建单链接树 (min_samples={min_samples})")
+        return tree
+
+    def fit_predict(self, min_cluster_size: int, cluster_selection_epsilon: float, min_samples: int = None):
+        n = self._D.shape[0]
+        ms = min_cluster_size if min_samples is None else min_samples
+        if self._api is None or n < 2 or ms > n:
+            from sklearn.cluster import HDBSCAN
+            return HDBSCAN(min_cluster_size=min_cluster_size, metric='precomputed',
+                           cluster_selection_epsilon=cluster_selection_epsilon,
+                           min_samples=min_samples).fit_predict(self._D)
+        _, extract = self._api
+        labels, _ = extract(self._tree(ms), min_cluster_size, 'eom', False, float(cluster_selection_epsilon), None)
+        self.n_extractions += 1
+        return labels
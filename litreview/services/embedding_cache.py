@@ -0,0 +1,302 @@
+import os
+import json
+import time
+import hashlib
+import atexit
+import threading
+
+import numpy as np
+
+
+CACHE_DIR_NAME = "向量缓存"
+
+# 索引 (JSON) 的最短落盘间隔 (秒)，可用 LITREVIEW_EMBED_CACHE_FLUSH_SECONDS 覆盖；
+# 期间的写入只标记为待落盘，由任务结束时的 flush_embedding_caches() 或进程退出时统一写出
+DEFAULT_INDEX_FLUSH_SECONDS = 30.0
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1((text or "").encode('utf-8')).hexdigest()
+
+
+def resolve_cache_dir(folder_path: str = None):
+    """
+    推断向量缓存目录。
+
+    - 传入 `文献整理合集` 目录时，缓存放在其同级的 `向量缓存` 目录；
+    - 否则使用 LITREVIEW_WORKDIR/向量缓存；
+    - LITREVIEW_EMBED_CACHE=0 或无法推断时返回 None (不使用缓存)。
+    """
+    if os.environ.get('LITREVIEW_EMBED_CACHE', '1') == '0':
+        return None
+    if folder_path:
+        base = os.path.dirname(os.path.abspath(folder_path))
+        return os.path.join(base, CACHE_DIR_NAME)
+    work_dir = os.environ.get('LITREVIEW_WORKDIR')
+    if work_dir:
+        return os.path.join(work_dir, CACHE_DIR_NAME)
+    return None
+
+
+class EmbeddingCache:
+    """
+    内容寻址的磁盘向量缓存。
+
+    每个模型对应两份文件：
+    - <slug>.vec: 行优先的 float16/float32 原始矩阵，可直接 np.memmap；
+    - <slug>.index.json: {key: [行号, 最近使用时间]} 以及 dim/dtype/行数等元数据。
+
+    key 为文本的 sha1 (可带命名空间前缀)。写入采用追加方式，超过 max_bytes 时按 LRU
+    淘汰到 90% 水位并压缩矩阵文件。
+
+    索引随缓存条目数增长 (上限附近可达数十 MB)，不在每次读写后整体重写：新增条目与 LRU 时间戳
+    只标记为待落盘，距上次落盘超过 flush_interval 秒才写一次，其余由 flush() 写出。
+    进程在落盘前退出时，矩阵文件末尾未登记的行在下次载入时截掉，对应文本重新编码即可；
+    新建矩阵文件后的第一次写入立即落盘索引。
+    """
+
+    def __init__(self, cache_dir: str, model_name: str, dtype: str = None, max_bytes: int = None):
+        self.cache_dir = cache_dir
+        self.model_name = model_name
+        self.dtype = np.dtype(dtype or os.environ.get('LITREVIEW_EMBED_CACHE_DTYPE', 'float16'))
+        if max_bytes is None:
+            max_bytes = int(float(os.environ.get('LITREVIEW_EMBED_CACHE_MAX_MB', '2048')) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        try:
+            self.flush_interval = float(os.environ.get('LITREVIEW_EMBED_CACHE_FLUSH_SECONDS', DEFAULT_INDEX_FLUSH_SECONDS))
+        except ValueError:
+            self.flush_interval = DEFAULT_INDEX_FLUSH_SECONDS
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._last_save = time.monotonic()
+
+        slug = model_name.replace("/", "_")
+        os.makedirs(cache_dir, exist_ok=True)
+        self.vec_path = os.path.join(cache_dir, f"{slug}.vec")
+        self.index_path = os.path.join(cache_dir, f"{slug}.index.json")
+
+        self.dim = None
+        self.n_rows = 0          # 矩阵文件中的总行数 (含已淘汰的空洞行)
+        self.entries = {}        # key -> [row, last_used]
+        self._load_index()
+
+    # ------------------------------------------------------------------
+    # 元数据
+    # ------------------------------------------------------------------
+    def _load_index(self):
+        if not os.path.isfile(self.index_path):
+            if os.path.isfile(self.vec_path):
+                # 首次落盘前进程退出：矩阵文件中的行都未登记，不能沿用
+                self._reset("索引文件缺失，丢弃未登记的矩阵文件。")
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('dtype') != self.dtype.name:
+                self._reset(f"dtype 变更 ({meta.get('dtype')} -> {self.dtype.name})，重建缓存。")
+                return
+            self.dim = meta.get('dim')
+            self.n_rows = int(meta.get('n_rows', 0))
+            self.entries = {k: list(v) for k, v in meta.get('entries', {}).items()}
+            # 矩阵文件被截断/删除时，丢弃越界条目
+            expected = self.n_rows * (self.dim or 0) * self.dtype.itemsize
+            actual = os.path.getsize(self.vec_path) if os.path.isfile(self.vec_path) else 0
+            if actual < expected:
+                self._reset("矩阵文件不完整，重建缓存。")
+            elif actual > expected:
+                # 上次追加后索引未落盘：截掉未登记的行，保证后续追加的行号与文件位置一致
+                with open(self.vec_path, 'r+b') as f:
+                    f.truncate(expected)
+        except Exception as e:
+            self._reset(f"索引读取失败，重建缓存: {e}")
+
+    def _reset(self, reason: str):
+        """清空索引并删除矩阵文件：行号从 0 重新编号时，旧文件中的字节不能留在新行的位置上"""
+        print(f"[EMBED_CACHE] {reason}")
+        self.dim, self.n_rows, self.entries = None, 0, {}
+        if os.path.isfile(self.vec_path):
+            os.remove(self.vec_path)
+
+    def _save_index(self):
+        meta = {
+            'model_name': self.model_name,
+            'dtype': self.dtype.name,
+            'dim': self.dim,
+            'n_rows': self.n_rows,
+            'entries': self.entries,
+        }
+        tmp = self.index_path + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp, self.index_path)
+        self._dirty = False
+        self._last_save = time.monotonic()
+
+    def _mark_dirty(self):
+        self._dirty = True
+        if time.monotonic() - self._last_save >= self.flush_interval:
+            self._save_index()
+
+    def flush(self):
+        """把待落盘的索引写出 (无变更时不写)"""
+        with self._lock:
+            if self._dirty:
+                self._save_index()
+
+    @property
+    def row_bytes(self) -> int:
+        return (self.dim or 0) * self.dtype.itemsize
+
+    def stats(self) -> dict:
+        return {
+            'entries': len(self.entries),
+            'file_rows': self.n_rows,
+            'bytes': len(self.entries) * self.row_bytes,
+            'file_bytes': self.n_rows * self.row_bytes,
+            'max_bytes': self.max_bytes,
+        }
+
+    # ------------------------------------------------------------------
+    # 读写
+    # ------------------------------------------------------------------
+    def _open_matrix(self):
+        if not self.n_rows or not self.dim:
+            return None
+        return np.memmap(self.vec_path, dtype=self.dtype, mode='r', shape=(self.n_rows, self.dim))
+
+    def get_many(self, keys):
+        """
+        返回 (vectors, missing)：vectors 为 {位置: 向量(float32)}，missing 为未命中的位置列表。
+        """
+        with self._lock:
+            found_pos, found_rows, missing = [], [], []
+            now = time.time()
+            for i, k in enumerate(keys):
+                e = self.entries.get(k)
+                if e is None:
+                    missing.append(i)
+                else:
+                    e[1] = now
+                    found_pos.append(i)
+                    found_rows.append(e[0])
+
+            vectors = {}
+            if found_rows:
+                mm = self._open_matrix()
+                block = np.asarray(mm[np.asarray(found_rows)], dtype=np.float32)
+                del mm
+                for i, vec in zip(found_pos, block):
+                    vectors[i] = vec
+            return vectors, missing
+
+    def put_many(self, keys, vectors):
+        """追加新向量，返回按存储精度回读后的 float32 向量 (与命中时的结果保持一致)"""
+        vectors = np.asarray(vectors)
+        if len(keys) == 0:
+            return vectors.astype(np.float32)
+        with self._lock:
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"向量维度不一致: cache={self.dim}, new={vectors.shape[1]}")
+
+            stored = vectors.astype(self.dtype)
+            new_keys, new_rows = [], []
+            seen = set()
+            for k, row in zip(keys, stored):
+                if k in self.entries or k in seen:
+                    continue
+                seen.add(k)
+                new_keys.append(k)
+                new_rows.append(row)
+
+            if new_rows:
+                first_write = self.n_rows == 0
+                # 按行号定位写入 (而不是追加到文件末尾)，文件中残留的多余字节不会错位到新行上
+                mode = 'r+b' if os.path.isfile(self.vec_path) else 'wb'
+                with open(self.vec_path, mode) as f:
+                    f.seek(self.n_rows * self.row_bytes)
+                    f.write(np.ascontiguousarray(np.stack(new_rows)).tobytes())
+                    f.truncate()
+                now = time.time()
+                for k in new_keys:
+                    self.entries[k] = [self.n_rows, now]
+                    self.n_rows += 1
+                self._evict_if_needed()
+                if first_write:
+                    # 新矩阵文件的第一批行立即登记，避免落盘前退出时留下没有索引的矩阵文件
+                    self._save_index()
+                else:
+                    self._mark_dirty()
+            return stored.astype(np.float32)
+
+    def touch(self):
+        """记录 LRU 时间戳 (随下一次落盘写出)"""
+        with self._lock:
+            self._mark_dirty()
+
+    # ------------------------------------------------------------------
+    # 淘汰与压缩
+    # ------------------------------------------------------------------
+    def _evict_if_needed(self):
+        if not self.max_bytes or not self.row_bytes:
+            return
+        live_bytes = len(self.entries) * self.row_bytes
+        if live_bytes > self.max_bytes:
+            keep_n = int(self.max_bytes * 0.9) // self.row_bytes
+            by_recency = sorted(self.entries.items(), key=lambda kv: kv[1][1], reverse=True)
+            evicted = len(by_recency) - keep_n
+            self.entries = dict(by_recency[:keep_n])
+            print(f"[EMBED_CACHE] 超出容量上限 ({self.max_bytes / 1024 / 1024:.0f} MB)，按 LRU 淘汰 {evicted} 条向量。")
+        # 空洞行超过一半时压缩文件
+        if self.n_rows > 2 * max(len(self.entries), 1) or self.n_rows * self.row_bytes > self.max_bytes:
+            self._compact()
+
+    def _compact(self):
+        items = sorted(self.entries.items(), key=lambda kv: kv[1][0])
+        rows = np.asarray([v[0] for _, v in items], dtype=np.int64)
+        if len(rows):
+            mm = self._open_matrix()
+            kept = np.array(mm[rows])
+            del mm
+        else:
+            kept = np.zeros((0, self.dim or 0), dtype=self.dtype)
+        tmp = self.vec_path + ".tmp"
+        with open(tmp, 'wb') as f:
+            f.write(np.ascontiguousarray(kept).tobytes())
+        os.replace(tmp, self.vec_path)
+        self.entries = {k: [i, v[1]] for i, (k, v) in enumerate(items)}
+        self.n_rows = len(items)
+        # 行号已整体改变，索引必须立即与新的矩阵文件一致
+        self._save_index()
+
+
+_CACHES = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_embedding_cache(cache_dir: str, model_name: str):
+    """同一 (目录, 模型) 在进程内共享一个缓存实例"""
+    if not cache_dir:
+        return None
+    key = (os.path.abspath(cache_dir), model_name)
+    with _CACHES_LOCK:
+        cache = _CACHES.get(key)
+        if cache is None:
+            cache = EmbeddingCache(cache_dir, model_name)
+            _CACHES[key] = cache
+        return cache
+
+
+def flush_embedding_caches():
+    """写出所有缓存实例待落盘的索引 (任务结束时调用)"""
+    with _CACHES_LOCK:
+        caches = list(_CACHES.values())
+    for cache in caches:
+        try:
+            cache.flush()
+        except Exception as e:
+            print(f"[EMBED_CACHE] 索引写出失败: {e}")
+
+
+atexit.register(flush_embedding_caches)
@@ -0,0 +1,179 @@
+import os
+import atexit
+import threading
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+def configured_workers() -> int:
+    """编码进程数：LITREVIEW_EMBED_WORKERS，0 (默认) 表示在当前进程内编码"""
+    try:
+        return max(0, int(os.environ.get('LITREVIEW_EMBED_WORKERS', '0')))
+    except ValueError:
+        return 0
+
+
+def threads_per_worker(workers: int) -> int:
+    """每个编码进程的 torch/ORT 线程数：LITREVIEW_EMBED_THREADS_PER_WORKER，默认平分 CPU 核数"""
+    env = os.environ.get('LITREVIEW_EMBED_THREADS_PER_WORKER')
+    if env:
+        return max(1, int(env))
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+# ----------------------------------------------------------------------
+# 子进程侧
+# ----------------------------------------------------------------------
+_WORKER_MODEL = None
+
+
+def _worker_init(model_name, backend, n_threads, worker_counter, pin_cpus):
+    """子进程初始化：限制线程数、(可选) 绑定 CPU 核，然后加载模型"""
+    global _WORKER_MODEL
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'LITREVIEW_ORT_THREADS'):
+        os.environ[var] = str(n_threads)
+
+    with worker_counter.get_lock():
+        index = worker_counter.value
+        worker_counter.value += 1
+    if pin_cpus and hasattr(os, 'sched_setaffinity'):
+        n_cpu = os.cpu_count() or 1
+        cores = {(index * n_threads + k) % n_cpu for k in range(n_threads)}
+        try:
+            os.sched_setaffinity(0, cores)
+        except OSError:
+            pass
+
+    import torch
+    torch.set_num_threads(n_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass
+
+    from .embedding_service import load_embedding_model
+    _WORKER_MODEL = load_embedding_model(model_name, device='cpu', backend=backend)
+
+
+def _worker_ping():
+    return getattr(_WORKER_MODEL, 'max_seq_length', None)
+
+
+def _worker_encode(texts):
+    vecs = _WORKER_MODEL.encode(list(texts), batch_size=len(texts), show_progress_bar=False)
+    return np.asarray(vecs, dtype=np.float32)
+
+
+# ----------------------------------------------------------------------
+# 主进程侧
+# ----------------------------------------------------------------------
+class EncodePool:
+    """
+    多进程编码池。
+
+    每个子进程加载一份模型并固定 torch 线程数 (可选绑定 CPU 核)，主进程把分桶后的批次
+    分发给各子进程并按顺序收回结果。池只启动一次，之后所有任务复用，进程启动与模型加载的
+    开销只付一次。注意每个子进程都持有一份完整权重 (bge-m3 fp32 约 2.2GB)。
+    """
+
+    def __init__(self, model_name: str, backend: str, workers: int, n_threads: int = None):
+        self.model_name = model_name
+        self.backend = backend
+        self.workers = workers
+        self.n_threads = n_threads or threads_per_worker(workers)
+        self.max_seq_length = None
+        self._executor = None
+        self._tokenizer = None
+        self._tokenizer_loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def started(self) -> bool:
+        return self._executor is not None
+
+    def start(self):
+        with self._lock:
+            if self._executor is not None:
+                return self
+            print(f"🚀 正在启动编码进程池: {self.workers} 个进程 × {self.n_threads} 线程 ({self.model_name}, {self.backend})")
+            # spawn：Windows 与 Linux 行为一致，也避免 fork 已加载 torch 的父进程
+            ctx = mp.get_context('spawn')
+            pin = os.environ.get('LITREVIEW_EMBED_PIN_CPUS', '1') != '0'
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=ctx,
+                initializer=_worker_init,
+                initargs=(self.model_name, self.backend, self.n_threads, ctx.Value('i', 0), pin),
+            )
+            # 预热：让每个子进程都完成模型加载
+            pings = [self._executor.submit(_worker_ping) for _ in range(self.workers)]
+            self.max_seq_length = next((p.result() for p in pings if p.result()), None)
+            print(f"✅ 编码进程池已就绪 (max_seq_length={self.max_seq_length})")
+            return self
+
+    @property
+    def tokenizer(self):
+        """主进程只加载 tokenizer 用于长度估算与切块，加载失败时返回 None (退化为按字符估算)"""
+        if not self._tokenizer_loaded:
+            self._tokenizer_loaded = True
+            try:
+                from transformers import AutoTokenizer
+                from .embedding_service import _local_model_path
+                from .onnx_embedder import onnx_model_dir
+                path = onnx_model_dir(self.model_name) if self.backend == 'onnx-int8' else _local_model_path(self.model_name)
+                self._tokenizer = AutoTokenizer.from_pretrained(path if os.path.isdir(path) else self.model_name)
+            except Exception as e:
+                print(f"⚠️ 主进程 tokenizer 加载失败，按字符数估算长度: {e}")
+                self._tokenizer = None
+        return self._tokenizer
+
+    def encode_batches(self, batches):
+        """并行编码多个批次 (每个批次为文本列表)，按输入顺序返回向量矩阵列表"""
+        self.start()
+        futures = [self._executor.submit(_worker_encode, batch) for batch in batches]
+        return [f.result() for f in futures]
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_encode_pool(model_name: str, backend: str, device: str = 'cpu'):
+    """返回 (必要时创建) 进程级共享的编码池；未启用多进程或非 CPU 设备时返回 None"""
+    workers = configured_workers()
+    if workers < 1 or device != 'cpu':
+        return None
+    key = (model_name, backend)
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = EncodePool(model_name, backend, workers)
+            _POOLS[key] = pool
+        return pool
+
+
+def discard_encode_pool(pool: EncodePool):
+    """池损坏 (子进程崩溃) 时丢弃，下次调用重新创建"""
+    with _POOLS_LOCK:
+        for key, value in list(_POOLS.items()):
+            if value is pool:
+                del _POOLS[key]
+    try:
+        pool.shutdown()
+    except Exception:
+        pass
+
+
+@atexit.register
+def _shutdown_pools():
+    for pool in list(_POOLS.values()):
+        pool.shutdown()
+
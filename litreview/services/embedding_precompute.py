@@ -0,0 +1,96 @@
+import os
+import queue
+import threading
+
+from .corpus_embeddings import SECTION_HEADINGS, section_token_budgets, extract_section_text
+from .embedding_cache import resolve_cache_dir, flush_embedding_caches
+from .embedding_service import DEFAULT_MODEL_NAME, encode_texts
+
+
+def precompute_enabled() -> bool:
+    """LITREVIEW_PRECOMPUTE_EMBEDDINGS=0 可关闭文献整理期间的后台向量预计算"""
+    return os.environ.get('LITREVIEW_PRECOMPUTE_EMBEDDINGS', '1') != '0'
+
+
+class EmbeddingPrecomputer:
+    """
+    文献整理期间的后台向量预计算。
+
+    SummaryService 每写出一篇 md 就把路径放入队列；后台线程攒一小批后解析四个章节，
+    按与聚类时相同的文本、token 预算写入磁盘向量缓存。用户点击聚类时，语料向量基本都已命中缓存。
+    OCR / LLM 调用都在远端，本地 CPU 空闲，预计算不会拖慢整理流程。
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, batch_wait: float = 2.0, max_batch: int = 16):
+        self.model_name = model_name
+        self.batch_wait = batch_wait
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.done = 0
+        self.failed = 0
+
+    def submit(self, md_path: str):
+        if not precompute_enabled() or not md_path:
+            return
+        self._queue.put(md_path)
+        self._ensure_worker()
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        while True:
+            paths = [self._queue.get()]
+            # 攒批：等待 batch_wait 秒内陆续写出的文件，一起编码
+            while len(paths) < self.max_batch:
+                try:
+                    paths.append(self._queue.get(timeout=self.batch_wait))
+                except queue.Empty:
+                    break
+            try:
+                self._precompute(paths)
+                self.done += len(paths)
+            except Exception as e:
+                self.failed += len(paths)
+                print(f"[EMBED_PRECOMPUTE][ERROR] {e}", flush=True)
+
+    def _precompute(self, paths):
+        budgets = section_token_budgets()
+        by_cache = {}
+        for path in paths:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    content = f.read()
+            except OSError as e:
+                print(f"[EMBED_PRECOMPUTE][READ_ERROR] {path}: {e}", flush=True)
+                continue
+            cache_dir = resolve_cache_dir(os.path.dirname(os.path.abspath(path)))
+            if not cache_dir:
+                continue
+            texts, max_tokens, groups = by_cache.setdefault(cache_dir, ([], [], []))
+            for key, heading in SECTION_HEADINGS.items():
+                text = extract_section_text(content, heading)
+                if text:
+                    texts.append(text)
+                    max_tokens.append(budgets.get(key))
+                    groups.append(key)
+
+        for cache_dir, (texts, max_tokens, groups) in by_cache.items():
+            if not texts:
+                continue
+            print(f"[EMBED_PRECOMPUTE] 预计算 {len(paths)} 篇文献的 {len(texts)} 条章节向量 -> {cache_dir}", flush=True)
+            encode_texts(texts, model_name=self.model_name, cache_dir=cache_dir, show_progress_bar=False,
+                         max_tokens=max_tokens, groups=groups)
+        # 后台预计算没有明确的任务边界，每批结束写出一次索引
+        flush_embedding_caches()
+
+
+embedding_precomputer = EmbeddingPrecomputer()
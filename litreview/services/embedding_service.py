@@ -0,0 +1,443 @@
+import os
+import threading
+from contextlib import contextmanager
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from .embedding_cache import get_embedding_cache, text_hash
+from .embedding_pool import get_encode_pool, discard_encode_pool
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+DEFAULT_MODEL_NAME = 'BAAI/bge-m3'
+
+# 推理后端：torch (fp32 PyTorch，默认) / onnx-int8 (ONNX Runtime + 动态 int8 量化)
+BACKENDS = ('torch', 'onnx-int8')
+
+# 分桶调度：单批次的 token 预算 (批内条数 × 批内最长长度)，以及单批条数上限相对 batch_size 的倍数
+DEFAULT_TOKEN_BUDGET = _env_int('LITREVIEW_EMBED_TOKEN_BUDGET', 16384)
+MAX_BATCH_FACTOR = 4
+
+# 超出 token 预算的长文本按窗口切块，相邻块重叠的 token 数
+DEFAULT_CHUNK_OVERLAP = _env_int('LITREVIEW_EMBED_CHUNK_OVERLAP', 64)
+
+
+def _local_model_path(model_name: str) -> str:
+    """本地模型缓存目录：<cwd>/models/<model_name 中的 / 替换为 _>"""
+    models_dir = os.path.join(os.getcwd(), "models")
+    return os.path.join(models_dir, model_name.replace("/", "_"))
+
+
+def load_sentence_transformer(model_name: str = DEFAULT_MODEL_NAME, device: str = 'cpu') -> SentenceTransformer:
+    """
+    从本地 models 目录加载语义模型，本地不存在或加载失败时从远端下载并缓存到本地。
+    """
+    local_model_path = _local_model_path(model_name)
+
+    embedder = None
+    if os.path.exists(local_model_path) and len(os.listdir(local_model_path)) > 0:
+        print(f"✅ 检测到本地模型: {local_model_path}")
+        try:
+            embedder = SentenceTransformer(local_model_path, device=device)
+        except Exception:
+            print("❌ 本地加载失败，准备重新下载...")
+
+    if embedder is None:
+        print(f"🌐 正在下载模型: {model_name}")
+        embedder = SentenceTransformer(model_name, device=device)
+        os.makedirs(os.path.dirname(local_model_path), exist_ok=True)
+        embedder.save(local_model_path)
+        print("✅ 模型已缓存到本地。")
+
+    return embedder
+
+
+def estimate_token_lengths(model, texts) -> list:
+    """
+    估算每条文本编码时的 token 长度 (按模型 max_seq_length 截断)。
+    模型没有可用的 tokenizer 时退化为字符数。
+    """
+    max_len = getattr(model, 'max_seq_length', None) or None
+    tokenizer = getattr(model, 'tokenizer', None)
+    lengths = None
+    if tokenizer is not None:
+        try:
+            enc = tokenizer(list(texts), add_special_tokens=True, truncation=False)
+            lengths = [len(ids) for ids in enc['input_ids']]
+        except Exception:
+            lengths = None
+    if lengths is None:
+        lengths = [len(t or "") + 2 for t in texts]
+    if max_len:
+        lengths = [min(n, max_len) for n in lengths]
+    return lengths
+
+
+def split_into_token_chunks(tokenizer, text: str, max_tokens: int, overlap: int = None):
+    """
+    把文本切成不超过 max_tokens (含首尾特殊 token) 的重叠窗口，
+    返回 (块文本列表, 原始 token 数, 各块 token 数)。
+    tokenizer 支持 offset_mapping 时按 token 边界切回原文；否则按字符近似 (1 字符 ≈ 1 token)。
+    """
+    text = text or ""
+    overlap = DEFAULT_CHUNK_OVERLAP if overlap is None else overlap
+    body = max(8, int(max_tokens) - 2)
+    overlap = min(max(0, overlap), body // 2)
+
+    offsets = None
+    if tokenizer is not None:
+        try:
+            enc = tokenizer(text, add_special_tokens=False, truncation=False, return_offsets_mapping=True)
+            offsets = enc['offset_mapping']
+        except Exception:
+            offsets = None
+    if offsets is None:
+        offsets = [(i, i + 1) for i in range(len(text))]
+
+    n_tokens = len(offsets) + 2
+    if len(offsets) <= body:
+        return [text], n_tokens, [n_tokens]
+
+    chunks, chunk_tokens = [], []
+    step = body - overlap
+    for start in range(0, len(offsets), step):
+        end = min(start + body, len(offsets))
+        chunks.append(text[offsets[start][0]:offsets[end - 1][1]])
+        chunk_tokens.append(end - start + 2)
+        if end == len(offsets):
+            break
+    return chunks, n_tokens, chunk_tokens
+
+
+def plan_length_buckets(lengths, batch_size: int = 32, token_budget: int = None, max_batch: int = None) -> list:
+    """
+    按长度分桶的批次调度。
+
+    文本按 token 长度降序排列后依次装箱：一个批次的填充后规模 (条数 × 批内最长长度)
+    不超过 token_budget，条数不超过 max_batch。长文本自然落入小批次，短文本合成大批次，
+    批内长度接近，padding 最少。返回原始下标的批次列表。
+    """
+    token_budget = token_budget or DEFAULT_TOKEN_BUDGET
+    max_batch = max_batch or batch_size * MAX_BATCH_FACTOR
+    order = sorted(range(len(lengths)), key=lambda i: -lengths[i])
+    batches, current, current_max = [], [], 0
+    for i in order:
+        # 降序装箱：批内最长长度就是该批第一条的长度
+        if current and (len(current) + 1 > max_batch or (len(current) + 1) * current_max > token_budget):
+            batches.append(current)
+            current = []
+        if not current:
+            current_max = lengths[i]
+        current.append(i)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def padded_tokens(lengths, batches) -> int:
+    """批次计划的填充后 token 总数 (每批 条数 × 批内最长长度)"""
+    return sum(len(b) * max(lengths[i] for i in b) for b in batches if b)
+
+
+def resolve_backend(backend: str = None) -> str:
+    """推理后端：显式参数优先，其次 LITREVIEW_EMBED_BACKEND，默认 torch"""
+    backend = (backend or os.environ.get('LITREVIEW_EMBED_BACKEND') or 'torch').lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"未知的向量化后端: {backend}，可选 {BACKENDS}")
+    return backend
+
+
+def cache_model_id(model_name: str, backend: str = None) -> str:
+    """磁盘向量缓存使用的模型标识：不同后端的向量不混用"""
+    backend = resolve_backend(backend)
+    return model_name if backend == 'torch' else f"{model_name}@{backend}"
+
+
+def load_embedding_model(model_name: str = DEFAULT_MODEL_NAME, device: str = 'cpu', backend: str = None):
+    backend = resolve_backend(backend)
+    if backend == 'onnx-int8':
+        from .onnx_embedder import load_onnx_int8_embedder
+        return load_onnx_int8_embedder(model_name)
+    return load_sentence_transformer(model_name, device=device)
+
+
+class EmbeddingModelRegistry:
+    """
+    进程级语义模型注册表。
+
+    每个 (model_name, device, backend) 在进程内只加载一次；加载过程与 encode 调用都按模型加锁，
+    多个聚类任务/线程共享同一份权重，不会重复反序列化 ~2GB 的模型文件。
+    设置 LITREVIEW_EMBED_WORKERS>0 时改由多进程编码池 (embedding_pool) 执行，主进程不加载权重。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models = {}
+        self._load_locks = {}
+        self._encode_locks = {}
+
+    def _key(self, model_name: str, device: str, backend: str = None):
+        return (model_name, device, resolve_backend(backend))
+
+    def _load_lock(self, key) -> threading.Lock:
+        with self._lock:
+            if key not in self._load_locks:
+                self._load_locks[key] = threading.Lock()
+                self._encode_locks[key] = threading.Lock()
+            return self._load_locks[key]
+
+    def is_loaded(self, model_name: str = DEFAULT_MODEL_NAME, device: str = 'cpu', backend: str = None) -> bool:
+        return self._key(model_name, device, backend) in self._models
+
+    def get(self, model_name: str = DEFAULT_MODEL_NAME, device: str = 'cpu', backend: str = None):
+        """获取（必要时加载）模型实例"""
+        key = self._key(model_name, device, backend)
+        model = self._models.get(key)
+        if model is not None:
+            return model
+        with self._load_lock(key):
+            model = self._models.get(key)
+            if model is None:
+                print(f"正在准备语义模型: {model_name} ({key[2]}) ...")
+                print(f"🖥️  当前使用计算设备: {str(device).upper()}")
+                model = load_embedding_model(model_name, device=device, backend=key[2])
+                self._models[key] = model
+            else:
+                print(f"♻️ 复用已加载的语义模型: {model_name}")
+        return model
+
+    def text_model(self, model_name: str = DEFAULT_MODEL_NAME, device: str = 'cpu', backend: str = None):
+        """
+        提供 tokenizer / max_seq_length 的对象 (用于长度估算与切块)：
+        启用编码池时为池本身，否则为进程内模型。
+        """
+        pool = get_encode_pool(model_name, resolve_backend(backend), device)
+        if pool is not None:
+            try:
+                return pool.start()
+            except BrokenProcessPool as e:
+                print(f"⚠️ 编码进程池启动失败，回退到进程内模型: {e}")
+                discard_encode_pool(pool)
+        return self.get(model_name, device, backend)
+
+    @contextmanager
+    def acquire(self, model_name: str = DEFAULT_MODEL_NAME, device: str = 'cpu', backend: str = None):
+        """独占地使用模型（encode 期间持有该模型的锁）"""
+        model = self.get(model_name, device, backend)
+        with self._encode_locks[self._key(model_name, device, backend)]:
+            yield model
+
+    def encode(self, texts, model_name: str = DEFAULT_MODEL_NAME, device: str = 'cpu',
+               batch_size: int = 32, show_progress_bar: bool = True, token_budget: int = None,
+               backend: str = None) -> np.ndarray:
+        """
+        线程安全的向量化接口。文本先按长度分桶 (plan_length_buckets)，
+        每个批次单独送入模型，结果按原顺序写回。
+        """
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        pool = get_encode_pool(model_name, resolve_backend(backend), device)
+        if pool is not None:
+            try:
+                pool.start()
+                batches = self._plan(pool, texts, batch_size, token_budget)
+                print(f"   分发到 {pool.workers} 个编码进程...")
+                results = pool.encode_batches([[texts[i] for i in batch] for batch in batches])
+                return self._scatter(len(texts), batches, results)
+            except BrokenProcessPool as e:
+                print(f"⚠️ 编码进程池异常，回退到进程内编码: {e}")
+                discard_encode_pool(pool)
+
+        with self.acquire(model_name, device, backend) as model:
+            batches = self._plan(model, texts, batch_size, token_budget)
+            results = []
+            for b_idx, batch in enumerate(batches):
+                results.append(model.encode([texts[i] for i in batch], show_progress_bar=False,
+                                            batch_size=len(batch), device=device))
+                if show_progress_bar and len(batches) > 1 and (b_idx + 1) % 10 == 0:
+                    print(f"   已完成 {b_idx + 1}/{len(batches)} 个批次")
+            return self._scatter(len(texts), batches, results)
+
+    @staticmethod
+    def _plan(model, texts, batch_size, token_budget):
+        lengths = estimate_token_lengths(model, texts)
+        batches = plan_length_buckets(lengths, batch_size=batch_size, token_budget=token_budget)
+        print(f"[EMBED] {len(texts)} 条文本按长度分为 {len(batches)} 个批次 "
+              f"(填充后 {padded_tokens(lengths, batches)} tokens，有效 {sum(lengths)} tokens)。")
+        return batches
+
+    @staticmethod
+    def _scatter(n_texts, batches, results) -> np.ndarray:
+        """把各批次结果按原始下标写回"""
+        out = None
+        for batch, vecs in zip(batches, results):
+            vecs = np.asarray(vecs)
+            if out is None:
+                out = np.zeros((n_texts, vecs.shape[1]), dtype=vecs.dtype)
+            out[batch] = vecs
+        return out
+
+    def preload(self, model_name: str = DEFAULT_MODEL_NAME, device: str = 'cpu', background: bool = True, backend: str = None):
+        """预加载模型；background=True 时在守护线程中加载，不阻塞调用方"""
+        def _load():
+            try:
+                pool = get_encode_pool(model_name, resolve_backend(backend), device)
+                if pool is not None:
+                    pool.start()
+                else:
+                    self.get(model_name, device, backend)
+                print(f"[EMBEDDING][PRELOAD_DONE] {model_name}", flush=True)
+            except Exception as e:
+                print(f"[EMBEDDING][PRELOAD_ERROR] {model_name}: {e}", flush=True)
+
+        if background:
+            t = threading.Thread(target=_load, daemon=True)
+            t.start()
+            return t
+        _load()
+        return None
+
+
+embedding_registry = EmbeddingModelRegistry()
+
+
+def get_embedder(model_name: str = DEFAULT_MODEL_NAME, device: str = 'cpu', backend: str = None):
+    return embedding_registry.get(model_name, device, backend)
+
+
+def budget_cache_key(text: str, max_tokens: int = None, overlap: int = None) -> str:
+    """磁盘缓存键：不设 token 预算时为文本哈希，设了预算时带上 预算/重叠 前缀"""
+    if not max_tokens:
+        return text_hash(text)
+    overlap = DEFAULT_CHUNK_OVERLAP if overlap is None else overlap
+    return f"tok{int(max_tokens)}o{int(overlap)}:{text_hash(text)}"
+
+
+def _report_token_stats(rows, groups):
+    """
+    按分组 (章节) 汇总 token 统计。rows 为 (原始 token, 各块 token 列表, 模型截断长度)：
+    原始长度按模型 max_seq_length 截断后计算注意力开销 (∑长度²)，便于按章节权衡延迟与保真度。
+    """
+    summary = {}
+    for (orig, chunk_tokens, model_max), g in zip(rows, groups):
+        item = summary.setdefault(g, [0, 0, 0, 0, 0, 0, 0])
+        capped = min(orig, model_max) if model_max else orig
+        item[0] += 1
+        item[1] += orig
+        item[2] += sum(chunk_tokens)
+        item[3] += 1 if len(chunk_tokens) > 1 else 0
+        item[4] += len(chunk_tokens)
+        item[5] += capped * capped
+        item[6] += sum(c * c for c in chunk_tokens)
+    for g, (n, orig, eff, n_split, n_chunks, quad_orig, quad_eff) in summary.items():
+        ratio = quad_eff / quad_orig if quad_orig else 1.0
+        print(f"[EMBED_TOKENS] {g}: {n} 条文本，原始 {orig} tokens -> 有效 {eff} tokens，"
+              f"{n_split} 条超出预算被切分 (共 {n_chunks} 块)，注意力开销约为不切分时的 {ratio:.0%}")
+
+
+def _encode_with_budgets(texts, budgets, groups, model_name, device, batch_size, show_progress_bar,
+                         backend, overlap=None) -> np.ndarray:
+    """
+    按每条文本的 token 预算编码：超预算的文本切成重叠窗口，所有块合并分桶编码后按文本做 mean pooling。
+    """
+    if not any(budgets):
+        return embedding_registry.encode(texts, model_name=model_name, device=device, batch_size=batch_size,
+                                         show_progress_bar=show_progress_bar, backend=backend)
+
+    model = embedding_registry.text_model(model_name, device, backend)
+    tokenizer = getattr(model, 'tokenizer', None)
+
+    model_max = getattr(model, 'max_seq_length', None)
+
+    # 不设预算的文本由模型按 max_seq_length 截断，token 长度一次性批量统计
+    unbudgeted = [i for i, b in enumerate(budgets) if not b]
+    plain_tokens = dict(zip(unbudgeted, estimate_token_lengths(model, [texts[i] for i in unbudgeted]))) if unbudgeted else {}
+
+    flat, counts, rows = [], [], []
+    for i, (text, budget) in enumerate(zip(texts, budgets)):
+        if budget:
+            # 预算不超过模型本身的 max_seq_length，否则块仍会被模型截断
+            budget = min(budget, model_max) if model_max else budget
+            chunks, n_tokens, chunk_tokens = split_into_token_chunks(tokenizer, text, budget, overlap)
+        else:
+            chunks = [text]
+            n_tokens = plain_tokens[i]
+            chunk_tokens = [n_tokens]
+        flat.extend(chunks)
+        counts.append(len(chunks))
+        rows.append((n_tokens, chunk_tokens, model_max))
+    _report_token_stats(rows, groups or ['texts'] * len(texts))
+
+    chunk_vecs = embedding_registry.encode(flat, model_name=model_name, device=device, batch_size=batch_size,
+                                           show_progress_bar=show_progress_bar, backend=backend)
+    chunk_vecs = np.asarray(chunk_vecs, dtype=np.float32)
+    counts = np.asarray(counts)
+    # 各文本的块在 flat 中连续排列：按起始偏移一次性求和后取均值
+    offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    out = np.add.reduceat(chunk_vecs, offsets, axis=0) / counts[:, None]
+    # 模型输出为单位向量时 (bge-m3 默认归一化)，池化结果也重新归一化
+    unit = np.isclose(np.linalg.norm(chunk_vecs, axis=1), 1.0, atol=1e-3).astype(np.int64)
+    renorm = (counts > 1) & (np.add.reduceat(unit, offsets) == counts)
+    if renorm.any():
+        out[renorm] /= np.maximum(np.linalg.norm(out[renorm], axis=1, keepdims=True), 1e-12)
+    # 只有一块的文本直接取原向量 (避免除法引入的舍入差异)
+    single = counts == 1
+    out[single] = chunk_vecs[offsets[single]]
+    return out
+
+
+def encode_texts(texts, model_name: str = DEFAULT_MODEL_NAME, device: str = 'cpu',
+                 batch_size: int = 32, show_progress_bar: bool = True, cache_dir: str = None,
+                 backend: str = None, max_tokens=None, groups=None) -> np.ndarray:
+    """
+    向量化文本列表。提供 cache_dir 时先查磁盘向量缓存，只对未见过的文本调用模型。
+    backend 未指定时按 LITREVIEW_EMBED_BACKEND 选择推理后端。
+    max_tokens 为 token 预算 (整数，或与 texts 等长的列表，None/0 表示不限)：超出预算的文本
+    切成重叠窗口编码后做 mean pooling，预算计入缓存键。groups 为每条文本的分组名 (如章节)，用于统计输出。
+    """
+    texts = list(texts)
+    backend = resolve_backend(backend)
+    budgets = list(max_tokens) if isinstance(max_tokens, (list, tuple)) else [max_tokens] * len(texts)
+    groups = list(groups) if groups is not None else None
+    cache = get_embedding_cache(cache_dir, cache_model_id(model_name, backend)) if cache_dir else None
+    if cache is None:
+        return _encode_with_budgets(texts, budgets, groups, model_name, device, batch_size,
+                                    show_progress_bar, backend)
+
+    keys = [budget_cache_key(t, b) for t, b in zip(texts, budgets)]
+    hits, missing = cache.get_many(keys)
+    print(f"[EMBED_CACHE] 命中 {len(hits)}/{len(texts)}，需新编码 {len(missing)} 条文本。")
+
+    if not missing:
+        cache.touch()
+        fresh = {}
+    else:
+        # 相同文本 (如多个章节内容重复) 只编码一次
+        first_pos = {}
+        for i in missing:
+            first_pos.setdefault(keys[i], i)
+        uniq = list(first_pos.values())
+        new_vecs = _encode_with_budgets([texts[i] for i in uniq], [budgets[i] for i in uniq],
+                                        [groups[i] for i in uniq] if groups else None,
+                                        model_name, device, batch_size, show_progress_bar, backend)
+        new_vecs = cache.put_many([keys[i] for i in uniq], new_vecs)
+        by_key = {keys[i]: vec for i, vec in zip(uniq, new_vecs)}
+        fresh = {i: by_key[keys[i]] for i in missing}
+
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.stack([hits[i] if i in hits else fresh[i] for i in range(len(texts))])
+
+
+def preload_embedder(model_name: str = DEFAULT_MODEL_NAME, device: str = 'cpu', background: bool = True, backend: str = None):
+    return embedding_registry.preload(model_name, device=device, background=background, backend=backend)
@@ -0,0 +1,272 @@
+import os
+
+import numpy as np
+
+
+# 多视图融合距离：各文本视图的余弦距离与年份 L1 距离 (按最大跨度归一化) 的加权和
+VIEW_KEYS = ('main', 'summary', 'map', 'lineage')
+
+# 分块计算时每块临时矩阵的目标大小 (MB)，可用 LITREVIEW_FUSED_BLOCK_MB 覆盖
+DEFAULT_BLOCK_MB = 64
+
+
+def normalize_rows(vecs) -> np.ndarray:
+    """float32 行归一化；零向量保持为零 (与 sklearn cosine_distances 的处理一致，距离为 1)"""
+    X = np.asarray(vecs, dtype=np.float32)
+    if X.ndim == 1:
+        X = X.reshape(-1, 1)
+    norms = np.linalg.norm(X, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(X / norms, dtype=np.float32)
+
+
+def _block_rows(n: int) -> int:
+    try:
+        block_mb = float(os.environ.get('LITREVIEW_FUSED_BLOCK_MB', DEFAULT_BLOCK_MB))
+    except ValueError:
+        block_mb = DEFAULT_BLOCK_MB
+    return max(1, min(n, int(block_mb * (1 << 20) / 4 / max(n, 1))))
+
+
+def _prepare(views: dict, weights: dict, years=None):
+    """返回 (非零权重视图 [(w, 归一化向量)], 年份向量 float32, 年份系数 w_year / max_span, 样本数)"""
+    active = [(float(weights.get(key, 0.0) or 0.0), key) for key in VIEW_KEYS]
+    active = [(w, normalize_rows(views[key])) for w, key in active if w != 0.0]
+    w_year = float(weights.get('year', 0.0) or 0.0)
+
+    y, year_scale = None, 0.0
+    if years is not None:
+        y = np.asarray(years, dtype=np.float32).reshape(-1)
+        span = float(y.max() - y.min()) if len(y) else 0.0
+        if w_year != 0.0 and span > 0:
+            year_scale = w_year / span
+    n = len(active[0][1]) if active else (len(y) if y is not None else 0)
+    return active, y, year_scale, n
+
+
+def fused_distance_matrix(views: dict, weights: dict, years=None) -> np.ndarray:
+    """
+    分块计算融合距离矩阵 (float32, N x N)。
+
+    - views: {'main': (N, d), 'summary': ..., ...}，各视图的向量 (无需预先归一化)
+    - weights: {'main': w, ..., 'year': w}，缺省为 0；权重为 0 的视图直接跳过
+    - years: (N,) 发表年份
+
+    d = Σ w_v * (1 - <x_i, x_j>) + w_year * |y_i - y_j| / max_span，
+    按行块就地累加到同一个 N x N 缓冲区中，峰值内存约为一个 float32 矩阵加一个行块，
+    耗时与非零权重视图数成正比。结果截断到 >= 0，对角线置 0。
+    """
+    active, y, year_scale, n = _prepare(views, weights, years)
+    D = np.empty((n, n), dtype=np.float32)
+    if n == 0:
+        return D
+
+    base = np.float32(sum(w for w, _ in active))
+    rows = _block_rows(n)
+    tmp = np.empty((rows, n), dtype=np.float32)
+    for start in range(0, n, rows):
+        stop = min(n, start + rows)
+        block = D[start:stop]
+        buf = tmp[:stop - start]
+        block.fill(base)
+        for w, X in active:
+            np.dot(X[start:stop], X.T, out=buf)
+            buf *= np.float32(w)
+            block -= buf
+        if year_scale:
+            np.subtract(y[start:stop, None], y[None, :], out=buf)
+            np.abs(buf, out=buf)
+            buf *= np.float32(year_scale)
+            block += buf
+
+    np.maximum(D, 0, out=D)
+    np.fill_diagonal(D, 0)
+    return D
+
+
+def _columns_from_prepared(active, y, year_scale, columns) -> np.ndarray:
+    cols = np.asarray(columns, dtype=np.int64)
+    n = len(active[0][1]) if active else len(y)
+    D = np.full((n, len(cols)), np.float32(sum(w for w, _ in active)), dtype=np.float32)
+    for w, X in active:
+        D -= np.float32(w) * (X @ X[cols].T)
+    if year_scale:
+        D += np.float32(year_scale) * np.abs(y[:, None] - y[None, cols])
+    np.maximum(D, 0, out=D)
+    D[cols, np.arange(len(cols))] = 0
+    return D
+
+
+def fused_distance_columns(views: dict, weights: dict, years=None, columns=()) -> np.ndarray:
+    """
+    融合距离矩阵的若干列 D[:, columns] (float32, N x len(columns))，与 fused_distance_matrix 的对应列一致。
+    锚点吸附只需要 "所有样本 -> 锚点" 的距离，用它代替完整的 N x N 矩阵。
+    """
+    active, y, year_scale, _ = _prepare(views, weights, years)
+    return _columns_from_prepared(active, y, year_scale, columns)
+
+
+def _pair_distances(active, y, year_scale, rows, cols, chunk: int = 1 << 20) -> np.ndarray:
+    """指定样本对 (rows[i], cols[i]) 的精确融合距离"""
+    out = np.empty(len(rows), dtype=np.float32)
+    base = np.float32(sum(w for w, _ in active))
+    for start in range(0, len(rows), chunk):
+        r, c = rows[start:start + chunk], cols[start:start + chunk]
+        d = np.full(len(r), base, dtype=np.float32)
+        for w, X in active:
+            d -= np.float32(w) * np.einsum('ij,ij->i', X[r], X[c])
+        if year_scale:
+            d += np.float32(year_scale) * np.abs(y[r] - y[c])
+        out[start:start + len(r)] = d
+    np.maximum(out, 0, out=out)
+    return out
+
+
+# ----------------------------------------------------------------------
+# 稀疏 kNN 图模式
+# ----------------------------------------------------------------------
+# 样本数超过该值时 (graph_mode='auto') 改用稀疏 kNN 图，可用 LITREVIEW_KNN_MIN_PAPERS 覆盖
+DEFAULT_KNN_MIN_PAPERS = 20000
+# 每个视图的近邻数，可用 LITREVIEW_KNN_NEIGHBORS 覆盖
+DEFAULT_KNN_NEIGHBORS = 30
+# 样本数不超过该值时用分块暴力搜索求精确近邻，否则用 pynndescent
+BRUTE_FORCE_LIMIT = 8000
+# 稀疏图中非对角元素的最小距离：csgraph 会把显式存储的 0 当作 "无边"
+MIN_EDGE_DISTANCE = 1e-8
+
+
+def resolve_graph_mode(n_samples: int, graph_mode: str = None) -> str:
+    """'dense' / 'knn'；未指定时读 LITREVIEW_CLUSTER_GRAPH (dense | knn | auto，默认 auto)"""
+    mode = (graph_mode or os.environ.get('LITREVIEW_CLUSTER_GRAPH', 'auto')).lower()
+    if mode in ('dense', 'knn'):
+        return mode
+    try:
+        threshold = int(os.environ.get('LITREVIEW_KNN_MIN_PAPERS', DEFAULT_KNN_MIN_PAPERS))
+    except ValueError:
+        threshold = DEFAULT_KNN_MIN_PAPERS
+    return 'knn' if n_samples > threshold else 'dense'
+
+
+def knn_neighbors_setting(n_neighbors: int = None) -> int:
+    if n_neighbors:
+        return int(n_neighbors)
+    try:
+        return max(2, int(os.environ.get('LITREVIEW_KNN_NEIGHBORS', DEFAULT_KNN_NEIGHBORS)))
+    except ValueError:
+        return DEFAULT_KNN_NEIGHBORS
+
+
+def _brute_neighbors(X: np.ndarray, k: int):
+    """分块暴力求精确余弦近邻，返回近邻对 (rows, cols)，不含自身"""
+    n = len(X)
+    rows_out, cols_out = [], []
+    block = _block_rows(n)
+    for start in range(0, n, block):
+        stop = min(n, start + block)
+        sims = X[start:stop] @ X.T
+        sims[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+        part = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        rows_out.append(np.repeat(np.arange(start, stop, dtype=np.int64), k))
+        cols_out.append(part.reshape(-1).astype(np.int64))
+    return np.concatenate(rows_out), np.concatenate(cols_out)
+
+
+def view_neighbors(X: np.ndarray, k: int, random_state: int = 42):
+    """单个视图 (已归一化) 的 k 近邻对 (rows, cols)，不含自身；小语料精确搜索，大语料用 pynndescent"""
+    n = len(X)
+    k = min(k, n - 1)
+    if n <= BRUTE_FORCE_LIMIT:
+        return _brute_neighbors(X, k)
+    try:
+        from pynndescent import NNDescent
+    except ImportError:
+        print("⚠️ 未安装 pynndescent，改用分块暴力搜索近邻 (较慢)")
+        return _brute_neighbors(X, k)
+    from .projection_service import numba_guard
+    with numba_guard():
+        index = NNDescent(X, metric='cosine', n_neighbors=k + 1, random_state=random_state, low_memory=True)
+        indices, _ = index.neighbor_graph
+    rows = np.repeat(np.arange(n, dtype=np.int64), indices.shape[1])
+    cols = indices.reshape(-1).astype(np.int64)
+    keep = (cols >= 0) & (cols != rows)
+    return rows[keep], cols[keep]
+
+
+def _year_neighbors(y: np.ndarray, k: int):
+    """只有年份视图时：按年份排序后取前后相邻的 k 个样本作为近邻对"""
+    n = len(y)
+    k = min(k, n - 1)
+    order = np.argsort(y, kind='stable').astype(np.int64)
+    rows, cols = [], []
+    for offset in range(1, k // 2 + 2):
+        rows.append(order[:-offset])
+        cols.append(order[offset:])
+    return np.concatenate(rows), np.concatenate(cols)
+
+
+def fused_knn_graph(views: dict, weights: dict, years=None, n_neighbors: int = None):
+    """
+    稀疏融合距离图 (scipy CSR, N x N, float32)，内存 O(N·k)。
+
+    1. 每个非零权重视图各自求 k 近邻 (pynndescent，小语料用精确暴力搜索)；
+    2. 取所有视图近邻对的并集并对称化；
+    3. 对并集中的每一对按 weights_config 计算精确的融合距离 (与稠密矩阵中对应元素一致)；
+    4. 若图不连通，用各连通分量到最大分量的最近样本补边，保证 HDBSCAN / UMAP 可用。
+    每个 (行, 列) 只存储一次。
+    对角线显式存储为 0；未存储的元素表示 "不是近邻"。
+    """
+    from scipy import sparse
+    from scipy.sparse import csgraph
+
+    active, y, year_scale, n = _prepare(views, weights, years)
+    k = knn_neighbors_setting(n_neighbors)
+    if n < 2:
+        return sparse.csr_matrix((n, n), dtype=np.float32)
+
+    print(f"[KNN_GRAPH] 构建稀疏融合图: {n} 个样本，{len(active)} 个文本视图，每视图 k={min(k, n - 1)}")
+    pairs = [view_neighbors(X, k) for _, X in active]
+    if not pairs and y is not None:
+        pairs = [_year_neighbors(y, k)]
+
+    rows = np.concatenate([r for r, _ in pairs])
+    cols = np.concatenate([c for _, c in pairs])
+    keys = np.unique(np.concatenate([rows * n + cols, cols * n + rows]))
+    rows, cols = keys // n, keys % n
+
+    # 连通性修补：每个小分量取一个代表样本，与最大分量中最近的样本连一条边
+    structure = sparse.csr_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=(n, n))
+    n_comp, comp = csgraph.connected_components(structure, directed=False)
+    if n_comp > 1:
+        largest = np.bincount(comp).argmax()
+        extra_r, extra_c = [], []
+        for c in range(n_comp):
+            if c == largest:
+                continue
+            rep = int(np.flatnonzero(comp == c)[0])
+            d = _columns_from_prepared(active, y, year_scale, [rep])[:, 0]
+            # 只连向最大分量：小分量之间互连既不能保证连通，又会让同一条边出现两次 (CSR 构建时距离被累加)
+            d[comp != largest] = np.inf
+            target = int(np.argmin(d))
+            extra_r += [rep, target]
+            extra_c += [target, rep]
+        keys = np.unique(np.concatenate([rows * n + cols, np.asarray(extra_r, dtype=np.int64) * n + np.asarray(extra_c, dtype=np.int64)]))
+        rows, cols = keys // n, keys % n
+        print(f"[KNN_GRAPH] 图有 {n_comp} 个连通分量，已补 {len(extra_r) // 2} 条边")
+
+    data = np.maximum(_pair_distances(active, y, year_scale, rows, cols), np.float32(MIN_EDGE_DISTANCE))
+    # 对角线显式存储为 0 (UMAP / HDBSCAN 的稀疏 precomputed 路径把自身视为距离 0 的近邻)
+    diag = np.arange(n, dtype=np.int64)
+    graph = sparse.csr_matrix(
+        (np.concatenate([data, np.zeros(n, dtype=np.float32)]), (np.concatenate([rows, diag]), np.concatenate([cols, diag]))),
+        shape=(n, n), dtype=np.float32,
+    )
+    graph.sort_indices()
+    degrees = np.diff(graph.indptr)
+    print(f"[KNN_GRAPH] 完成: {graph.nnz} 个非零元 (每行 {degrees.min()}-{degrees.max()} 个)，"
+          f"约 {(graph.data.nbytes + graph.indices.nbytes) / 2 ** 20:.1f}MB")
+    return graph
+
+
+def min_row_degree(graph) -> int:
+    """稀疏图每行存储的元素数的最小值 (含对角线)"""
+    return int(np.diff(graph.indptr).min()) if graph.shape[0] else 0
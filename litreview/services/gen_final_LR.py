@@ -6,91 +6,34 @@ from .system_service import  AI_call
 import json
 import time
 from .core_algorithm import comprehensive_process_function
+from .corpus import load_corpus
+from .md_sections import CORE_SECTION_KEYWORDS, extract_core_sections
 from .visualize_and_gen_outline import plot_swimlane,construct_swimlane_data,build_context_text,gen_outline
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 
-def extract_md_to_dict(folder_path):
+def extract_md_to_dict(folder_path, corpus=None):
     """
     读取指定文件夹下的所有 .md 文件，提取标题和指定的四个核心章节内容并拼接，构建字典。
 
     参数:
     - folder_path: str, 包含md文件的文件夹路径
+    - corpus: ParsedCorpus, 已载入的语料；不提供时通过 load_corpus 获取 (文件未变化时复用聚类阶段已读入的内容)
 
     返回:
     - result_dict: dict, {文章标题: 拼接后的核心章节内容}
     """
-    result_dict = {}
-
     # 1. 检查文件夹是否存在
-    if not os.path.exists(folder_path):
-        print(f"错误: 文件夹不存在 - {folder_path}")
-        return {}
-
-    # 2. 获取所有 .md 文件
-    files = sorted([f for f in os.listdir(folder_path) if f.endswith('.md')])
-    print(f"在 {folder_path} 中发现 {len(files)} 个 Markdown 文件，开始处理...")
-
-    count_success = 0
-    
-    for filename in files:
-        file_path = os.path.join(folder_path, filename)
-        
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                
-            # --- A. 提取标题 ---
-            # 逻辑：匹配 "# 论文整理：" 或 "# 论文整理:" 开头，直到遇到下一个换行符加#或者文件结束
-            # re.DOTALL 模式下 . 可以匹配换行符，但这里我们用非贪婪匹配 .*?
-            # (?=\n#|\Z) 是正向预查，表示“后面必须跟着换行符+# 或者 文件结束”，但不包含在匹配结果中
-            title_pattern = r'#\s*论文整理[：:]\s*(.*?)(?=\n#|\Z)'
-            title_match = re.search(title_pattern, content, re.DOTALL)
-            
-            if title_match:
-                # 获取匹配组并去除首尾空白
-                title = title_match.group(1).strip()
-            else:
-                # 如果没找到标准标题格式，使用文件名作为备选标题
-                title = os.path.splitext(filename)[0]
-                # print(f"  [警告] 文件 '{filename}' 未找到标准标题格式，使用文件名代替。")
+    if corpus is None:
+        if not os.path.exists(folder_path):
+            print(f"错误: 文件夹不存在 - {folder_path}")
+            return {}
+        corpus = load_corpus(folder_path)
 
-            # --- B. 提取指定核心章节内容并拼接 ---
-            # 定义需要提取的固定章节关键词列表
-            target_keywords = ["论文主要内容", "论文核心内容概括", "谱系背景与脉络", "认识论范式"]
-            
-            extracted_parts = []
-            
-            for keyword in target_keywords:
-                # 构造正则：匹配以 ## 或 ### 开头，包含 keyword 的标题行
-                # 后面跟着内容，直到下一个 # 开头的标题或文件末尾
-                # re.IGNORECASE 忽略大小写
-                # re.escape(keyword) 确保关键词中的特殊字符被转义
-                pattern = r'(?:^|\n)\s*(#{1,6}\s*.*?' + re.escape(keyword) + r'.*?)\s*\n(.*?)(?=\n\s*#{1,6}|\Z)'
-                
-                match = re.search(pattern, content, re.DOTALL | re.IGNORECASE)
-                
-                if match:
-                    # header = match.group(1).strip() # 标题 (可选保留)
-                    body = match.group(2).strip()
-                    if body:
-                        # 拼接格式：【章节名】+ 换行 + 内容
-                        extracted_parts.append(f"【{keyword}】\n{body}")
-            
-            if extracted_parts:
-                # 将所有找到的章节内容拼接起来
-                full_content = "\n\n".join(extracted_parts)
-                result_dict[title] = full_content
-                count_success += 1
-            else:
-                # 如果没找到任何核心章节，记录跳过
-                # print(f"  [跳过] 文件 '{title}' 中未找到任何目标核心章节。")
-                pass
-
-        except Exception as e:
-            print(f"  [错误] 处理文件 '{filename}' 时出错: {e}")
+    print(f"在 {folder_path} 中发现 {len(corpus)} 个 Markdown 文件，开始处理...")
+    result_dict = dict(corpus.core_sections())
 
-    print(f"处理完成。成功提取 {count_success} 篇文章的指定内容。")
+    print(f"处理完成。成功提取 {len(result_dict)} 篇文章的指定内容。")
     return result_dict
 
 
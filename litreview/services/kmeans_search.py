@@ -0,0 +1,69 @@
+import os
+
+import numpy as np
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import silhouette_score
+
+
+# 样本数达到该值时 KMeans 改用 MiniBatchKMeans，可用 LITREVIEW_KMEANS_MINIBATCH_MIN 覆盖
+DEFAULT_MINIBATCH_MIN = 20000
+# 轮廓系数超过该样本数时按类别分层抽样估计，可用 LITREVIEW_SILHOUETTE_SAMPLE 覆盖
+DEFAULT_SILHOUETTE_SAMPLE = 5000
+# 样本数低于该值时 k 扫描串行执行 (进程池的启动开销大于收益)
+PARALLEL_MIN_SAMPLES = 2000
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def make_kmeans(n_clusters: int, n_samples: int):
+    """与原先一致的 KMeans(random_state=42, n_init=10)；大语料改用 MiniBatchKMeans"""
+    if n_samples >= _env_int('LITREVIEW_KMEANS_MINIBATCH_MIN', DEFAULT_MINIBATCH_MIN):
+        return MiniBatchKMeans(n_clusters=n_clusters, random_state=42, n_init=3, batch_size=4096)
+    return KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
+
+
+def stratified_sample(labels, sample_size: int, random_state: int = 42):
+    """按类别比例分层抽取 sample_size 个样本的下标 (每类至少 2 个，不足时全取)"""
+    labels = np.asarray(labels)
+    n = len(labels)
+    if n <= sample_size:
+        return np.arange(n)
+    rng = np.random.default_rng(random_state)
+    picked = []
+    for lbl in np.unique(labels):
+        members = np.flatnonzero(labels == lbl)
+        take = min(len(members), max(2, int(round(sample_size * len(members) / n))))
+        picked.append(rng.choice(members, size=take, replace=False))
+    return np.sort(np.concatenate(picked))
+
+
+def sampled_silhouette(X, labels) -> float:
+    """样本数不超过 LITREVIEW_SILHOUETTE_SAMPLE 时为精确轮廓系数，否则在分层样本上估计"""
+    idx = stratified_sample(labels, _env_int('LITREVIEW_SILHOUETTE_SAMPLE', DEFAULT_SILHOUETTE_SAMPLE))
+    return float(silhouette_score(X[idx], np.asarray(labels)[idx]))
+
+
+def _fit_k(X, k: int):
+    model = make_kmeans(k, len(X))
+    labels = model.fit_predict(X)
+    return k, model, labels, sampled_silhouette(X, labels)
+
+
+def sweep_k(X, k_values):
+    """
+    对每个 k 拟合一次并计算轮廓系数，返回 [(k, 模型, 标签, 轮廓系数)]，按 k_values 顺序。
+    样本数较多时用 joblib 进程池并行 (LITREVIEW_KMEANS_WORKERS 指定进程数，默认取 CPU 核数)，
+    每个子进程内的 BLAS/OpenMP 线程数由 joblib 自动按核数均分，避免过量订阅。
+    """
+    k_values = list(k_values)
+    workers = min(len(k_values), max(1, _env_int('LITREVIEW_KMEANS_WORKERS', os.cpu_count() or 1)))
+    if workers <= 1 or len(X) < PARALLEL_MIN_SAMPLES:
+        return [_fit_k(X, k) for k in k_values]
+    from joblib import Parallel, delayed
+    print(f"    [KMEANS] 并行扫描 {len(k_values)} 个 K 值 ({workers} 个进程)")
+    return Parallel(n_jobs=workers)(delayed(_fit_k)(X, k) for k in k_values)
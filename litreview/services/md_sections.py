@@ -0,0 +1,124 @@
+import os
+import re
+from bisect import bisect_right
+
+
+# 标题行：行首空白之后以 # 开头 (等价于旧正则中的 (?:^|\n)\s*# 判定)
+_HEADING_LINE = re.compile(r'^[^\S\n]*(#+)', re.MULTILINE)
+_LEADING_WS = re.compile(r'\s*')
+
+# 综述生成需要的核心章节关键词
+CORE_SECTION_KEYWORDS = ["论文主要内容", "论文核心内容概括", "谱系背景与脉络", "认识论范式"]
+
+
+def regex_section_text(content: str, section_start_str: str):
+    """旧实现 (兼容回退)：section_start_str 之后、下一个 "##" 之前的内容，未找到时返回 None"""
+    section_pattern = re.escape(section_start_str) + r'\s*(.*?)(?=\n\s*##|\Z)'
+    m = re.search(section_pattern, content, re.DOTALL)
+    if not m:
+        return None
+    return m.group(1).strip()
+
+
+def regex_core_section(content: str, keyword: str):
+    """旧实现 (兼容回退)：包含 keyword 的 # 标题之后、下一个 # 标题之前的内容，未找到时返回 None"""
+    pattern = r'(?:^|\n)\s*(#{1,6}\s*.*?' + re.escape(keyword) + r'.*?)\s*\n(.*?)(?=\n\s*#{1,6}|\Z)'
+    m = re.search(pattern, content, re.DOTALL | re.IGNORECASE)
+    if not m:
+        return None
+    return m.group(2).strip()
+
+
+def use_regex_splitter() -> bool:
+    """LITREVIEW_SECTION_SPLITTER=regex 时全部走旧正则"""
+    return os.environ.get('LITREVIEW_SECTION_SPLITTER', '').lower() == 'regex'
+
+
+class MarkdownSections:
+    """
+    单篇文献整理 md 的标题索引。
+
+    构造时用一次线性扫描记录所有标题行 (行起始偏移、# 偏移、级别)，之后每次查询只需一次
+    str.find 加二分查找，不再为每个章节、每个文件各跑一遍带回溯的 DOTALL 正则。
+    section / core_section 的返回值与旧正则 (regex_section_text / regex_core_section) 逐字一致，
+    包括 "空章节时内容延伸到下一个标题" 这类边界行为；关键词含大小写字母时 core_section 退回正则。
+    """
+
+    __slots__ = ('content', '_starts', '_hashes', '_levels', '_h2_hashes', '_h2_starts', '_line_starts')
+
+    def __init__(self, content: str):
+        self.content = content
+        starts, hashes, levels = [], [], []
+        for m in _HEADING_LINE.finditer(content):
+            starts.append(m.start())
+            hashes.append(m.start(1))
+            levels.append(len(m.group(1)))
+        self._starts, self._hashes, self._levels = starts, hashes, levels
+        # 可作为截止位置的标题行必须位于某个换行之后 (行起始偏移 > 0)
+        h2 = [(h, s) for s, h, lv in zip(starts, hashes, levels) if s > 0 and lv >= 2]
+        self._h2_hashes = [h for h, _ in h2]
+        self._h2_starts = [s for _, s in h2]
+        self._line_starts = [s for s in starts if s > 0]
+
+    def section(self, section_start_str: str):
+        """等价于 regex_section_text(content, section_start_str)"""
+        content = self.content
+        pos = content.find(section_start_str)
+        if pos < 0:
+            return None
+        # 跳过标记后的空白，内容从第一个非空白字符开始，到其后第一个 "\n\s*##" 截止
+        begin = _LEADING_WS.match(content, pos + len(section_start_str)).end()
+        i = bisect_right(self._h2_hashes, begin)
+        end = self._h2_starts[i] - 1 if i < len(self._h2_starts) else len(content)
+        return content[begin:end].strip()
+
+    def core_section(self, keyword: str):
+        """等价于 regex_core_section(content, keyword)"""
+        if not (keyword == keyword.lower() == keyword.upper()):
+            return regex_core_section(self.content, keyword)
+        if not self._hashes:
+            return None
+        content = self.content
+        # 最左匹配总是从第一个标题行开始，标题部分 (DOTALL) 一直延伸到其后第一次出现的关键词
+        k = content.find(keyword, self._hashes[0] + 1)
+        if k < 0:
+            return None
+        nl = content.find('\n', k + len(keyword))
+        if nl < 0:
+            return None
+        # 标题行末尾的空白 (可跨多个空行) 整体吞掉，正文从其中最后一个换行之后开始
+        ws_end = _LEADING_WS.match(content, nl).end()
+        begin = content.rfind('\n', nl, ws_end) + 1
+        i = bisect_right(self._line_starts, begin)
+        end = self._line_starts[i] - 1 if i < len(self._line_starts) else len(content)
+        return content[begin:end].strip()
+
+
+def extract_section_text(content: str, section_start_str: str):
+    """
+    提取 section_start_str 之后、下一个 "##" 之前的章节内容 (已 strip)，未找到章节时返回 None。
+    """
+    if use_regex_splitter():
+        return regex_section_text(content, section_start_str)
+    return MarkdownSections(content).section(section_start_str)
+
+
+def extract_core_sections(content: str):
+    """
+    从单篇文献整理 md 全文中提取 CORE_SECTION_KEYWORDS 对应章节并拼接，均未找到时返回 None。
+    """
+    extracted_parts = []
+    # 一次线性扫描建立标题索引，各关键词的查找与旧正则逐字一致
+    # (匹配包含 keyword 的 # 标题行，内容直到下一个 # 开头的标题或文件末尾)
+    index = None if use_regex_splitter() else MarkdownSections(content)
+
+    for keyword in CORE_SECTION_KEYWORDS:
+        body = index.core_section(keyword) if index is not None else regex_core_section(content, keyword)
+        if body:
+            # 拼接格式：【章节名】+ 换行 + 内容
+            extracted_parts.append(f"【{keyword}】\n{body}")
+
+    if not extracted_parts:
+        return None
+    # 将所有找到的章节内容拼接起来
+    return "\n\n".join(extracted_parts)
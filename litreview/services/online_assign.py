@@ -0,0 +1,222 @@
+import os
+import re
+import json
+
+import numpy as np
+
+from .corpus import load_corpus
+from .corpus_embeddings import CorpusEmbeddings, SECTION_HEADINGS, SECTION_KEYS
+from .fused_distance import fused_distance_columns
+from .anchor_adsorption import adsorb_to_anchors, CONSENSUS_HARD_LIMIT, STAGE2_MIN_NORM_SIM
+from .summary_store import parse_year
+
+
+# 增量归类：新文献不重新跑两轮聚类，而是按已保存的父类锚点 / 子类锚点，沿用 method='ANCHOR' 的吸附规则逐层归入。
+# 已聚类文献的标签保持不变，因此只执行 Stage 1 / Stage 2 (Stage 3 类别平衡会迁移已有文献，这里跳过)；
+# 锚点均值、Q25 等统计量在 "已聚类文献 + 新文献" 上计算，与完整流程中的参照范围一致。
+# 完整流程的 20 维 UMAP 坐标没有持久化 (投影也不支持对新样本 transform)，新文献无法放入同一降维空间，
+# 因此融合距离直接在各章节的原始向量 (余弦距离) 上计算；新文献的 coords_3d 为 None。
+#
+# Stage 1 的距离上限 (0.6) 与 Stage 2 的最低归一化相似度 (0.75) 是按降维坐标上的距离分布设定的，
+# 原始向量空间的距离分布不同，因此每次归类前先在已聚类文献上校准：同一批距离下，用候选阈值重新吸附
+# 已聚类文献，取与完整流程标签一致率最高的一组 (并列时保留默认值)，一致率随结果一起返回。
+HARD_LIMIT_QUANTILES = (0.25, 0.5, 0.75, 0.9)
+MIN_NORM_SIM_GRID = (0.5, 0.6, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95)
+# 校准后的一致率低于该值时视为低置信度：默认不写回结果文件 (force=True 时仍写入)，建议重新完整聚类
+MIN_AGREEMENT = 0.7
+
+YEAR_HEADING = "## 发表年份"
+ROUND1_FILE = "round1_results.json"
+ROUND2_FILE = "round2_results.json"
+
+_ANCHOR_TITLE = re.compile(r'__ANCHOR_(\d+)__')
+
+
+def _as_year(value):
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    return parse_year(str(value)) if value is not None else None
+
+
+def calibrate_thresholds(anchor_dists, anchor_indices, anchor_labels, known_rows, known_labels):
+    """
+    在已聚类文献 (known_rows，完整流程给出的标签为 known_labels) 上搜索 Stage 1 / Stage 2 阈值。
+    返回 (labels, calibration)：labels 为最优阈值下所有样本的吸附结果；
+    calibration = {'hard_limit', 'min_norm_sim', 'agreement', 'default_agreement', 'n_known'}，
+    hard_limit 为 None 表示不设上限。
+    """
+    n = anchor_dists.shape[0]
+
+    def run(hard_limit, min_norm_sim):
+        labels = adsorb_to_anchors(anchor_dists, anchor_indices, anchor_labels, n, max_balance_iters=0,
+                                   hard_limit=hard_limit, min_norm_sim=min_norm_sim, verbose=False)
+        agreement = float(np.mean(labels[known_rows] == known_labels)) if len(known_rows) else 0.0
+        return agreement, labels
+
+    default_agreement, labels = run(CONSENSUS_HARD_LIMIT, STAGE2_MIN_NORM_SIM)
+    best = (default_agreement, CONSENSUS_HARD_LIMIT, STAGE2_MIN_NORM_SIM, labels)
+    if len(known_rows):
+        best_raw = anchor_dists[known_rows].min(axis=1)
+        limits = sorted({float(np.quantile(best_raw, q)) for q in HARD_LIMIT_QUANTILES} | {CONSENSUS_HARD_LIMIT, np.inf})
+        for hard_limit in limits:
+            for min_norm_sim in MIN_NORM_SIM_GRID:
+                agreement, labels = run(hard_limit, min_norm_sim)
+                if agreement > best[0]:
+                    best = (agreement, hard_limit, min_norm_sim, labels)
+    agreement, hard_limit, min_norm_sim, labels = best
+    return labels, {
+        'hard_limit': None if np.isinf(hard_limit) else round(float(hard_limit), 4),
+        'min_norm_sim': min_norm_sim,
+        'agreement': round(agreement, 4),
+        'default_agreement': round(default_agreement, 4),
+        'n_known': int(len(known_rows)),
+    }
+
+
+def is_low_confidence(calibration) -> bool:
+    """校准一致率低于 MIN_AGREEMENT (或没有可供校准的已聚类文献) 时为 True"""
+    return calibration is not None and calibration['agreement'] < MIN_AGREEMENT
+
+
+def adsorb_new_papers(stored: dict, new_docs: dict, corpus_embeddings, weights_config: dict):
+    """
+    stored: 已有的一层聚类结果 {标题: {'label', 'main', 'summary', 'map', 'lineage', 'year', ...}}，含 __ANCHOR_k__ 锚点
+    new_docs: {标题: {'main', 'summary', 'map', 'lineage', 'year'}}
+    返回 ({新文献标题: label}, calibration)：未被任何锚点吸附时 label 为 -1，calibration 见 calibrate_thresholds。
+    """
+    if not new_docs:
+        return {}, None
+    items = {t: v for t, v in stored.items() if isinstance(v, dict) and _as_year(v.get('year')) is not None}
+    items.update(new_docs)
+    titles = sorted(items)
+    anchor_indices = [i for i, t in enumerate(titles) if _ANCHOR_TITLE.fullmatch(t)]
+    if not anchor_indices:
+        print("⚠️ 已保存的结果中没有锚点，新文献记为噪音。")
+        return {t: -1 for t in new_docs}, None
+
+    # 各章节向量：已聚类文献取自语料矩阵 (持久化缓存)，锚点按文本哈希复用，只有新文献需要编码
+    views = {}
+    for key in SECTION_KEYS:
+        if weights_config.get(key, 0.0):
+            views[key] = corpus_embeddings.matrix_for(key, {t: items[t].get(key) or "" for t in titles})
+    years = [_as_year(items[t].get('year')) for t in titles]
+
+    anchor_dists = fused_distance_columns(views, weights_config, years=years, columns=anchor_indices)
+    anchor_labels = [int(_ANCHOR_TITLE.fullmatch(titles[i]).group(1)) for i in anchor_indices]
+
+    # 参照标签只取完整流程聚类过的文献 (不含锚点与之前增量归入的文献)
+    known = [(i, int(items[t]['label'])) for i, t in enumerate(titles)
+             if t not in new_docs and not _ANCHOR_TITLE.fullmatch(t) and not items[t].get('online')]
+    known_rows = np.array([i for i, _ in known], dtype=int)
+    known_labels = np.array([l for _, l in known], dtype=int)
+    labels, calibration = calibrate_thresholds(anchor_dists, anchor_indices, anchor_labels, known_rows, known_labels)
+    print(f"  [ASSIGN] 阈值校准: Stage 1 上限 {calibration['hard_limit']}，Stage 2 下限 {calibration['min_norm_sim']}，"
+          f"与完整流程标签一致率 {calibration['agreement']:.1%} (默认阈值 {calibration['default_agreement']:.1%}，"
+          f"{calibration['n_known']} 篇)")
+    if is_low_confidence(calibration):
+        print(f"⚠️ [ASSIGN] 一致率低于 {MIN_AGREEMENT:.0%}，增量归类结果仅供参考，建议重新执行完整聚类。")
+    return {t: int(labels[i]) for i, t in enumerate(titles) if t in new_docs}, calibration
+
+
+def _load_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _dump_json(data, path):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, default=str)
+    os.replace(tmp, path)
+
+
+def assign_new_papers(base_folder: str, round1_weights: dict, round2_weights: dict, titles=None,
+                      corpus_embeddings=None, force: bool = False):
+    """
+    把 文献整理合集 中尚未出现在 round1_results.json 里的文献 (或指定的 titles) 归入已有的两级分类，
+    并写回 round1_results.json / round2_results.json。
+
+    任一层的校准一致率低于 MIN_AGREEMENT 时结果为低置信度：默认不写回文件 (已有结果保持不变)，
+    force=True 时照常写入。
+
+    返回 (round1, round2, report)：round1 / round2 为归入新文献后的结果 (写回时与 JSON 文件内容相同)，
+    report = {'assigned': {标题: {'parent': 父类, 'sub': 子类或 None}}, 'skipped': {标题: 原因},
+              'calibration': {'parent': 父类层校准结果, 'sub': {父类: 子类层校准结果}},
+              'low_confidence': 是否低置信度, 'written': 是否已写回文件}。
+    新文献的条目带 'online': True 标记，之后的增量归类不把它们当作校准参照。
+    """
+    folder_path = os.path.join(base_folder, "文献整理合集")
+    output_dir = os.path.join(base_folder, "分类流程数据")
+    round1_path = os.path.join(output_dir, ROUND1_FILE)
+    round2_path = os.path.join(output_dir, ROUND2_FILE)
+    if not os.path.isfile(round1_path) or not os.path.isfile(round2_path):
+        raise FileNotFoundError("未找到已有的聚类结果，请先完成一次完整的聚类分析")
+    round1 = _load_json(round1_path)
+    round2 = _load_json(round2_path)
+    stored1 = round1.get('results', {})
+
+    corpus = load_corpus(folder_path)
+    sections = {key: corpus.section(heading) for key, heading in SECTION_HEADINGS.items()}
+    year_texts = corpus.section(YEAR_HEADING)
+    if titles is None:
+        titles = [t for t in sorted(sections['map']) if t not in stored1]
+
+    new_docs, skipped = {}, {}
+    for t in titles:
+        if t in stored1:
+            skipped[t] = "已在聚类结果中"
+            continue
+        year = parse_year(year_texts.get(t, ""))
+        doc = {key: sections[key].get(t, "") for key in SECTION_KEYS}
+        if year is None or not all(doc.values()):
+            skipped[t] = "缺少年份或章节内容"
+            continue
+        doc['year'] = year
+        new_docs[t] = doc
+    report = {'assigned': {}, 'skipped': skipped, 'calibration': {'parent': None, 'sub': {}},
+              'low_confidence': False, 'written': False}
+    if not new_docs:
+        print(f"[ASSIGN] 没有需要归类的新文献 (跳过 {len(skipped)} 篇)")
+        return round1, round2, report
+
+    print(f"[ASSIGN] 增量归类 {len(new_docs)} 篇新文献...")
+    if corpus_embeddings is None:
+        corpus_embeddings = CorpusEmbeddings.for_folder(folder_path, parsed=corpus)
+
+    # 第一层：父类锚点
+    parents, report['calibration']['parent'] = adsorb_new_papers(stored1, new_docs, corpus_embeddings, round1_weights)
+    keywords1 = round1.get('keywords', {})
+    for t, parent in parents.items():
+        stored1[t] = {
+            'coords_3d': None, 'label': parent, 'keywords': keywords1.get(str(parent), []), 'online': True, **new_docs[t]
+        }
+        report['assigned'][t] = {'parent': parent, 'sub': None}
+
+    # 第二层：在所属父类的子类锚点中再吸附一次
+    for parent in sorted(set(parents.values()) - {-1}):
+        sub = round2.get(str(parent))
+        if not sub:
+            print(f"  [ASSIGN] 父类 {parent} 没有第二轮结果，新文献只归入父类。")
+            continue
+        members = {t: new_docs[t] for t, p in parents.items() if p == parent}
+        subs, report['calibration']['sub'][str(parent)] = adsorb_new_papers(
+            sub['results'], members, corpus_embeddings, round2_weights
+        )
+        for t, label in subs.items():
+            sub['results'][t] = {
+                'coords_3d': None, 'label': label, 'keywords': sub.get('keywords', {}).get(str(label), []),
+                'online': True, **members[t]
+            }
+            report['assigned'][t]['sub'] = label
+
+    calibrations = [report['calibration']['parent'], *report['calibration']['sub'].values()]
+    report['low_confidence'] = any(is_low_confidence(c) for c in calibrations)
+    if report['low_confidence'] and not force:
+        print(f"⚠️ [ASSIGN] 校准一致率低于 {MIN_AGREEMENT:.0%}，未写回聚类结果 (force=True 可强制写入): {report['assigned']}")
+        return round1, round2, report
+
+    _dump_json(round1, round1_path)
+    _dump_json(round2, round2_path)
+    report['written'] = True
+    print(f"[ASSIGN] 完成: {report['assigned']}")
+    return round1, round2, report
@@ -0,0 +1,156 @@
+import os
+import json
+
+import numpy as np
+
+
+# 导出产物目录：<cwd>/models/<model_name 中的 / 替换为 _>_onnx_int8
+ONNX_DIR_SUFFIX = "_onnx_int8"
+FP32_FILE = "model.onnx"
+INT8_FILE = "model.int8.onnx"
+CONFIG_FILE = "onnx_config.json"
+
+
+def onnx_model_dir(model_name: str) -> str:
+    models_dir = os.path.join(os.getcwd(), "models")
+    return os.path.join(models_dir, model_name.replace("/", "_") + ONNX_DIR_SUFFIX)
+
+
+def _pooling_config(st_model) -> dict:
+    """从 SentenceTransformer 的模块链读取池化方式与是否归一化"""
+    pooling, normalize = 'cls', False
+    for module in st_model._modules.values():
+        name = type(module).__name__
+        if name == 'Pooling':
+            if getattr(module, 'pooling_mode_cls_token', False):
+                pooling = 'cls'
+            elif getattr(module, 'pooling_mode_mean_tokens', False):
+                pooling = 'mean'
+            else:
+                raise ValueError("ONNX 后端仅支持 CLS / mean 池化")
+        elif name == 'Normalize':
+            normalize = True
+    return {'pooling': pooling, 'normalize': normalize, 'max_seq_length': int(st_model.max_seq_length)}
+
+
+def export_onnx_int8(model_name: str, st_model=None) -> str:
+    """
+    将 SentenceTransformer 的 transformer 主干导出为 ONNX，并做动态 int8 量化。
+
+    产物：model.onnx (fp32，导出中间件，超过 2GB 时权重写入外部数据文件)、
+    model.int8.onnx (运行时使用)、tokenizer 文件以及池化配置 onnx_config.json。
+    """
+    import torch
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    out_dir = onnx_model_dir(model_name)
+    os.makedirs(out_dir, exist_ok=True)
+    if st_model is None:
+        from .embedding_service import load_sentence_transformer
+        st_model = load_sentence_transformer(model_name, device='cpu')
+
+    config = _pooling_config(st_model)
+    transformer = st_model[0].auto_model.eval()
+    tokenizer = st_model.tokenizer
+    tokenizer.save_pretrained(out_dir)
+
+    print(f"📦 正在导出 ONNX 模型: {model_name} ...")
+    dummy = tokenizer(["导出示例文本", "ONNX export sample"], padding=True, return_tensors='pt')
+    fp32_path = os.path.join(out_dir, FP32_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            (dummy['input_ids'], dummy['attention_mask']),
+            fp32_path,
+            input_names=['input_ids', 'attention_mask'],
+            output_names=['last_hidden_state'],
+            dynamic_axes={
+                'input_ids': {0: 'batch', 1: 'seq'},
+                'attention_mask': {0: 'batch', 1: 'seq'},
+                'last_hidden_state': {0: 'batch', 1: 'seq'},
+            },
+            opset_version=17,
+            do_constant_folding=True,
+        )
+
+    print("📦 正在进行动态 int8 量化...")
+    quantize_dynamic(
+        fp32_path,
+        os.path.join(out_dir, INT8_FILE),
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+        use_external_data_format=False,
+    )
+    with open(os.path.join(out_dir, CONFIG_FILE), 'w', encoding='utf-8') as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+    print(f"✅ ONNX int8 模型已导出到: {out_dir}")
+    return out_dir
+
+
+def default_intra_op_threads() -> int:
+    """ONNX Runtime 的 intra-op 线程数：LITREVIEW_ORT_THREADS，未设置时取 CPU 核数"""
+    env = os.environ.get('LITREVIEW_ORT_THREADS')
+    if env:
+        return max(1, int(env))
+    return max(1, os.cpu_count() or 1)
+
+
+class OnnxSentenceEmbedder:
+    """
+    int8 量化 ONNX 模型的推理封装，对外提供与 SentenceTransformer 相同的
+    encode / tokenizer / max_seq_length 接口，可直接放入模型注册表。
+    """
+
+    def __init__(self, model_dir: str, intra_op_threads: int = None):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(model_dir, CONFIG_FILE), 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        self.pooling = config.get('pooling', 'cls')
+        self.normalize = bool(config.get('normalize', False))
+        self.max_seq_length = int(config.get('max_seq_length', 512))
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = intra_op_threads or default_intra_op_threads()
+        opts.inter_op_num_threads = 1
+        opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, INT8_FILE), sess_options=opts, providers=['CPUExecutionProvider']
+        )
+        print(f"⚙️ ONNX Runtime intra-op 线程数: {opts.intra_op_num_threads}")
+
+    def _pool(self, hidden: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        if self.pooling == 'cls':
+            return hidden[:, 0]
+        m = mask[..., None].astype(hidden.dtype)
+        return (hidden * m).sum(axis=1) / np.clip(m.sum(axis=1), 1e-9, None)
+
+    def encode(self, texts, batch_size: int = 32, show_progress_bar: bool = False, device=None, **kwargs) -> np.ndarray:
+        texts = list(texts)
+        outputs = []
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            enc = self.tokenizer(batch, padding=True, truncation=True, max_length=self.max_seq_length, return_tensors='np')
+            feeds = {
+                'input_ids': enc['input_ids'].astype(np.int64),
+                'attention_mask': enc['attention_mask'].astype(np.int64),
+            }
+            hidden = self.session.run(['last_hidden_state'], feeds)[0]
+            vecs = self._pool(hidden, feeds['attention_mask'])
+            if self.normalize:
+                vecs = vecs / np.clip(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-12, None)
+            outputs.append(vecs.astype(np.float32))
+        return np.concatenate(outputs) if outputs else np.zeros((0, 0), dtype=np.float32)
+
+
+def load_onnx_int8_embedder(model_name: str) -> OnnxSentenceEmbedder:
+    """加载 int8 ONNX 模型，本地不存在时先从 fp32 模型导出"""
+    model_dir = onnx_model_dir(model_name)
+    if not os.path.isfile(os.path.join(model_dir, INT8_FILE)) or not os.path.isfile(os.path.join(model_dir, CONFIG_FILE)):
+        export_onnx_int8(model_name)
+    else:
+        print(f"✅ 检测到本地 ONNX int8 模型: {model_dir}")
+    return OnnxSentenceEmbedder(model_dir)
@@ -0,0 +1,183 @@
+import os
+import threading
+import warnings
+import contextlib
+
+import numba
+import numpy as np
+import scipy.sparse as sp
+import umap
+from umap.umap_ import DISCONNECTION_DISTANCES, nearest_neighbors
+from umap.utils import fast_knn_indices
+from umap import distances as umap_distances
+from sklearn.utils import check_random_state
+
+
+# UMAP 投影模式，可用 LITREVIEW_UMAP_MODE 覆盖：
+#   reproducible  布局优化固定 random_state=42 单线程 (结果逐位可复现)，kNN 图用多线程精确计算
+#   fast          不固定随机种子，布局优化与 kNN 图构建全部多线程 (结果每次略有不同)
+DEFAULT_UMAP_MODE = 'reproducible'
+UMAP_MODES = ('reproducible', 'fast')
+
+# 与 UMAP 内部一致：样本数低于该值时精确计算全部两两距离，否则用 NN-Descent 近似近邻
+SMALL_DATA_LIMIT = 4096
+
+
+# numba 的 workqueue 线程层不允许多个 Python 线程同时进入并行内核 (会直接中止进程)；
+# 第二轮各分类在线程中并发时，没有 tbb / omp 线程层的环境下所有 numba 并行计算 (UMAP 拟合、
+# pynndescent 近邻搜索) 串行执行
+_NUMBA_LOCK = threading.Lock()
+
+
+def numba_guard():
+    try:
+        if numba.threading_layer() in ('tbb', 'omp'):
+            return contextlib.nullcontext()
+    except ValueError:
+        # 尚未运行过并行内核，线程层未确定
+        pass
+    return _NUMBA_LOCK
+
+
+def resolve_umap_mode(mode: str = None) -> str:
+    mode = (mode or os.environ.get('LITREVIEW_UMAP_MODE') or DEFAULT_UMAP_MODE).strip().lower()
+    if mode not in UMAP_MODES:
+        raise ValueError(f"未知的 UMAP 模式: {mode} (可选: {', '.join(UMAP_MODES)})")
+    return mode
+
+
+@numba.njit(parallel=True)
+def _pairwise_named(X, metric):
+    """与 sklearn pairwise_distances(X, metric=<numba 距离>) 逐元素相同的多线程版本：算上三角后镜像，对角线单独计算"""
+    n = X.shape[0]
+    out = np.zeros((n, n), dtype=X.dtype)
+    for i in numba.prange(n):
+        out[i, i] = metric(X[i], X[i])
+        for j in range(i + 1, n):
+            out[i, j] = metric(X[i], X[j])
+    for i in numba.prange(n):
+        for j in range(i):
+            out[i, j] = out[j, i]
+    return out
+
+
+def _gather(matrix, indices):
+    return matrix[np.arange(matrix.shape[0])[:, None], indices].copy()
+
+
+class ProjectionService:
+    """
+    同一份数据的多次 UMAP 投影共享一张 kNN 图。
+
+    data 为距离矩阵 (metric='precomputed'，稠密 N x N 或每行存储近邻距离的稀疏 CSR) 或向量矩阵；
+    首次投影时按所需的最大近邻数构建 kNN 图并缓存，之后每次以 precomputed_knn 传给 UMAP，
+    不再重复计算近邻。近邻的计算方式与 UMAP 内部完全一致，reproducible 模式下样本数 < 4096
+    或输入为距离矩阵时，投影结果与直接调用 UMAP 逐位相同；向量输入且样本数 >= 4096 时近邻同为
+    NN-Descent 结果，但随机数消耗顺序不同，布局与直接调用不再逐位相同 (仍然可复现)。
+    """
+
+    def __init__(self, data, metric: str = 'precomputed', mode: str = None):
+        self.metric = metric
+        self.mode = resolve_umap_mode(mode)
+        self.sparse = sp.issparse(data)
+        if self.sparse:
+            self.data = sp.csr_matrix(data, dtype=np.float32)
+        else:
+            self.data = np.ascontiguousarray(data, dtype=np.float32)
+        self.n_samples = self.data.shape[0]
+        self._knn_indices = None
+        self._knn_dists = None
+        self.n_builds = 0
+
+    def _cacheable(self, n_neighbors: int) -> bool:
+        # 近邻数不小于样本数时 UMAP 会自行截断 n_neighbors，直接交给 UMAP 处理
+        if n_neighbors >= self.n_samples:
+            return False
+        return self.metric == 'precomputed' or self.metric in umap_distances.named_distances
+
+    def _build(self, k: int):
+        X = self.data
+        if self.metric == 'precomputed' and self.sparse:
+            # 与 UMAP 稀疏 precomputed 分支一致：逐行取存储距离中最小的 k 个
+            indices = np.zeros((self.n_samples, k), dtype=int)
+            dists = np.zeros((self.n_samples, k), dtype=float)
+            for row_id in range(self.n_samples):
+                start, stop = X.indptr[row_id], X.indptr[row_id + 1]
+                row_data, row_indices = X.data[start:stop], X.indices[start:stop]
+                if len(row_data) < k:
+                    raise ValueError("Some rows contain fewer than n_neighbors distances!")
+                order = np.argsort(row_data)[:k]
+                indices[row_id] = row_indices[order]
+                dists[row_id] = row_data[order]
+            return indices, dists
+        if self.metric == 'precomputed':
+            indices = fast_knn_indices(X, k)
+            return indices, _gather(X, indices)
+        if self.n_samples < SMALL_DATA_LIMIT:
+            # 与 UMAP 小样本分支一致：先算完整距离矩阵，超过断连距离的置为 inf，再取每行最近的 k 个
+            dmat = _pairwise_named(X, umap_distances.named_distances[self.metric])
+            dmat[dmat >= DISCONNECTION_DISTANCES.get(self.metric, np.inf)] = np.inf
+            indices = fast_knn_indices(dmat, k)
+            return indices, _gather(dmat, indices)
+        n_jobs = -1 if self.mode == 'fast' else 1
+        random_state = check_random_state(None if self.mode == 'fast' else 42)
+        indices, dists, _ = nearest_neighbors(
+            X, k, self.metric, {}, False, random_state,
+            low_memory=True, use_pynndescent=True, n_jobs=n_jobs,
+        )
+        return indices, dists
+
+    def knn(self, n_neighbors: int):
+        """返回 (indices, dists) 的前 n_neighbors 列副本 (UMAP 会原地改写传入的数组)"""
+        if self._knn_indices is None or self._knn_indices.shape[1] < n_neighbors:
+            self._knn_indices, self._knn_dists = self._build(n_neighbors)
+            self.n_builds += 1
+            print(f"    [UMAP] 构建 kNN 图: {self.n_samples} 个样本, k={n_neighbors}")
+        else:
+            print(f"    [UMAP] 复用 kNN 图 (k={n_neighbors})")
+        return (np.array(self._knn_indices[:, :n_neighbors]),
+                np.array(self._knn_dists[:, :n_neighbors]))
+
+    def fit_transform(self, n_components: int, n_neighbors: int = 15, min_dist: float = 0.1):
+        """以缓存的 kNN 图做一次 UMAP 投影，参数含义与 umap.UMAP 相同"""
+        params = dict(
+            n_neighbors=n_neighbors,
+            n_components=n_components,
+            metric=self.metric,
+            min_dist=min_dist,
+        )
+        if self.mode == 'fast':
+            params.update(random_state=None, n_jobs=-1)
+        else:
+            params.update(random_state=42, n_jobs=1)
+        with numba_guard():
+            if not self._cacheable(n_neighbors):
+                return umap.UMAP(**params).fit_transform(self.data)
+            reducer = umap.UMAP(precomputed_knn=self.knn(n_neighbors), **params)
+            with warnings.catch_warnings():
+                # 未附带 NNDescent 索引只影响 transform()，这里只用 fit_transform
+                warnings.filterwarnings('ignore', message=r'precomputed_knn\[2\]')
+                return reducer.fit_transform(self.data)
+
+
+def reduce_embeddings(embeddings, n_dim_reduce: int = 20):
+    """
+    高维向量 -> 聚类用的低维坐标 (余弦 UMAP，min_dist=0)，返回 (降维矩阵, 投影服务)。
+    样本数不超过目标维度时不降维，直接返回原向量。只依赖 numpy / umap，可在子进程中单独使用。
+    """
+    n_samples = len(embeddings)
+    safe_n_components = min(n_dim_reduce, n_samples - 2) if n_samples > 2 else min(n_dim_reduce, n_samples)
+    safe_n_neighbors = min(15, n_samples - 1) if n_samples > 1 else 1
+    projector = ProjectionService(embeddings, metric='cosine')
+
+    # 如果样本极少，直接不降维或者做极简处理
+    if n_samples <= n_dim_reduce:
+        print(f"样本数 ({n_samples}) <= 目标维度 ({n_dim_reduce})，跳过 UMAP 降维，直接使用原始向量...")
+        return embeddings, projector
+    print(f"正在进行第一次降维 (UMAP -> {safe_n_components}维)...")
+    clusterable_embedding = projector.fit_transform(
+        n_components=safe_n_components,
+        n_neighbors=safe_n_neighbors,
+        min_dist=0.0,
+    )
+    return clusterable_embedding, projector
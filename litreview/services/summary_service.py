@@ -6,6 +6,9 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from ..state import TASKS
 from .system_service import pdf2markdown, AI_call
+from .embedding_precompute import embedding_precomputer
+from .corpus_embeddings import parse_title
+from .summary_store import get_summary_store, file_sha256
 
 
 class SummaryService:
@@ -43,6 +46,19 @@ class SummaryService:
                 p = os.path.join(out_root, name)
                 print("[SUMMARY][EXISTING_MD]", p, flush=True)
                 return p
+        # 同一 PDF 换了文件名时，按内容哈希复用已有的整理结果
+        store = get_summary_store(out_root)
+        pdf_hash = None
+        if store is not None:
+            try:
+                pdf_hash = file_sha256(pdf_path)
+                existing = store.find_by_pdf_hash(pdf_hash)
+                if existing and os.path.isfile(os.path.join(out_root, existing)):
+                    p = os.path.join(out_root, existing)
+                    print("[SUMMARY][EXISTING_PDF_HASH]", p, flush=True)
+                    return p
+            except Exception as e:
+                print("[SUMMARY][STORE_ERROR]", str(e), flush=True)
         lock_path = os.path.join(out_root, f"{base}.lock")
         print("[SUMMARY][LOCK_TRY]", lock_path, flush=True)
         acquired = False
@@ -322,7 +338,18 @@ class SummaryService:
             if not written:
                 print("[SUMMARY][WRITE_MAX_RETRY_EXCEEDED]", base, flush=True)
                 raise RuntimeError("write retries exceeded")
+            # 结构化结果写入文献库，md 文件作为可读导出件保留
+            if store is not None:
+                try:
+                    st = os.stat(out_path)
+                    store.upsert_paper(name, content, parse_title(content, name), st.st_mtime_ns, st.st_size,
+                                       pdf_name=os.path.basename(pdf_path), pdf_hash=pdf_hash)
+                    print("[SUMMARY][STORE_OK]", name, flush=True)
+                except Exception as e:
+                    print("[SUMMARY][STORE_ERROR]", str(e), flush=True)
             print("[SUMMARY][PROCESS_DONE]", out_path, flush=True)
+            # 后台预计算该文献的章节向量，聚类时直接命中缓存
+            embedding_precomputer.submit(out_path)
             return out_path
         finally:
             try:
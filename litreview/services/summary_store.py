@@ -0,0 +1,259 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+
+from .corpus_embeddings import SECTION_HEADINGS
+from .md_sections import MarkdownSections, extract_core_sections
+
+
+# 结构化文献库：与 文献整理合集 同级的单个 SQLite 文件
+STORE_FILE_NAME = "文献整理库.sqlite3"
+
+YEAR_HEADING = "## 发表年份"
+RELEVANCE_HEADING = "## 关联度评分"
+# 入库时预先提取的章节标记：聚类 (四个融合章节 + 发表年份)、锚点生成 (综述写作专用句) 与关联度评分
+STORED_SECTION_MARKERS = tuple(SECTION_HEADINGS.values()) + (YEAR_HEADING, "综述写作专用句", RELEVANCE_HEADING)
+
+# 库结构版本 (PRAGMA user_version)：
+# 1 及以下为旧版本 (按标题行切分的 sections 表，或只保存全文)，打开时迁移并按全文回填章节
+SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS papers (
+    id INTEGER PRIMARY KEY,
+    md_name TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    year INTEGER,
+    relevance REAL,
+    pdf_name TEXT,
+    pdf_hash TEXT,
+    content_hash TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    core_text TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sections (
+    paper_id INTEGER NOT NULL REFERENCES papers(id) ON DELETE CASCADE,
+    marker TEXT NOT NULL,
+    body TEXT NOT NULL,
+    PRIMARY KEY (paper_id, marker)
+);
+CREATE INDEX IF NOT EXISTS idx_papers_title ON papers(title);
+CREATE INDEX IF NOT EXISTS idx_papers_pdf_hash ON papers(pdf_hash);
+CREATE INDEX IF NOT EXISTS idx_papers_content_hash ON papers(content_hash);
+"""
+
+# 旧版本 papers 表可能缺少的列
+_ADDED_COLUMNS = (('year', 'INTEGER'), ('relevance', 'REAL'), ('core_text', 'TEXT'))
+
+# SQLite 单条语句的参数个数上限 (旧版本为 999)，IN (...) 查询按此分批
+_MAX_SQL_PARAMS = 900
+
+
+def store_path_for(folder_path: str) -> str:
+    """文献整理合集 目录对应的文献库路径 (同级目录)"""
+    return os.path.join(os.path.dirname(os.path.abspath(folder_path)), STORE_FILE_NAME)
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def content_sha1(content: str) -> str:
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+def parse_year(text: str):
+    """发表年份章节 -> 年份：忽略括号内的说明，取最后一个 19xx/20xx"""
+    if not text:
+        return None
+    cleaned = re.sub(r"\([^)]*\)", "", text)
+    cleaned = re.sub(r"（[^）]*）", "", cleaned)
+    years = re.findall(r"(?<!\d)(?:19|20)\d{2}(?!\d)", cleaned)
+    return int(years[-1]) if years else None
+
+
+def parse_relevance(text: str):
+    """关联度评分章节 -> 0-100 的分数，未找到时返回 None"""
+    if not text:
+        return None
+    m = re.search(r"(?<![\d.])(\d{1,3}(?:\.\d+)?)", text)
+    if not m:
+        return None
+    score = float(m.group(1))
+    return score if 0 <= score <= 100 else None
+
+
+def parse_summary(content: str) -> dict:
+    """
+    单篇文献整理全文 -> 入库的结构化字段：
+    {'sections': {章节标记: 内容}, 'year', 'relevance', 'core_text'}。
+    sections 只收录找到的章节 (内容为空时记为 "")，取值与 extract_section_text 逐字一致；
+    core_text 为 extract_core_sections 的结果 (综述生成使用)。
+    """
+    index = MarkdownSections(content)
+    sections = {}
+    for marker in STORED_SECTION_MARKERS:
+        text = index.section(marker)
+        if text is not None:
+            sections[marker] = text
+    return {
+        'sections': sections,
+        'year': parse_year(sections.get(YEAR_HEADING)),
+        'relevance': parse_relevance(sections.get(RELEVANCE_HEADING)),
+        'core_text': extract_core_sections(content),
+    }
+
+
+class SummaryStore:
+    """
+    文献整理结果的结构化存储 (SQLite)。
+
+    papers 表保存每篇文献整理的标题、年份、关联度评分、源 PDF 哈希、md 全文以及综述生成用的核心章节，
+    sections 表保存入库时按 STORED_SECTION_MARKERS 提取好的章节内容。文献整理合集 中的 .md 文件
+    保留为可读的导出件：load_corpus 以 (文件名, mtime_ns, size) 判断导出件是否与库中记录一致，
+    一致时直接从库中读取全文与已提取的章节，否则读入 md 并回写到库中 (兼容手工修改或旧版本生成的 md)。
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < SCHEMA_VERSION:
+            # 旧版本的 sections 表结构不同 (按标题行切分)，整表重建后按全文回填
+            self._conn.execute("DROP TABLE IF EXISTS sections")
+        self._conn.executescript(_SCHEMA)
+        if version < SCHEMA_VERSION:
+            self._migrate()
+        self._conn.commit()
+
+    def _migrate(self):
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(papers)")}
+        for name, decl in _ADDED_COLUMNS:
+            if name not in columns:
+                self._conn.execute(f"ALTER TABLE papers ADD COLUMN {name} {decl}")
+        rows = self._conn.execute("SELECT id, content FROM papers").fetchall()
+        for paper_id, content in rows:
+            self._write_parsed(paper_id, parse_summary(content))
+        self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        if rows:
+            print(f"[SUMMARY_STORE] 文献库结构已升级，回填 {len(rows)} 篇文献的章节。")
+
+    def _write_parsed(self, paper_id: int, parsed: dict):
+        self._conn.execute(
+            "UPDATE papers SET year = ?, relevance = ?, core_text = ? WHERE id = ?",
+            (parsed['year'], parsed['relevance'], parsed['core_text'], paper_id),
+        )
+        self._conn.execute("DELETE FROM sections WHERE paper_id = ?", (paper_id,))
+        self._conn.executemany(
+            "INSERT INTO sections (paper_id, marker, body) VALUES (?, ?, ?)",
+            [(paper_id, marker, body) for marker, body in parsed['sections'].items()],
+        )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def upsert_paper(self, md_name: str, content: str, title: str, mtime_ns: int, size: int,
+                     pdf_name: str = None, pdf_hash: str = None, parsed: dict = None):
+        """
+        写入/覆盖一篇文献整理；pdf_name/pdf_hash 未提供时保留库中已有的值。
+        parsed 为 parse_summary(content) 的结果，未提供时在此解析；返回写入的 parsed。
+        """
+        parsed = parsed if parsed is not None else parse_summary(content)
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT id, pdf_name, pdf_hash FROM papers WHERE md_name = ?", (md_name,)).fetchone()
+            if row is not None:
+                pdf_name = pdf_name or row[1]
+                pdf_hash = pdf_hash or row[2]
+                self._conn.execute("DELETE FROM papers WHERE id = ?", (row[0],))
+            cur = self._conn.execute(
+                "INSERT INTO papers (md_name, title, pdf_name, pdf_hash, content_hash, mtime_ns, size, content, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (md_name, title, pdf_name, pdf_hash, content_sha1(content), mtime_ns, size, content, time.time()),
+            )
+            self._write_parsed(cur.lastrowid, parsed)
+        return parsed
+
+    def signatures(self):
+        """{md 文件名: (mtime_ns, size)}"""
+        with self._lock:
+            rows = self._conn.execute("SELECT md_name, mtime_ns, size FROM papers").fetchall()
+        return {name: (mtime_ns, size) for name, mtime_ns, size in rows}
+
+    def load_papers(self, md_names):
+        """{md 文件名: (标题, 全文, parsed)}，parsed 与 parse_summary 的返回值结构相同"""
+        wanted = sorted(set(md_names))
+        result = {}
+        with self._lock:
+            for i in range(0, len(wanted), _MAX_SQL_PARAMS):
+                batch = wanted[i:i + _MAX_SQL_PARAMS]
+                placeholders = ','.join('?' * len(batch))
+                ids = {}
+                for paper_id, md_name, title, content, year, relevance, core_text in self._conn.execute(
+                        "SELECT id, md_name, title, content, year, relevance, core_text FROM papers"
+                        f" WHERE md_name IN ({placeholders})", batch):
+                    ids[paper_id] = md_name
+                    result[md_name] = (title, content, {
+                        'sections': {}, 'year': year, 'relevance': relevance, 'core_text': core_text,
+                    })
+                for paper_id, marker, body in self._conn.execute(
+                        "SELECT s.paper_id, s.marker, s.body FROM sections s JOIN papers p ON p.id = s.paper_id"
+                        f" WHERE p.md_name IN ({placeholders})", batch):
+                    result[ids[paper_id]][2]['sections'][marker] = body
+        return result
+
+    def prune(self, keep_md_names):
+        """删除 md 导出件已不存在的记录，返回删除条数"""
+        keep = set(keep_md_names)
+        with self._lock:
+            stale = [n for (n,) in self._conn.execute("SELECT md_name FROM papers") if n not in keep]
+        if stale:
+            with self._lock, self._conn:
+                self._conn.executemany("DELETE FROM papers WHERE md_name = ?", [(n,) for n in stale])
+        return len(stale)
+
+    def find_by_pdf_hash(self, pdf_hash: str):
+        """已整理过同一 PDF (内容相同，文件名可不同) 时返回其 md 文件名"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT md_name FROM papers WHERE pdf_hash = ? ORDER BY updated_at DESC LIMIT 1", (pdf_hash,)
+            ).fetchone()
+        return row[0] if row else None
+
+
+_STORES = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_summary_store(folder_path: str):
+    """
+    返回 文献整理合集 目录对应的文献库 (进程内共享)。
+    LITREVIEW_SUMMARY_STORE=0 时不使用文献库；打开失败 (只读目录等) 时返回 None，调用方直接读 md。
+    """
+    if os.environ.get('LITREVIEW_SUMMARY_STORE', '1') == '0' or not folder_path:
+        return None
+    path = store_path_for(folder_path)
+    with _STORES_LOCK:
+        store = _STORES.get(path)
+        if store is None:
+            try:
+                store = SummaryStore(path)
+            except (sqlite3.Error, OSError) as e:
+                print(f"⚠️ [SUMMARY_STORE] 无法打开文献库 {path}: {e}")
+                return None
+            _STORES[path] = store
+        return store
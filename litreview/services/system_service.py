@@ -5,6 +5,7 @@ import hmac
 import base64
 from urllib.parse import urlencode
 import re
+import threading
 import requests
 from volcenginesdkarkruntime import Ark
 import subprocess
@@ -135,20 +136,49 @@ def pdf2markdown(ak: str, sk: str, file_path: str, page_num: int, parse_mode: st
     return md
 
 
+# 进程内所有 LLM 请求共享的客户端 (按 api_key) 与并发上限，可用 LITREVIEW_LLM_CONCURRENCY 覆盖；
+# 聚类第二轮各分类并行时，锚点生成与关键词提取的请求都经过这里，避免瞬间打满 API 限制
+DEFAULT_LLM_CONCURRENCY = 8
+_ARK_CLIENTS = {}
+_ARK_LOCK = threading.Lock()
+_LLM_SLOTS = None
+
+
+def _ark_client(api_key: str):
+    with _ARK_LOCK:
+        client = _ARK_CLIENTS.get(api_key)
+        if client is None:
+            client = _ARK_CLIENTS[api_key] = Ark(api_key=api_key, timeout=1800)
+        return client
+
+
+def _llm_slots():
+    global _LLM_SLOTS
+    with _ARK_LOCK:
+        if _LLM_SLOTS is None:
+            try:
+                limit = int(os.environ.get('LITREVIEW_LLM_CONCURRENCY', DEFAULT_LLM_CONCURRENCY))
+            except ValueError:
+                limit = DEFAULT_LLM_CONCURRENCY
+            _LLM_SLOTS = threading.BoundedSemaphore(max(1, limit))
+        return _LLM_SLOTS
+
+
 def AI_call(text: str, api_key: str, model: str) -> str:
     api_key = api_key or ''
     model = model or 'deepseek-v3-2-251201'
-    client = Ark(api_key=api_key, timeout=1800)
+    client = _ark_client(api_key)
     # 最多重试3次
     for attempt in range(1, 4):
         try:
-            resp = client.chat.completions.create(
-                model=model,
-                messages=[{"role": "user", "content": text}],
-                thinking={"type": "enabled"},
-                temperature=0.1,
-                top_p=0.7
-            )
+            with _llm_slots():
+                resp = client.chat.completions.create(
+                    model=model,
+                    messages=[{"role": "user", "content": text}],
+                    thinking={"type": "enabled"},
+                    temperature=0.1,
+                    top_p=0.7
+                )
             return resp.choices[0].message.content
         except Exception as e:
             if attempt == 3: